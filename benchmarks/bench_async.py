@@ -0,0 +1,54 @@
+"""Compare fetching the categories and transactions one after another with the async client
+
+With a per-request latency, the blocking client takes the sum of the fetch latencies and
+`AsyncCloverAPI.fetch_snapshot` about the largest of them.
+
+    python -m benchmarks.bench_async --latency 0.2 --rows 1000
+"""
+import argparse
+import asyncio
+import dataclasses
+import time
+
+from benchmarks.bench_startup import CATEGORIES, add_transactions
+from benchmarks.stub_server import Store, serve
+from clover_ui import Facade
+
+
+def fetch_blocking(clover, page_size: int):
+    clover.fetch_categories()
+    clover.fetch_transactions_frame(page_size=page_size)
+
+
+async def fetch_async(clover, page_size: int):
+    async with clover:
+        await clover.fetch_snapshot(page_size=page_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds the stand-in API waits per request")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    store = Store(categories=CATEGORIES, latency=args.latency)
+    add_transactions(store, args.rows)
+    with serve(store) as host:
+        facade = Facade().configure_retry()
+        clover = dataclasses.replace(facade.clover(), host=host)
+        async_clover = dataclasses.replace(facade.async_clover(), host=host)
+        cases = [
+            ("blocking", lambda: fetch_blocking(clover, args.page_size)),
+            ("async", lambda: asyncio.run(fetch_async(async_clover, args.page_size))),
+        ]
+        for name, fn in cases:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                fn()
+            print(f"{name:<10} {(time.perf_counter() - start) / args.repeat:8.3f} s per snapshot")
+
+
+if __name__ == "__main__":
+    main()
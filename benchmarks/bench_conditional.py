@@ -0,0 +1,59 @@
+"""Measure a refresh of unchanged transactions with and without the response cache
+
+Without a cache every refresh downloads and decodes every page. With one, the server answers 304
+Not Modified for the categories and the first page of transactions, whose decoded values are
+reused. The pages fetched `since` a transaction id aren't cached (see `Facade.configure_cache`).
+
+    python -m benchmarks.bench_conditional --rows 100000
+"""
+import argparse
+import dataclasses
+import tempfile
+import time
+
+from benchmarks.bench_startup import CATEGORIES, add_transactions
+from benchmarks.stub_server import Store, serve
+from clover_ui import Facade
+
+
+def refresh(clover, repeat: int) -> float:
+    """Mean seconds to fetch the categories and every transaction"""
+    clover.fetch_categories()
+    clover.fetch_transactions()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        clover.fetch_categories()
+        clover.fetch_transactions()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    store = Store(categories=CATEGORIES)
+    add_transactions(store, args.rows)
+    with serve(store) as host, tempfile.TemporaryDirectory() as path:
+        cases = [
+            ("no cache", Facade().configure_retry()),
+            ("memory cache", Facade().configure_retry().configure_cache()),
+            ("disk cache, cold memory", None),
+        ]
+        for name, facade in cases:
+            if facade is None:
+                # a new process with the responses a previous one left on disk
+                dataclasses.replace(Facade().configure_cache(path=path).clover(), host=host).fetch_transactions()
+                facade = Facade().configure_retry().configure_cache(path=path)
+                clover = dataclasses.replace(facade.clover(), host=host)
+                start = time.perf_counter()
+                clover.fetch_transactions()
+                print(f"{name:<24} {time.perf_counter() - start:8.4f} s first refresh")
+                continue
+            clover = dataclasses.replace(facade.clover(), host=host)
+            print(f"{name:<24} {refresh(clover, args.repeat):8.4f} s per refresh")
+
+
+if __name__ == "__main__":
+    main()
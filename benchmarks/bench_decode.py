@@ -0,0 +1,75 @@
+"""Compare decoding pages of transactions into a frame with each JSON backend
+
+`records` is what `CloverAPI.fetch_transactions_frame` used to do: the stdlib decoder and
+`pandas.DataFrame.from_records`. The other cases decode with a backend from `clover_ui.codec`
+and build typed columns with `records_to_frame`. Also prints the size of the payload with and
+without gzip.
+
+    python -m benchmarks.bench_decode --rows 100000 1000000
+"""
+import argparse
+import datetime
+import gzip
+import json
+import random
+import time
+
+import pandas as pd
+
+from clover_ui.api import TRANSACTION_DTYPES, records_to_frame
+from clover_ui.codec import BACKENDS
+
+
+def make_payload(rows: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    start = datetime.datetime(2010, 1, 1)
+    transactions = [
+        dict(
+            id=i + 1,
+            time=(start + datetime.timedelta(minutes=7 * i)).isoformat(),
+            transaction_type=rng.choice(["Debit", "Credit", "Transfer"]),
+            payee=f"Payee {rng.randrange(500)}",
+            description="",
+            total=round(rng.uniform(-200, 100), 2),
+            category_name=rng.choice(["groceries", "rent", "salary", "uncategorised"]),
+        )
+        for i in range(rows)
+    ]
+    return json.dumps(transactions).encode()
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = {"records": lambda body: pd.DataFrame.from_records(json.loads(body))}
+    for name, factory in BACKENDS.items():
+        try:
+            backend = factory()
+        except ImportError:
+            print(f"skipping {name}, it isn't installed")
+            continue
+        cases[f"{name} + columns"] = lambda body, loads=backend.loads: records_to_frame(loads(body), TRANSACTION_DTYPES)
+
+    for rows in args.rows:
+        body = make_payload(rows)
+        compressed = gzip.compress(body, compresslevel=1)
+        print(f"{rows} transactions, {len(body) / 2 ** 20:.1f} MiB, {len(compressed) / 2 ** 20:.1f} MiB gzipped")
+        for name, decode in cases.items():
+            seconds = best_of(lambda: decode(body), args.repeat)
+            print(f"  {name:<20} {seconds:8.3f} s {rows / seconds:12.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
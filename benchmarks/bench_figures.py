@@ -0,0 +1,61 @@
+"""Measure the size and build time of the dashboard figures for all dates and for one month
+
+The size is of the dashboard as Dash sends it to the browser, and the points are the number of
+values the browser has to lay out in the pie and the bar chart.
+
+    python -m benchmarks.bench_figures --rows 1000000
+"""
+import argparse
+import json
+import time
+
+from plotly.utils import PlotlyJSONEncoder
+
+from benchmarks.bench_memory import CATEGORIES, make_transactions
+from clover_ui.aggregates import AggregateCube
+from clover_ui.dashboard import generate_dashboard
+from clover_ui.store import TransactionStore
+
+
+def figures(component) -> list:
+    """The figures of the graphs in a Dash component tree"""
+    found = []
+    figure = getattr(component, "figure", None)
+    if figure is not None:
+        found.append(figure)
+    children = getattr(component, "children", None)
+    for child in children if isinstance(children, list) else [children]:
+        if child is not None and not isinstance(child, str):
+            found += figures(child)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # a transaction every 7 minutes, 1M rows cover about 13 years
+    store, _, _ = TransactionStore.empty().upsert(make_transactions(args.rows), CATEGORIES)
+    cube = AggregateCube()
+    cube.rebuild(store.transactions)
+    months = sorted(cube.months)
+
+    for name, month in [("all dates", None), ("one month", months[len(months) // 2])]:
+        aggregates = cube.query(month, hide_transfers=True, hide_uncategorised=False)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            dashboard = generate_dashboard(aggregates)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        payload = json.dumps(dashboard, cls=PlotlyJSONEncoder)
+        points = sum(
+            len(trace.get("values", trace.get("y", [])))
+            for figure in figures(dashboard)
+            for trace in [json.loads(json.dumps(data, cls=PlotlyJSONEncoder)) for data in figure["data"]]
+        )
+        print(f"{name:<10} {len(payload) / 1024:8.1f} KiB {points:8d} points {elapsed * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Compare requests/second of one-connection-per-request against the pooled `RequestsWithRetry`
+
+    python -m benchmarks.bench_http --requests 2000
+"""
+import argparse
+import time
+
+from benchmarks.stub_server import Store, serve
+from clover_ui.http import RequestsWithRetry, retrying_factory
+import requests
+
+
+def unpooled(url: str, n: int):
+    for _ in range(n):
+        with requests.get(url, timeout=(2, 8)) as r:
+            r.json()
+
+
+def pooled(url: str, n: int):
+    with RequestsWithRetry(retrying=retrying_factory()) as request:
+        for _ in range(n):
+            request.get(url, callback=lambda r: r.json())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="Number of requests per case")
+    args = parser.parse_args()
+
+    store = Store(categories=[{"name": "groceries", "display_name": "Groceries"}])
+    with serve(store) as host:
+        url = f"{host}/categories"
+        for name, fn in [("before (requests.get)", unpooled), ("after (pooled session)", pooled)]:
+            start = time.perf_counter()
+            fn(url, args.requests)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<24} {args.requests / elapsed:10.1f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
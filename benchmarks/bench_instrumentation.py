@@ -0,0 +1,65 @@
+"""Measure the overhead of request instrumentation on `RequestsWithRetry`
+
+Requests are timed without hooks, with a `MetricsCollector` and with a `MetricsCollector` plus
+`LoggingInstrumentation` at a level which isn't logged. The round trips to the local server
+vary more than the hooks cost, so the hooks are also timed on their own, without requests.
+
+    python -m benchmarks.bench_instrumentation --requests 2000
+"""
+import argparse
+import logging
+import time
+
+from benchmarks.stub_server import Store, serve
+from clover_ui.http import RequestsWithRetry, retrying_factory
+from clover_ui.metrics import CallRecorder, LoggingInstrumentation, MetricsCollector
+
+
+def run(url: str, n: int, hooks: tuple) -> float:
+    with RequestsWithRetry(retrying=retrying_factory(), hooks=hooks) as request:
+        request.get(url, callback=request.decode_json)
+        start = time.perf_counter()
+        for _ in range(n):
+            request.get(url, callback=request.decode_json)
+        return time.perf_counter() - start
+
+
+def hooks_only(url: str, n: int, hooks: tuple) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        recorder = CallRecorder(hooks, "GET", url)
+        recorder.attempt(time.perf_counter(), status=200, bytes_received=512)
+        recorder.finish()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="Number of requests per case")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case, the fastest is reported")
+    args = parser.parse_args()
+
+    logging.getLogger("clover.http").setLevel(logging.INFO)
+    metrics = MetricsCollector()
+    cases = [
+        ("no hooks", ()),
+        ("metrics", (metrics,)),
+        ("metrics + logging", (metrics, LoggingInstrumentation(level=logging.DEBUG))),
+    ]
+    store = Store(categories=[{"name": "groceries", "display_name": "Groceries"}])
+    with serve(store) as host:
+        url = f"{host}/categories"
+        for name, hooks in cases:
+            elapsed = min(run(url, args.requests, hooks) for _ in range(args.repeat))
+            hooks_elapsed = min(hooks_only(url, args.requests, hooks) for _ in range(args.repeat)) if hooks else 0.0
+            print(
+                f"{name:<20} {elapsed / args.requests * 1e6:8.1f} us/request"
+                f"  hooks {hooks_elapsed / args.requests * 1e6:6.1f} us/request"
+            )
+
+    print()
+    print(metrics.prometheus())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Measure the cost of logging in tight loops for each mode of `configure_parent_logger`
+
+Times a loop which logs one message per iteration, as the hot path sees it and until every record
+is written, then the fastest of `--repeat` runs of the per-row migration loop
+(`migration.create_transactions` with a batch size of 1) against the stand-in API. Records are
+written to a file and to stdout, which is sent to /dev/null. Once more than the queue's capacity of
+records are waiting, the queued modes wait for the writer, so bursts of fewer `--calls` show what
+the hot path pays alone.
+
+    python -m benchmarks.bench_logging --calls 100000 --rows 2000 --repeat 3
+"""
+import argparse
+import contextlib
+import dataclasses
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_migration import make_export
+from benchmarks.stub_server import Store, serve
+from clover_ui import Facade
+from clover_ui.log import configure_parent_logger
+
+import migration
+
+MODES = {
+    "off": dict(level=logging.WARNING),
+    "sync": dict(),
+    "sync, no caller": dict(caller=False),
+    "queued": dict(queued=True),
+    "queued, no caller": dict(queued=True, caller=False),
+    "queued, rate limited": dict(queued=True, caller=False, rate_limit=10),
+}
+
+
+def configure(path: str, devnull, **kwargs) -> logging.Logger:
+    kwargs = dict(dict(level=logging.INFO, fname=path), **kwargs)
+    # the console handler writes to the stdout it is configured with
+    with contextlib.redirect_stdout(devnull):
+        return configure_parent_logger(**kwargs)
+
+
+def written(logger: logging.Logger):
+    """Wait until the records logged so far are written"""
+    for handler in logger.handlers:
+        handler.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100000, help="Messages logged by the tight loop")
+    parser.add_argument("--rows", type=int, default=2000, help="Rows migrated one request at a time")
+    parser.add_argument("--repeat", type=int, default=3, help="Migrations per mode, the fastest is reported")
+    args = parser.parse_args()
+
+    categories = {"Groceries": "groceries", "Salary": "salary", "Rent": "rent"}
+    export = make_export(args.rows)
+    with open(os.devnull, "w") as devnull, tempfile.TemporaryDirectory() as directory:
+        with serve(Store()) as host:
+            facade = Facade()
+            clover = dataclasses.replace(facade.clover(), host=host)
+            for name, kwargs in MODES.items():
+                logger = configure(os.path.join(directory, f"{name}.log"), devnull, **kwargs)
+                start = time.perf_counter()
+                for i in range(args.calls):
+                    logger.info("Created transaction %d... ID: %s", i, i)
+                hot = time.perf_counter() - start
+                written(logger)
+                total = time.perf_counter() - start
+
+                elapsed = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    migration.create_transactions(clover, export, categories)
+                    written(logger)
+                    elapsed.append(time.perf_counter() - start)
+                rate = args.rows / min(elapsed)
+                print(
+                    f"{name:<22} {hot / args.calls * 1e6:6.2f} us/call hot path"
+                    f" {total / args.calls * 1e6:6.2f} us/call written  migration {rate:8.1f} rows/s",
+                    file=sys.stderr,
+                )
+            facade.close()
+    # leave the logging set up as it was
+    configure_parent_logger(level=logging.INFO)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare the memory and slicing time of the compact transaction store with the merged frame
+
+The merged frame is the layout the app used before `TransactionStore`: object strings, a float
+total, the categories merged in and the time held both as a column and as the index.
+
+    python -m benchmarks.bench_memory --rows 1000000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from clover_ui.store import TransactionStore
+
+PAYEES = [f"Payee {i}" for i in range(500)]
+CATEGORIES = pd.DataFrame(
+    [{"name": n, "display_name": n.title()} for n in ["groceries", "rent", "salary", "transport", "uncategorised"]]
+)
+
+
+def make_transactions(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    times = pd.date_range("2010-01-01", periods=rows, freq="7min")
+    return pd.DataFrame(
+        {
+            "id": np.arange(1, rows + 1),
+            "time": times.strftime("%Y-%m-%dT%H:%M:%S"),
+            "transaction_type": [rng.choice(["Debit", "Credit", "Transfer"]) for _ in range(rows)],
+            "payee": [rng.choice(PAYEES) for _ in range(rows)],
+            "description": "",
+            "total": np.round(np.random.default_rng(seed).uniform(-200, 100, rows), 2),
+            "category_name": [rng.choice(CATEGORIES.name) for _ in range(rows)],
+        }
+    )
+
+
+def merged_frame(transactions: pd.DataFrame) -> pd.DataFrame:
+    frame = transactions.merge(CATEGORIES, how="left", left_on="category_name", right_on="name")
+    frame.index = pd.to_datetime(frame.time)
+    frame["days"] = frame.index.floor("d")
+    return frame.sort_index(kind="stable")
+
+
+def time_slices(frame: pd.DataFrame, copy: bool, repeat: int = 200) -> float:
+    """Mean seconds to take a one-month slice"""
+    bounds = frame.index.searchsorted([pd.Timestamp("2012-03-01"), pd.Timestamp("2012-04-01")])
+    start = time.perf_counter()
+    for _ in range(repeat):
+        df = frame.iloc[bounds[0] : bounds[1]]
+        if copy:
+            df = df.copy()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    transactions = make_transactions(args.rows)
+    merged = merged_frame(transactions)
+    store, _, _ = TransactionStore.empty().upsert(transactions, CATEGORIES)
+
+    merged_bytes = int(merged.memory_usage(index=True, deep=True).sum())
+    store_bytes = store.memory_usage()
+    merged_slice = time_slices(merged, copy=True)
+    store_slice = time_slices(store.transactions, copy=False)
+    print(f"merged frame {merged_bytes / 2 ** 20:8.1f} MiB {merged_slice * 1e3:8.3f} ms/slice")
+    print(f"store        {store_bytes / 2 ** 20:8.1f} MiB {store_slice * 1e3:8.3f} ms/slice")
+    print(f"ratio        {merged_bytes / store_bytes:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Measure migration throughput (rows/second) for different batch sizes and numbers of workers
+
+    python -m benchmarks.bench_migration --rows 5000 --batch-sizes 1 10 100 1000
+    python -m benchmarks.bench_migration --rows 500 --batch-sizes 1 --workers 1 2 4 8 --latency 0.01
+"""
+import argparse
+import dataclasses
+import itertools
+import logging
+import time
+
+from benchmarks.stub_server import Store, serve
+from clover_ui import Facade
+import numpy as np
+import pandas as pd
+
+import migration
+
+
+def make_export(rows: int, seed: int = 0) -> pd.DataFrame:
+    """A synthetic bank export as returned by `migration.load_csvs`"""
+    rng = np.random.default_rng(seed)
+    totals = rng.normal(-50, 200, rows).round(2)
+    return pd.DataFrame(
+        {
+            "Time": pd.date_range("2015-01-01", periods=rows, freq="h").strftime("%Y-%m-%d %H:%M"),
+            "Transaction Type": rng.choice(["Debit", "Credit", "Transfer"], rows),
+            "Payee": rng.choice(["Woolworths", "Coles", "Employer", "Landlord"], rows),
+            "Description": "",
+            "Total (AUD)": totals,
+            "Category": rng.choice(["Groceries", "Salary", "Rent", "Other"], rows),
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the server waits before responding")
+    args = parser.parse_args()
+
+    migration.logger.setLevel(logging.WARNING)
+    categories = {"Groceries": "groceries", "Salary": "salary", "Rent": "rent"}
+    for batch_size, workers in itertools.product(args.batch_sizes, args.workers):
+        with serve(Store(latency=args.latency)) as host:
+            facade = Facade().configure_pool(pool_maxsize=max(workers, 10))
+            clover = dataclasses.replace(facade.clover(), host=host)
+            export = make_export(args.rows)
+            start = time.perf_counter()
+            migration.create_transactions(clover, export, categories, batch_size=batch_size, workers=workers)
+            elapsed = time.perf_counter() - start
+            facade.close()
+        print(f"batch size {batch_size:<6} workers {workers:<4} {args.rows / elapsed:10.1f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
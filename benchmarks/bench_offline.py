@@ -0,0 +1,79 @@
+"""Measure the time to serve the dashboard from the cache while the API is up, slow or down, and the
+time refreshes take to fail while it is down, with and without a circuit breaker
+
+Without a breaker every refresh backs off through all of its retries; with one, only the first
+refreshes do until the circuit opens, and later ones fail immediately.
+
+    python -m benchmarks.bench_offline --rows 100000 --latency 2 --refreshes 3
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks.bench_startup import CATEGORIES, add_transactions
+from benchmarks.profile_render import render
+from benchmarks.stub_server import Store, serve
+from clover_ui import Facade
+from clover_ui.app import create_app
+from clover_ui.cache import TransactionCache
+from clover_ui.sync import TransactionSync
+
+
+def make_clover(host: str, breaker: bool = True):
+    facade = Facade().configure_retry()
+    if breaker:
+        facade.configure_circuit_breaker()
+    clover = facade.clover()
+    return type(clover)(request=clover.request, host=host)
+
+
+def time_to_serve(host: str, cache_path: str) -> float:
+    """Seconds from creating the app to rendering the dashboard"""
+    start = time.perf_counter()
+    app = create_app(cache_path=cache_path, follow=False, clover=make_clover(host))
+    client = app.server.test_client()
+    client.get("/_dash-layout")
+    size = render(client, "/page-1", [], None)
+    elapsed = time.perf_counter() - start
+    assert app.state.sync.version > 0 and size > 1000, "the dashboard wasn't served from the cache"
+    # the background refresh may still be waiting on the API, which this doesn't wait for
+    app.state.sync._stopped.set()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--latency", type=float, default=2.0, help="Seconds the slow API takes per request")
+    parser.add_argument("--refreshes", type=int, default=3, help="Failed refreshes to time")
+    args = parser.parse_args()
+
+    store = Store(categories=CATEGORIES)
+    add_transactions(store, args.rows)
+    with tempfile.TemporaryDirectory() as cache_path:
+        with serve(store) as host:
+            cache = TransactionCache(cache_path, host=host)
+            TransactionSync(make_clover(host), page_size=10000, cache=cache).refresh()
+            print(f"{'up':<6} served in {time_to_serve(host, cache_path) * 1e3:8.1f} ms")
+            store.latency = args.latency
+            print(f"{'slow':<6} served in {time_to_serve(host, cache_path) * 1e3:8.1f} ms")
+        # the server is shut down, so connections to its port are refused
+        print(f"{'down':<6} served in {time_to_serve(host, cache_path) * 1e3:8.1f} ms")
+
+        for name, breaker in [("no breaker", False), ("breaker", True)]:
+            sync = TransactionSync(make_clover(host, breaker), page_size=10000, cache=cache)
+            sync.load()
+            durations = []
+            for _ in range(args.refreshes):
+                start = time.perf_counter()
+                try:
+                    sync.refresh()
+                except Exception:
+                    pass
+                durations.append(time.perf_counter() - start)
+            assert sync.stale
+            print(f"{name:<10} failed refreshes: {'  '.join(f'{d:6.2f} s' for d in durations)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Measure the time to get a prepared transactions frame at startup
+
+Compares a cold start with no cache (full fetch), a cache hit with nothing new on the server and a
+cache hit followed by a small delta fetch.
+
+    python -m benchmarks.bench_startup --rows 200000 --delta 100
+"""
+import argparse
+import dataclasses
+import datetime
+import random
+import tempfile
+import time
+
+from benchmarks.stub_server import Store, serve
+from clover_ui import Facade
+from clover_ui.cache import TransactionCache
+from clover_ui.sync import TransactionSync
+
+CATEGORIES = [{"name": n, "display_name": n.title()} for n in ["groceries", "rent", "salary", "uncategorised"]]
+
+
+def add_transactions(store: Store, rows: int, seed: int = 0):
+    rng = random.Random(seed)
+    start = datetime.datetime(2010, 1, 1)
+    for i in range(rows):
+        store.add_transaction(
+            dict(
+                time=(start + datetime.timedelta(minutes=97 * (len(store.transactions) + i))).isoformat(),
+                transaction_type=rng.choice(["Debit", "Credit", "Transfer"]),
+                payee=rng.choice(["Woolworths", "Coles", "Employer", "Landlord"]),
+                description="",
+                total=round(rng.uniform(-200, 100), 2),
+                category_name=rng.choice(CATEGORIES)["name"],
+            )
+        )
+
+
+def startup(clover, cache_path: str) -> float:
+    start = time.perf_counter()
+    sync = TransactionSync(clover, page_size=10000, cache=TransactionCache(cache_path, host=clover.host))
+    sync.load()
+    sync.refresh()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--delta", type=int, default=100)
+    args = parser.parse_args()
+
+    store = Store(categories=CATEGORIES)
+    add_transactions(store, args.rows)
+    with serve(store) as host, tempfile.TemporaryDirectory() as cache_path:
+        clover = dataclasses.replace(Facade().clover(), host=host)
+        print(f"cache miss        {startup(clover, cache_path):8.3f} s")
+        print(f"cache hit         {startup(clover, cache_path):8.3f} s")
+        add_transactions(store, args.delta, seed=1)
+        print(f"cache hit + delta {startup(clover, cache_path):8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Measure how throughput and memory scale with the number of worker processes
+
+Each worker loads the same generation of the transactions cache, as the app does with
+`CLOVER_SYNC=follow`, then serves filter and aggregate queries for a fixed time. The workers
+either share the memory-mapped cache files or hold a private copy of the transactions, as each
+process did before. Memory is the growth in the proportional set size (PSS) of each worker from
+loading the transactions and building its indexes, summed over the workers.
+
+    python -m benchmarks.bench_workers --rows 1000000 --workers 1 2 4
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+
+from benchmarks.bench_memory import CATEGORIES, make_transactions
+from clover_ui.aggregates import AggregateCube
+from clover_ui.cache import TransactionCache
+from clover_ui.filtering import TransactionFilter
+from clover_ui.store import TransactionStore
+from clover_ui.sync import TransactionSync
+
+
+def pss() -> int:
+    """Proportional set size of this process in bytes"""
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def serve(cache_path: str, private: bool, duration: float, start, results):
+    cube, filters = AggregateCube(), TransactionFilter()
+    baseline = pss()
+    sync = TransactionSync(None, cache=TransactionCache(cache_path), follow=True)
+    sync.load()
+    transactions = sync.transactions.copy(deep=True) if private else sync.transactions
+    cube.rebuild(transactions)
+    filters.rebuild(transactions)
+    months = list(filters.months)
+
+    start.wait()
+    queries, deadline = 0, time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        month = months[queries % len(months)]
+        filters.select(month=month, hide_transfers=True).shape
+        cube.query(month, hide_transfers=bool(queries & 1))
+        queries += 1
+    # the shared pages are only split between the workers once they have all mapped them
+    results.put((queries, pss() - baseline))
+
+
+def run(cache_path: str, workers: int, private: bool, duration: float):
+    context = multiprocessing.get_context("spawn")
+    start, results = context.Barrier(workers + 1), context.Queue()
+    processes = [
+        context.Process(target=serve, args=(cache_path, private, duration, start, results)) for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    start.wait()
+    measured = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    queries = sum(q for q, _ in measured)
+    memory = sum(m for _, m in measured)
+    return queries / duration, memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=3.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_path:
+        store, _, _ = TransactionStore.empty().upsert(make_transactions(args.rows), CATEGORIES)
+        TransactionCache(cache_path).save(store.transactions, store.categories)
+        print(f"{'workers':>8} {'mode':>8} {'queries/s':>10} {'data PSS MiB':>12}")
+        for workers in args.workers:
+            for private in [False, True]:
+                throughput, memory = run(cache_path, workers, private, args.duration)
+                mode = "private" if private else "shared"
+                print(f"{workers:8d} {mode:>8} {throughput:10.0f} {memory / 2 ** 20:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
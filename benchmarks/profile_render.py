@@ -0,0 +1,72 @@
+"""Report where the dashboard and transactions pages spend their render time
+
+Renders each page for every combination of the transaction type switches, for all dates and the
+latest month, with the render cache cleared before each render. Prints the p50/p95 of the
+renders and the p50 of each stage timed by `clover_ui.profiling.RenderProfiler`, in ms.
+
+    python -m benchmarks.profile_render --rows 100000 --repeat 5
+"""
+import argparse
+import itertools
+import tempfile
+
+from benchmarks.bench_startup import CATEGORIES, add_transactions
+from benchmarks.stub_server import Store, serve
+from clover_ui import Facade
+from clover_ui.app import create_app
+from clover_ui.profiling import RenderProfiler
+
+
+def render(client, pathname: str, switches: list, months: list) -> int:
+    """Request the page content and return the size of the response"""
+    inputs = [
+        {"id": "url", "property": "pathname", "value": pathname},
+        {"id": "switches-input", "property": "value", "value": switches},
+        {"id": "month-filter", "property": "data", "value": months},
+        {"id": "transactions-page", "property": "data", "value": 0},
+    ]
+    body = {
+        "output": "page-content.children",
+        "outputs": {"id": "page-content", "property": "children"},
+        "inputs": inputs,
+        "changedPropIds": ["url.pathname"],
+    }
+    response = client.post("/_dash-update-component", json=body)
+    assert response.status_code == 200, response.data
+    return len(response.data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5, help="Renders of each page and filters")
+    args = parser.parse_args()
+
+    store = Store(categories=CATEGORIES)
+    add_transactions(store, args.rows)
+    with serve(store) as host, tempfile.TemporaryDirectory() as cache_path:
+        clover = Facade().clover()
+        clover = type(clover)(request=clover.request, host=host)
+        app = create_app(cache_path=cache_path, follow=False, clover=clover, profiler=RenderProfiler(enabled=True))
+        state = app.state
+        state.sync.refresh()
+        client = app.server.test_client()
+
+        latest = max(state.filters.months).ordinal
+        switches = [[], ["hide_transfers"], ["hide_uncategorised"], ["hide_transfers", "hide_uncategorised"]]
+        for pathname, switch, month in itertools.product(["/page-1", "/page-2"], switches, [None, [latest, latest]]):
+            for _ in range(args.repeat):
+                state.render_cache.clear()
+                render(client, pathname, switch, month)
+        state.stop()
+
+    for row in state.profiler.stats():
+        total = row["total"]
+        if total is None:
+            continue
+        stages = "  ".join(f"{name} {stats['p50'] * 1e3:.1f}" for name, stats in row["stages"].items())
+        print(f"{row['key']:<70} p50 {total['p50'] * 1e3:7.1f}  p95 {total['p95'] * 1e3:7.1f}  | {stages}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Report where the app spends its startup time
+
+Prints the slowest imports made by the `clover_ui` package and `clover_ui.app` (from `python -X importtime`), then the
+time from a fresh interpreter to the app's first responses against a stand-in API:
+
+- import: importing `clover_ui.app`
+- create_app: building the app, which loads no data
+- first layout: the first page load, which loads the cache and starts syncing
+- first dashboard: rendering the dashboard once the transactions are synced
+
+    python -m benchmarks.profile_startup --rows 100000
+"""
+import argparse
+import multiprocessing
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.bench_startup import CATEGORIES, add_transactions
+from benchmarks.stub_server import Store, serve
+
+
+def import_times(module: str) -> List[Tuple[str, float]]:
+    """`(module, cumulative seconds)` of `module`, its parent packages and each of their direct imports"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True
+    )
+    times, children = [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or not line.split("|")[1].strip().isdigit():
+            continue
+        _, cumulative, name = line.split("|")
+        # imports are listed after the imports they make, indented two spaces deeper
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative) / 1e6))
+        elif depth == 0:
+            if name.strip().split(".")[0] == module.split(".")[0]:
+                times += children + [(name.strip(), int(cumulative) / 1e6)]
+            children = []
+    return times
+
+
+def first_responses(host: str, cache_path: str, timings: Dict[str, float]):
+    start = time.perf_counter()
+    from clover_ui import Facade
+    from clover_ui.app import create_app
+
+    timings["import"] = time.perf_counter() - start
+    clover = Facade().clover()
+    clover = type(clover)(request=clover.request, host=host)
+    app = create_app(cache_path=cache_path, follow=False, clover=clover)
+    timings["create_app"] = time.perf_counter() - start
+
+    client = app.server.test_client()
+    client.get("/_dash-layout")
+    timings["first layout"] = time.perf_counter() - start
+
+    while app.state.sync.version == 0:
+        time.sleep(0.01)
+    inputs = [
+        {"id": "url", "property": "pathname", "value": "/page-1"},
+        {"id": "switches-input", "property": "value", "value": []},
+        {"id": "month-filter", "property": "data", "value": None},
+        {"id": "transactions-page", "property": "data", "value": 0},
+    ]
+    body = {
+        "output": "page-content.children",
+        "outputs": {"id": "page-content", "property": "children"},
+        "inputs": inputs,
+        "changedPropIds": ["url.pathname"],
+    }
+    client.post("/_dash-update-component", json=body)
+    timings["first dashboard"] = time.perf_counter() - start
+    app.state.stop()
+
+
+def measure(host: str, cache_path: str) -> Dict[str, float]:
+    # a fresh interpreter, so that nothing is imported yet
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        timings = manager.dict()
+        process = context.Process(target=first_responses, args=(host, cache_path, timings))
+        process.start()
+        process.join()
+        return dict(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    print("slowest imports of clover_ui.app and its clover_ui modules")
+    for name, seconds in sorted(import_times("clover_ui.app"), key=lambda item: -item[1])[: args.top]:
+        print(f"  {name:40} {seconds:8.3f} s")
+
+    store = Store(categories=CATEGORIES)
+    add_transactions(store, args.rows)
+    with serve(store) as host, tempfile.TemporaryDirectory() as cache_path:
+        for run in ["cold cache", "warm cache"]:
+            print(run)
+            for stage, seconds in measure(host, cache_path).items():
+                print(f"  {stage:40} {seconds:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
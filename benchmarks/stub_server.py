@@ -0,0 +1,131 @@
+"""A local stand-in for the Clover API used by the benchmarks
+
+The server keeps categories and transactions in memory and speaks HTTP/1.1 so that
+clients can keep connections alive between requests.
+"""
+import contextlib
+import dataclasses
+import gzip
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+from typing import Dict, List
+from urllib.parse import parse_qs, urlsplit
+
+
+@dataclasses.dataclass
+class Store:
+    categories: List[Dict] = dataclasses.field(default_factory=list)
+    transactions: List[Dict] = dataclasses.field(default_factory=list)
+    bulk: bool = True
+    latency: float = 0.0
+    etags: bool = True
+    # gzip responses to clients which accept it
+    gzip: bool = False
+    lock: threading.Lock = dataclasses.field(default_factory=threading.Lock)
+
+    def add_transaction(self, transaction: Dict) -> Dict:
+        with self.lock:
+            transaction = dict(transaction, id=len(self.transactions) + 1)
+            self.transactions.append(transaction)
+        return transaction
+
+
+class CloverHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    store: Store = None
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Keep the benchmark output clean"""
+
+    def _send_json(self, data, status: int = 200, etag: str = None):
+        if self.store.latency:
+            time.sleep(self.store.latency)
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        if self.store.gzip and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=1)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_modified(self) -> bool:
+        """Answer 304 if the client holds the current version of a GET response"""
+        etag = self._etag()
+        if etag is None or self.headers.get("If-None-Match") != etag:
+            return False
+        if self.store.latency:
+            time.sleep(self.store.latency)
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        return True
+
+    def _etag(self):
+        # the store only grows, so its size is a version of every response
+        if not self.store.etags:
+            return None
+        version = f"{self.path}:{len(self.store.categories)}:{len(self.store.transactions)}"
+        return f'"{hashlib.sha1(version.encode()).hexdigest()}"'
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return json.loads(body) if body else None
+
+    def do_GET(self):
+        if self._not_modified():
+            return
+        etag = self._etag()
+        url = urlsplit(self.path)
+        path, query = url.path, parse_qs(url.query)
+        if path == "/categories":
+            return self._send_json(self.store.categories, etag=etag)
+        if path == "/transactions":
+            # ids are 1-based positions in the list
+            start = int(query.get("since", [0])[0])
+            stop = start + int(query["limit"][0]) if "limit" in query else None
+            return self._send_json(self.store.transactions[start:stop], etag=etag)
+        if path.startswith("/categories/"):
+            name = path.rsplit("/", 1)[-1]
+            if not any(c["name"] == name for c in self.store.categories):
+                return self._send_json({"message": "not found"}, status=404)
+            transactions = [t for t in self.store.transactions if t["category_name"] == name]
+            return self._send_json({"name": name, "transactions": transactions}, etag=etag)
+        return self._send_json({"message": "not found"}, status=404)
+
+    def do_POST(self):
+        payload = self._read_json()
+        if self.path == "/categories":
+            self.store.categories.append(payload)
+            return self._send_json(payload, status=201)
+        if self.path == "/transactions":
+            return self._send_json(self.store.add_transaction(payload), status=201)
+        if self.path == "/transactions/bulk" and self.store.bulk:
+            return self._send_json([self.store.add_transaction(t) for t in payload], status=201)
+        return self._send_json({"message": "not found"}, status=404)
+
+
+@contextlib.contextmanager
+def serve(store: Store = None, host: str = "127.0.0.1", port: int = 0):
+    """Run a stand-in Clover API in a background thread and yield its base URL"""
+    handler = type("Handler", (CloverHandler,), {"store": store or Store()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,239 @@
+"""Run the end-to-end benchmarks against a stand-in API serving synthetic data, as JSON
+
+For each number of rows, the stand-in API serves `benchmarks.synthetic` transactions and the
+benchmarks measure:
+
+- fetch: a cold start which fetches every transaction, a warm start from the cache and a refresh
+  with nothing new
+- callbacks: the latency of the page content callback for each page and month filter, with the
+  render cache cleared before each request, and the size of its response
+- migration: the throughput of `migration.create_transactions` posting a bank export
+- memory: the peak RSS of the process running each benchmark, which each run in a fresh one
+
+The results are written as JSON to `--output`, or stdout, with the commit they were measured at.
+Pass the results of an earlier run as `--baseline` to print the change of each metric and exit
+with status 1 if any got worse by more than `--threshold`.
+
+    python -m benchmarks.suite --rows 10000 100000 1000000 --output results.json
+    python -m benchmarks.suite --rows 10000 100000 1000000 --baseline results.json
+"""
+import argparse
+import datetime
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.profile_render import render
+from benchmarks.stub_server import Store, serve
+from benchmarks.synthetic import CATEGORIES, SyntheticTransactions
+
+# metrics in these units are better when higher, all others when lower
+HIGHER_IS_BETTER = {"rows/s"}
+
+
+def result(name: str, value: float, unit: str, rows: int) -> dict:
+    return dict(name=name, value=float(value), unit=unit, rows=rows)
+
+
+def peak_rss(name: str, rows: int) -> dict:
+    """The peak resident set size of this process so far"""
+    try:
+        # unlike ru_maxrss, which a spawned process inherits from its parent, this starts afresh on exec
+        with open("/proc/self/status") as f:
+            kib = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+    except (OSError, StopIteration):
+        # kilobytes on Linux, bytes on macOS
+        kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform == "darwin" else 1)
+    return result(f"{name}.peak_rss", kib / 1024, "MiB", rows)
+
+
+def make_clover(host: str, **pool):
+    from clover_ui import Facade
+
+    clover = Facade().configure_pool(**pool).clover() if pool else Facade().clover()
+    return type(clover)(request=clover.request, host=host)
+
+
+def bench_fetch(host: str, cache_path: str, rows: int) -> List[dict]:
+    from clover_ui.cache import TransactionCache
+    from clover_ui.sync import TransactionSync
+
+    clover = make_clover(host)
+    results = []
+
+    start = time.perf_counter()
+    sync = TransactionSync(clover, page_size=10000, cache=TransactionCache(cache_path, host=host))
+    sync.load()
+    sync.refresh()
+    elapsed = time.perf_counter() - start
+    results += [
+        result("fetch.cold", elapsed, "s", rows),
+        result("fetch.cold_throughput", len(sync.store) / elapsed, "rows/s", rows),
+        result("fetch.store_memory", sync.store.memory_usage() / 2 ** 20, "MiB", rows),
+    ]
+
+    start = time.perf_counter()
+    sync = TransactionSync(clover, page_size=10000, cache=TransactionCache(cache_path, host=host))
+    sync.load()
+    results.append(result("fetch.warm_load", time.perf_counter() - start, "s", rows))
+    start = time.perf_counter()
+    sync.refresh()
+    results.append(result("fetch.refresh_unchanged", time.perf_counter() - start, "s", rows))
+    return results + [peak_rss("fetch", rows)]
+
+
+def bench_callbacks(host: str, cache_path: str, rows: int, repeat: int) -> List[dict]:
+    from clover_ui.app import create_app
+
+    app = create_app(cache_path=cache_path, follow=False, clover=make_clover(host))
+    state = app.state
+    client = app.server.test_client()
+    start = time.perf_counter()
+    client.get("/_dash-layout")
+    while state.sync.version == 0:
+        time.sleep(0.001)
+    results = [result("callbacks.first_layout", time.perf_counter() - start, "s", rows)]
+
+    latest = max(state.filters.months).ordinal
+    month_filters = {"all": None, "latest_month": [latest, latest], "last_12_months": [latest - 11, latest]}
+    switches = {"all_types": [], "hide_both": ["hide_transfers", "hide_uncategorised"]}
+    for pathname, (months_name, months), (switch_name, switch) in itertools.product(
+        ["/page-1", "/page-2"], month_filters.items(), switches.items()
+    ):
+        name = f"callbacks.{pathname.strip('/')}.{months_name}.{switch_name}"
+        latencies = []
+        for _ in range(repeat):
+            state.render_cache.clear()
+            start = time.perf_counter()
+            size = render(client, pathname, switch, months)
+            latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        render(client, pathname, switch, months)
+        cached = time.perf_counter() - start
+        results += [
+            result(f"{name}.p50", np.percentile(latencies, 50) * 1e3, "ms", rows),
+            result(f"{name}.p95", np.percentile(latencies, 95) * 1e3, "ms", rows),
+            result(f"{name}.cached", cached * 1e3, "ms", rows),
+            result(f"{name}.response_size", size / 1024, "KiB", rows),
+        ]
+    state.stop()
+    return results + [peak_rss("callbacks", rows)]
+
+
+def bench_migration(host: str, rows: int, batch_size: int, workers: int) -> List[dict]:
+    import logging
+
+    import migration
+
+    migration.logger.setLevel(logging.WARNING)
+    clover = make_clover(host, pool_maxsize=max(workers, 10))
+    transactions = SyntheticTransactions(rows)
+    export = transactions.to_export()
+    start = time.perf_counter()
+    failed = migration.create_transactions(
+        clover, export, transactions.export_categories(), batch_size=batch_size, workers=workers
+    )
+    clover.request.close()
+    elapsed = time.perf_counter() - start
+    assert not failed, failed
+    return [result("migration.throughput", rows / elapsed, "rows/s", rows), peak_rss("migration", rows)]
+
+
+def isolated(fn: Callable, *args) -> List[dict]:
+    """Run a benchmark in a fresh interpreter, so that it starts cold and its peak RSS is its own"""
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(fn, args)
+
+
+def environment() -> Dict[str, object]:
+    def git(*args) -> str:
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return dict(
+        commit=git("rev-parse", "HEAD"),
+        dirty=None if status is None else bool(status),
+        time=datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        cpus=os.cpu_count(),
+    )
+
+
+def compare(results: List[dict], baseline: List[dict], threshold: float) -> bool:
+    """Print the change of each metric from the `baseline` and return whether any regressed"""
+    before = {(row["name"], row["rows"]): row for row in baseline}
+    regressed = False
+    for row in results:
+        old = before.get((row["name"], row["rows"]))
+        if old is None or not old["value"]:
+            continue
+        change = row["value"] / old["value"] - 1
+        worse = -change if row["unit"] in HIGHER_IS_BETTER else change
+        flag = "REGRESSION" if worse > threshold else ""
+        regressed = regressed or bool(flag)
+        print(
+            f"{row['rows']:>9} {row['name']:<55} {old['value']:10.3f} -> {row['value']:10.3f} {row['unit']:<7}"
+            f" {change:+7.1%} {flag}",
+            file=sys.stderr,
+        )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--benchmarks", nargs="+", default=["fetch", "callbacks", "migration"])
+    parser.add_argument("--repeat", type=int, default=5, help="Requests of each page and filter")
+    parser.add_argument("--migration-rows", type=int, default=20000, help="Most rows to migrate")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output", help="File to write the results to instead of stdout")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change that is a regression")
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        print(f"{rows} rows", file=sys.stderr)
+        store = Store(categories=CATEGORIES, transactions=SyntheticTransactions(rows))
+        with serve(store) as host, tempfile.TemporaryDirectory() as cache_path:
+            # the callbacks start from the cache the fetch saved
+            if "fetch" in args.benchmarks:
+                results += isolated(bench_fetch, host, cache_path, rows)
+            if "callbacks" in args.benchmarks:
+                results += isolated(bench_callbacks, host, cache_path, rows, args.repeat)
+        if "migration" in args.benchmarks:
+            migration_rows = min(rows, args.migration_rows)
+            with serve(Store(categories=CATEGORIES)) as host:
+                results += isolated(bench_migration, host, migration_rows, args.batch_size, args.workers)
+
+    document = json.dumps(dict(environment=environment(), results=results), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(document + "\n")
+    else:
+        print(document)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Synthetic transactions and categories in the shape of the Clover API data
+
+The transactions are generated as numpy columns and only turned into the API's JSON records when
+a page of them is served, so that a stand-in API can serve 10M rows without holding 10M dicts.
+
+    >>> transactions = SyntheticTransactions(rows=1000000, seed=0)
+    >>> store = Store(categories=CATEGORIES, transactions=transactions)
+    >>> transactions[:2]
+    [{'id': 1, 'time': '2015-01-01T00:10:49', 'transaction_type': 'Debit', ...}, ...]
+"""
+from collections.abc import Sequence
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+# name, display name, weight, sign and median amount of each category
+CATEGORY_PROFILES = [
+    ("groceries", "Groceries", 0.25, -1, 60.0),
+    ("dining", "Dining Out", 0.15, -1, 35.0),
+    ("transport", "Transport", 0.12, -1, 20.0),
+    ("shopping", "Shopping", 0.10, -1, 80.0),
+    ("utilities", "Utilities", 0.04, -1, 120.0),
+    ("entertainment", "Entertainment", 0.05, -1, 40.0),
+    ("health", "Health", 0.03, -1, 90.0),
+    ("rent", "Rent", 0.02, -1, 1800.0),
+    ("salary", "Salary", 0.04, 1, 3500.0),
+    ("uncategorised", "Uncategorised", 0.20, -1, 50.0),
+]
+CATEGORIES = [{"name": name, "display_name": display_name} for name, display_name, *_ in CATEGORY_PROFILES]
+TRANSACTION_TYPES = np.array(["Debit", "Credit", "Transfer"])
+PAYEES = np.array([f"Payee {i}" for i in range(2000)] + ["Woolworths", "Coles", "Employer", "Landlord"])
+
+# the history spans `rows / ROWS_PER_DAY` days, and at most `MAX_DAYS` so the times stay realistic
+ROWS_PER_DAY = 20
+MAX_DAYS = 30 * 365
+
+
+class SyntheticTransactions(Sequence):
+    """A reproducible list of API transaction records, generated as columns and formatted on access
+
+    The records are sorted by time and their `id` is their 1-based position, as the stand-in API
+    expects. Transactions appended later, e.g. by `Store.add_transaction`, are kept as records.
+
+    Args:
+        rows: Number of transactions
+        seed: Seed of the random generator
+        start: Time of the first transaction
+    """
+
+    def __init__(self, rows: int, seed: int = 0, start: str = "2015-01-01"):
+        rng = np.random.default_rng(seed)
+        days = min(max(rows // ROWS_PER_DAY, 1), MAX_DAYS)
+        self.start = pd.Timestamp(start)
+        self.seconds = np.sort(rng.integers(0, days * 86400, rows))
+
+        weights = np.array([profile[2] for profile in CATEGORY_PROFILES])
+        self.category_codes = rng.choice(len(CATEGORY_PROFILES), rows, p=weights / weights.sum())
+        signs = np.array([profile[3] for profile in CATEGORY_PROFILES])[self.category_codes]
+        medians = np.array([profile[4] for profile in CATEGORY_PROFILES])[self.category_codes]
+        self.totals = (signs * medians * rng.lognormal(0, 0.5, rows)).round(2)
+        # income is a credit, about one in ten expenses is a transfer between accounts
+        self.type_codes = np.where(signs > 0, 1, np.where(rng.random(rows) < 0.1, 2, 0))
+        self.payee_codes = rng.integers(0, len(PAYEES), rows)
+        self.rows = rows
+        self.appended: List[Dict] = []
+
+    def __len__(self) -> int:
+        return self.rows + len(self.appended)
+
+    def __getitem__(self, item: Union[int, slice]):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            records = self._records(min(start, self.rows), min(stop, self.rows))
+            return records + self.appended[max(start - self.rows, 0) : max(stop - self.rows, 0)]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(item)
+        return self._records(item, item + 1)[0] if item < self.rows else self.appended[item - self.rows]
+
+    def append(self, transaction: Dict):
+        self.appended.append(transaction)
+
+    def times(self, start: int = 0, stop: int = None) -> pd.Index:
+        """The ISO times of the transactions from `start` to `stop`, formatted on demand to save memory"""
+        return (self.start + pd.to_timedelta(self.seconds[start:stop], unit="s")).strftime("%Y-%m-%dT%H:%M:%S")
+
+    def _records(self, start: int, stop: int) -> List[Dict]:
+        names = [CATEGORY_PROFILES[code][0] for code in self.category_codes[start:stop]]
+        return [
+            dict(
+                id=i + 1,
+                time=time,
+                transaction_type=transaction_type,
+                payee=payee,
+                description="",
+                total=float(total),
+                category_name=name,
+            )
+            for i, time, transaction_type, payee, total, name in zip(
+                range(start, stop),
+                self.times(start, stop),
+                TRANSACTION_TYPES[self.type_codes[start:stop]],
+                PAYEES[self.payee_codes[start:stop]],
+                self.totals[start:stop],
+                names,
+            )
+        ]
+
+    def to_frame(self) -> pd.DataFrame:
+        """The generated transactions as the frame `CloverAPI.fetch_transactions_frame` returns"""
+        return pd.DataFrame(
+            {
+                "id": np.arange(1, self.rows + 1),
+                "time": self.times(),
+                "transaction_type": TRANSACTION_TYPES[self.type_codes],
+                "payee": PAYEES[self.payee_codes],
+                "description": "",
+                "total": self.totals,
+                "category_name": np.array([profile[0] for profile in CATEGORY_PROFILES])[self.category_codes],
+            }
+        )
+
+    def to_export(self, rows: int = None) -> pd.DataFrame:
+        """The first `rows` transactions as a bank export, as returned by `migration.load_csvs`"""
+        rows = self.rows if rows is None else min(rows, self.rows)
+        display_names = np.array([profile[1] for profile in CATEGORY_PROFILES])
+        return pd.DataFrame(
+            {
+                "Time": (self.start + pd.to_timedelta(self.seconds[:rows], unit="s")).strftime("%Y-%m-%d %H:%M"),
+                "Transaction Type": TRANSACTION_TYPES[self.type_codes[:rows]],
+                "Payee": PAYEES[self.payee_codes[:rows]],
+                "Description": "",
+                "Total (AUD)": self.totals[:rows],
+                "Category": display_names[self.category_codes[:rows]],
+            }
+        )
+
+    @classmethod
+    def export_categories(cls) -> Dict[str, str]:
+        """The mapping from export categories to category names that `migration.get_categories` loads"""
+        return {display_name: name for name, display_name, *_ in CATEGORY_PROFILES}
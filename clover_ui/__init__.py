@@ -1,22 +1,131 @@
 import dataclasses
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Sequence, Union
 
-from clover_ui.api import CloverAPI
-from clover_ui.http import RequestsWithRetry, retrying_factory
+from clover_ui.http import CircuitBreaker, RequestsWithRetry, retrying_factory
+from clover_ui.metrics import Instrumentation
+from clover_ui.response_cache import ResponseCache
+
+if TYPE_CHECKING:
+    from clover_ui.api import CloverAPI
+    from clover_ui.async_api import AsyncCloverAPI
 
 
 @dataclasses.dataclass(frozen=False)
 class Facade:
-    """A facade used for creating classes that interact with Nearmap's public APIs"""
+    """A facade used for creating classes that interact with Nearmap's public APIs
+
+    The facade owns the connection pool of its `RequestsWithRetry`, so close it when done:
+
+    Examples:
+        >>> with Facade().configure_retry().configure_pool(pool_maxsize=4) as facade:
+        ...     categories = facade.clover().fetch_categories()
+    """
 
     request: RequestsWithRetry = dataclasses.field(init=False)
 
     def __post_init__(self):
         self.request = RequestsWithRetry(retrying=retrying_factory())
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def configure_retry(self, **kwargs):
         """Configure the retrying logic by passing keyword arguments destined for the `retrying.Retrying` class"""
-        self.request = RequestsWithRetry(retrying=retrying_factory(**kwargs))
+        self.request.close()
+        self.request = dataclasses.replace(self.request, retrying=retrying_factory(**kwargs))
+        return self
+
+    def configure_pool(self, **kwargs):
+        """Configure the connection pool by passing keyword arguments destined for the `RequestsWithRetry` class
+        e.g. `pool_maxsize`, `pool_block` or `keep_alive`"""
+        self.request.close()
+        self.request = dataclasses.replace(self.request, **kwargs)
+        return self
+
+    def configure_cache(
+        self,
+        endpoints: Optional[Sequence[str]] = ("/categories", "/transactions"),
+        skip_params: Sequence[str] = ("since",),
+        maxsize: int = 256,
+        path: Union[str, Path, None] = None,
+        disk_maxsize: int = 1024,
+    ):
+        """Cache decoded GET responses and revalidate them with ETag/Last-Modified, see `ResponseCache`
+
+        By default the categories and the first page of transactions are cached, but not the pages
+        fetched `since` a transaction id: those hold the rest of the history, which the
+        `TransactionSync` already keeps, and a refresh asks for them with a new id each time.
+
+        Args:
+            endpoints: URL paths to cache, or None to cache every GET
+            skip_params: Query parameters whose requests aren't cached
+            maxsize: Maximum number of responses kept in memory
+            path: Directory to also keep the responses in, so they survive restarts
+            disk_maxsize: Maximum number of responses kept on disk
+        """
+        cache = ResponseCache(
+            maxsize=maxsize, endpoints=endpoints, skip_params=skip_params, path=path, disk_maxsize=disk_maxsize
+        )
+        self.request.close()
+        self.request = dataclasses.replace(self.request, cache=cache)
         return self
 
-    def clover(self) -> CloverAPI:
+    def configure_instrumentation(self, *hooks: Instrumentation):
+        """Report every request to `hooks`, e.g. a `MetricsCollector` or `LoggingInstrumentation`
+
+        Examples:
+            >>> metrics = MetricsCollector()
+            >>> clover = Facade().configure_retry().configure_instrumentation(metrics).clover()
+        """
+        self.request.close()
+        self.request = dataclasses.replace(self.request, hooks=tuple(hooks))
+        return self
+
+    def configure_circuit_breaker(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        """Fail requests fast while the API keeps failing instead of retrying each one, see `CircuitBreaker`
+
+        Args:
+            failure_threshold: Failed attempts in a row which open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial request
+        """
+        breaker = CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+        self.request.close()
+        self.request = dataclasses.replace(self.request, circuit_breaker=breaker)
+        return self
+
+    def close(self):
+        """Release the pooled connections"""
+        self.request.close()
+
+    def clover(self) -> "CloverAPI":
+        # imported here so that importing the package doesn't import pandas
+        from clover_ui.api import CloverAPI
+
         return CloverAPI(request=self.request)
+
+    def async_clover(self, max_concurrency: Optional[int] = None) -> "AsyncCloverAPI":
+        """An asyncio client with the same retry policy, pool size, hooks and circuit breaker. Needs the `async` extra.
+
+        Args:
+            max_concurrency: Maximum number of requests in flight, or None for no limit beyond the pool
+        """
+        from clover_ui.async_api import AsyncCloverAPI
+        from clover_ui.async_http import AsyncRequestsWithRetry
+
+        request = AsyncRequestsWithRetry(
+            retrying=self.request.retrying,
+            headers=self.request.headers,
+            pool_maxsize=self.request.pool_maxsize,
+            max_concurrency=max_concurrency,
+            keep_alive=self.request.keep_alive,
+            json_backend=self.request.json_backend,
+            compress_requests=self.request.compress_requests,
+            compress_min_size=self.request.compress_min_size,
+            hooks=self.request.hooks,
+            circuit_breaker=self.request.circuit_breaker,
+        )
+        return AsyncCloverAPI(request=request)
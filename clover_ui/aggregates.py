@@ -0,0 +1,181 @@
+import dataclasses
+import threading
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# The levels of the aggregates kept for each month
+LEVELS = ["days", "transfer", "uncategorised", "display_name"]
+VALUES = ["income", "expenses", "count"]
+
+# The most bars the spend chart shows, the totals are bucketed into longer periods to stay under it
+MAX_BARS = 120
+
+# The periods the spend chart can be bucketed by, from the shortest: name and pandas frequency
+PERIODS = [("day", "D"), ("week", "W-SUN"), ("month", "M"), ("quarter", "Q"), ("year", "A")]
+
+
+@dataclasses.dataclass(frozen=True)
+class Aggregates:
+    """Income and expense totals of a selection of transactions
+
+    Args:
+        by_category: `display_name`, `income` and `expenses` of each category
+        by_day: `days`, `income` and `expenses` of each day with transactions
+        by_period: `start`, `income` and `expenses` of each period with transactions, see `bucket`
+        period: The name of the periods in `by_period`, one of `PERIODS`
+    """
+
+    by_category: pd.DataFrame
+    by_day: pd.DataFrame
+    by_period: pd.DataFrame
+    period: str
+
+
+def bucket(by_day: pd.DataFrame, max_bars: int = MAX_BARS) -> Tuple[pd.DataFrame, str]:
+    """Sum daily totals by the shortest of `PERIODS` which spans their range in at most `max_bars` periods
+
+    Weeks start on Mondays. The range of a year of totals is bucketed by week, and of ten years by
+    month, so the spend chart has a bounded number of bars however long the history is.
+
+    Returns:
+        The `start`, `income` and `expenses` of each period with transactions, and the name of the period
+    """
+    days = pd.DatetimeIndex(by_day.days)
+    if days.empty:
+        return pd.DataFrame({"start": days, "income": [], "expenses": []}), PERIODS[0][0]
+    for name, freq in PERIODS:
+        periods = days.to_period(freq)
+        if periods.max().ordinal - periods.min().ordinal < max_bars:
+            break
+    totals = by_day[["income", "expenses"]].groupby(periods.start_time).sum()
+    return totals.rename_axis("start").reset_index(), name
+
+
+def aggregate(transactions: pd.DataFrame) -> Dict[pd.Period, pd.DataFrame]:
+    """Sum the income and expenses of transactions in the layout of a `TransactionStore` by month and `LEVELS`"""
+    total = transactions.cents.values / 100
+    days = transactions.index.normalize()
+    grouped = pd.DataFrame(
+        {
+            "month": days.to_period("M"),
+            "days": days,
+            "transfer": (transactions.transaction_type == "Transfer").values,
+            "uncategorised": (transactions.category_name == "uncategorised").values,
+            "display_name": transactions.display_name.astype(object).values,
+            "income": np.where(total >= 0, total, 0.0),
+            "expenses": np.where(total < 0, total, 0.0),
+            "count": 1,
+        }
+    ).groupby(["month"] + LEVELS, sort=False)[VALUES].sum()
+    return {month: df.droplevel("month") for month, df in grouped.groupby(level="month", sort=False)}
+
+
+@dataclasses.dataclass(frozen=False)
+class AggregateCube:
+    """Precomputed totals behind the dashboard
+
+    For each month the cube holds the income and expenses of every combination of day, transfer
+    flag, uncategorised flag and category, so a query never touches the raw transactions. Query
+    results are memoized per `(month, hide_transfers, hide_uncategorised)` until the months they
+    cover change. Use `apply` as a `TransactionSync` listener to keep the cube up to date.
+
+    Args:
+        months: The aggregates of each month, see `aggregate`
+        max_bars: The most periods the totals over time are bucketed into, see `bucket`
+
+    Examples:
+        >>> cube = AggregateCube()
+        >>> cube.rebuild(transactions)
+        >>> aggregates = cube.query(pd.Period("2020-03"), hide_transfers=True, hide_uncategorised=True)
+    """
+
+    months: Dict[pd.Period, pd.DataFrame] = dataclasses.field(default_factory=dict)
+    max_bars: int = MAX_BARS
+    _results: Dict[Tuple, Aggregates] = dataclasses.field(init=False, repr=False, default_factory=dict)
+    _lock: threading.Lock = dataclasses.field(init=False, repr=False, default_factory=threading.Lock)
+
+    def rebuild(self, transactions: pd.DataFrame):
+        """Replace the cube with the aggregates of `transactions`"""
+        months = aggregate(transactions)
+        with self._lock:
+            self.months = months
+            self._results = {}
+
+    def update(self, added: pd.DataFrame, removed: Optional[pd.DataFrame] = None):
+        """Add the `added` transactions to the cube and take away the `removed` ones"""
+        changes = aggregate(added)
+        if removed is not None and not removed.empty:
+            for month, df in aggregate(removed).items():
+                changes[month] = changes[month].sub(df, fill_value=0) if month in changes else -df
+        with self._lock:
+            months = dict(self.months)
+            for month, change in changes.items():
+                df = months[month].add(change, fill_value=0) if month in months else change
+                df = df[df["count"] > 0]
+                if df.empty:
+                    # as if rebuilt without the month's transactions
+                    months.pop(month, None)
+                else:
+                    months[month] = df
+            self.months = months
+            self._results = {
+                key: result for key, result in self._results.items() if key[0] is not None and key[0] not in changes
+            }
+
+    def apply(self, update):
+        """Update the cube from a `clover_ui.sync.Update`"""
+        if update.full:
+            self.rebuild(update.transactions)
+        else:
+            self.update(update.added, update.removed)
+
+    def query(
+        self,
+        month: Union[None, pd.Period, Tuple[pd.Period, pd.Period]] = None,
+        hide_transfers: bool = False,
+        hide_uncategorised: bool = False,
+    ) -> Aggregates:
+        """The totals of one month, of a `(first, last)` range of months, or of every month if `month` is None
+
+        The totals of every month and of single months are memoized, those of longer ranges aren't.
+        """
+        months = self.months
+        if month is None:
+            frames = list(months.values())
+        elif isinstance(month, tuple):
+            first, last = month
+            frames = [df for period, df in months.items() if first <= period <= last]
+            if first == last:
+                month = first
+        else:
+            frames = [months[month]] if month in months else []
+
+        key = (month, hide_transfers, hide_uncategorised)
+        memoize = not isinstance(month, tuple)
+        result = self._results.get(key) if memoize else None
+        if result is not None:
+            return result
+
+        if frames:
+            df = pd.concat(frames).reset_index()
+        else:
+            df = pd.DataFrame(columns=LEVELS + VALUES)
+        if hide_transfers:
+            df = df[~df.transfer.astype(bool)]
+        if hide_uncategorised:
+            df = df[~df.uncategorised.astype(bool)]
+
+        by_category = df.groupby("display_name", sort=False)[["income", "expenses"]].sum()
+        by_day = df.groupby("days")[["income", "expenses"]].sum().reset_index()
+        by_period, period = bucket(by_day, self.max_bars)
+        result = Aggregates(
+            by_category=by_category.reset_index(), by_day=by_day, by_period=by_period, period=period
+        )
+
+        with self._lock:
+            # only keep the result if the cube hasn't changed since we read it
+            if memoize and self.months is months:
+                self._results[key] = result
+        return result
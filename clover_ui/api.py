@@ -1,8 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
 import dataclasses
-from typing import List, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
 
 from clover_ui.http import RequestsWithRetry
 
+# The transaction fields with a numeric type, decoded straight into typed arrays
+TRANSACTION_DTYPES = {"id": np.int64, "total": np.float64}
+
+Page = Union[list, pd.DataFrame]
+
+
+def records_to_frame(records: List[dict], dtypes: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    """Convert decoded JSON records into a `pandas.DataFrame` one column at a time
+
+    Each column is gathered into a list, or a typed array for the fields in `dtypes`, which is
+    faster than `pandas.DataFrame.from_records` and skips its type inference. The columns are the
+    keys of the first record. Returns an empty frame without columns if there are no records.
+    """
+    if not records:
+        return pd.DataFrame()
+    dtypes = dtypes or {}
+    columns = {}
+    for key in records[0]:
+        values = [record.get(key) for record in records]
+        if key in dtypes:
+            try:
+                values = np.array(values, dtype=dtypes[key])
+            except (TypeError, ValueError):
+                # e.g. a missing id, which is left for pandas to infer
+                pass
+        columns[key] = values
+    return pd.DataFrame(columns)
+
+
+def _page_after(page: Page, since: int) -> Page:
+    """The transactions of a page of records or a frame with an id greater than `since`"""
+    if isinstance(page, pd.DataFrame):
+        return page[page.id.values > since] if len(page) else page
+    return [transaction for transaction in page if transaction["id"] > since]
+
+
+def _last_id(page: Page) -> int:
+    if isinstance(page, pd.DataFrame):
+        return int(page.id.max())
+    return max(transaction["id"] for transaction in page)
+
 
 @dataclasses.dataclass(frozen=True)
 class CloverAPI:
@@ -25,27 +70,108 @@ class CloverAPI:
     def fetch_categories(self) -> Union[list, dict]:
         """Get a list of all of the existing categories"""
         url = f"{self.host}/categories"
-        data = self.request.get(url=url, callback=lambda r: r.json())
+        data = self.request.get(url=url, callback=self.request.decode_json)
         return data
 
     def create_category(self, name: str, display_name: str):
         """Create a new transaction category"""
         url = f"{self.host}/categories"
         payload = dict(name=name, display_name=display_name)
-        data = self.request.post(url=url, json=payload, callback=lambda r: r.json())
+        data = self.request.post(url=url, json=payload, callback=self.request.decode_json)
 
-    def fetch_transactions_by_category(self, category: str) -> list:
-        """Fetch all transactions for a particular category"""
+    def fetch_transactions_by_category(
+        self, category: str, since: Optional[int] = None, limit: Optional[int] = None
+    ) -> list:
+        """Fetch all transactions for a particular category, or a page of them (see `fetch_transactions`)"""
         url = f"{self.host}/categories/{category}"
-        data = self.request.get(url=url, callback=lambda r: r.json())
+        params = {key: value for key, value in dict(since=since, limit=limit).items() if value is not None}
+        data = self.request.get(url=url, params=params, callback=self.request.decode_json)
         return data["transactions"]
 
-    def fetch_transactions(self) -> list:
-        """Fetch all transactions"""
+    def iter_transactions_by_category(
+        self, category: str, since: Optional[int] = None, page_size: int = 1000, prefetch: bool = True
+    ) -> Iterator[dict]:
+        """Stream the transactions of a category one page at a time (see `iter_transaction_pages`)"""
+
+        def _fetch(since, limit):
+            return self.fetch_transactions_by_category(category, since=since, limit=limit)
+
+        for page in self._iter_pages(_fetch, since, page_size, prefetch):
+            yield from page
+
+    def fetch_transactions(self, since: Optional[int] = None, limit: Optional[int] = None) -> list:
+        """Fetch all transactions, or only those with an id greater than `since`
+
+        Args:
+            since: Only fetch transactions with an id greater than this
+            limit: Fetch at most this many transactions, in order of id
+        """
         url = f"{self.host}/transactions"
-        data = self.request.get(url=url, callback=lambda r: r.json())
+        params = {key: value for key, value in dict(since=since, limit=limit).items() if value is not None}
+        data = self.request.get(url=url, params=params, callback=self.request.decode_json)
         return data
 
+    def iter_transaction_pages(
+        self, since: Optional[int] = None, page_size: int = 1000, prefetch: bool = True
+    ) -> Iterator[list]:
+        """Fetch transactions with an id greater than `since` one page at a time
+
+        The last id of each page is the `since` cursor of the next request. If the API doesn't
+        support paging, the first page holds every transaction. With `prefetch`, the next page is
+        requested on a background thread while the caller processes the current one.
+        """
+        return self._iter_pages(self.fetch_transactions, since, page_size, prefetch)
+
+    def iter_transactions(
+        self, since: Optional[int] = None, page_size: int = 1000, prefetch: bool = True
+    ) -> Iterator[dict]:
+        """Stream transactions with an id greater than `since` (see `iter_transaction_pages`)"""
+        for page in self.iter_transaction_pages(since=since, page_size=page_size, prefetch=prefetch):
+            yield from page
+
+    def fetch_transactions_frame(self, since: Optional[int] = None, page_size: int = 1000) -> pd.DataFrame:
+        """Fetch transactions into a `pandas.DataFrame`
+
+        Each page is decoded by the request's JSON backend and converted to typed columns as soon
+        as it arrives (see `records_to_frame`), so only one page of dicts is held at a time.
+        Returns an empty frame without columns if there are no transactions.
+        """
+
+        def _fetch(since, limit):
+            url = f"{self.host}/transactions"
+            params = {key: value for key, value in dict(since=since, limit=limit).items() if value is not None}
+            return self.request.get(url=url, params=params, callback=self._decode_frame)
+
+        frames = list(self._iter_pages(_fetch, since, page_size, prefetch=True))
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def _decode_frame(self, response) -> pd.DataFrame:
+        return records_to_frame(self.request.decode_json(response), TRANSACTION_DTYPES)
+
+    @classmethod
+    def _iter_pages(
+        cls, fetch: Callable[[Optional[int], int], Page], since: Optional[int], page_size: int, prefetch: bool
+    ) -> Iterator[Page]:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            page = fetch(since, page_size)
+            while True:
+                if since is not None:
+                    # an API without paging ignores `since` and returns everything
+                    page = _page_after(page, since)
+                more = len(page) >= page_size
+                future = None
+                if more:
+                    since = _last_id(page)
+                    if prefetch:
+                        future = executor.submit(fetch, since, page_size)
+                if len(page):
+                    yield page
+                if not more:
+                    return
+                page = future.result() if future is not None else fetch(since, page_size)
+
     def send_transaction(
         self,
         time: str,
@@ -65,5 +191,22 @@ class CloverAPI:
             total=total,
             category_name=category_name,
         )
-        response = self.request.post(url=url, json=payload, callback=lambda r: r.json())
+        response = self.request.post(url=url, json=payload, callback=self.request.decode_json)
         return response["id"]
+
+    def send_transactions(self, transactions: List[dict], chunk_size: int = 500) -> List[int]:
+        """Create many transactions using the bulk endpoint
+
+        The transactions are posted in chunks of at most `chunk_size`. Each transaction is a
+        dict with the same keys as the arguments of `send_transaction`.
+
+        Raises:
+            FileNotFoundError, MethodNotAllowedError: If the API has no bulk endpoint
+        """
+        url = f"{self.host}/transactions/bulk"
+        ids = []
+        for start in range(0, len(transactions), chunk_size):
+            payload = transactions[start : start + chunk_size]
+            response = self.request.post(url=url, json=payload, callback=self.request.decode_json)
+            ids.extend(transaction["id"] for transaction in response)
+        return ids
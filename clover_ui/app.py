@@ -0,0 +1,445 @@
+import dataclasses
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Iterable, Optional, Tuple, Union
+
+from clover_ui import Facade
+from clover_ui.aggregates import AggregateCube
+from clover_ui.api import CloverAPI
+from clover_ui.cache import DEFAULT_CACHE_PATH, TransactionCache
+from clover_ui.dashboard import generate_dashboard
+from clover_ui.filtering import TransactionFilter, month_label
+from clover_ui.metrics import MetricsCollector
+from clover_ui.profiling import RenderProfiler, stage
+from clover_ui.render_cache import RenderCache
+from clover_ui.sync import TransactionSync
+from clover_ui.transactions import generate_transactions_list
+import dash
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+import flask
+import dash_bootstrap_components as dbc
+import dash_core_components as dcc
+import dash_html_components as html
+import pandas as pd
+
+# seconds between refreshes from the API, or between polls of the cache when following it
+REFRESH_INTERVAL = 60.0
+FOLLOW_INTERVAL = 5.0
+
+# rendered pages are cached per filter state and data version, and dropped whenever the data changes
+RENDER_CACHE_SIZE = 256
+# seconds a rendered page is served for, None keeps it until it is evicted or the data changes
+RENDER_CACHE_TTL = None
+
+# the most labelled marks on the month slider, so the layout doesn't grow with the history
+MONTH_MARKS = 6
+
+# the style arguments for the sidebar. We use position:fixed and a fixed width
+SIDEBAR_STYLE = {
+    "position": "fixed",
+    "top": 0,
+    "left": 0,
+    "bottom": 0,
+    "width": "22rem",
+    "padding": "2rem 1rem",
+    "background-color": "#f8f9fa",
+}
+
+# the styles for the main content position it to the right of the sidebar and
+# add some padding.
+CONTENT_STYLE = {
+    "margin-left": "24rem",
+    "margin-right": "2rem",
+    "padding": "2rem 1rem",
+}
+
+
+@dataclasses.dataclass(frozen=False)
+class AppState:
+    """The data behind the app, which is only loaded when first used
+
+    Nothing touches the network or the disk until the first request reads `sync`, which builds
+    the API client, loads the cache and starts syncing in the background. The aggregate cube,
+    filter index and render cache are kept up to date as `TransactionSync` listeners, and the
+    requests of the default API client are counted by `metrics`. Renders are timed by `profiler`
+    if it is enabled.
+
+    The cached transactions are served as soon as they are loaded, whether or not the API is up,
+    and revalidated in the background. The default API client has a circuit breaker, so while the
+    API is down each background refresh fails fast rather than backing off through every retry.
+
+    Args:
+        cache_path: The transactions cache directory
+        follow: Only load the cache other processes save, see `TransactionSync`
+        clover: The API client, built with the default retry settings and a `ResponseCache` if None
+        profiler: Times the stages of each render, see `RenderProfiler`
+        render_cache: The cache of rendered pages
+    """
+
+    cache_path: Union[str, Path] = DEFAULT_CACHE_PATH
+    follow: bool = False
+    clover: Optional[CloverAPI] = None
+    profiler: RenderProfiler = dataclasses.field(default_factory=RenderProfiler)
+    render_cache: RenderCache = dataclasses.field(
+        default_factory=lambda: RenderCache(maxsize=RENDER_CACHE_SIZE, ttl=RENDER_CACHE_TTL)
+    )
+
+    metrics: MetricsCollector = dataclasses.field(init=False, default_factory=MetricsCollector)
+    cube: AggregateCube = dataclasses.field(init=False, default_factory=AggregateCube)
+    filters: TransactionFilter = dataclasses.field(init=False, default_factory=TransactionFilter)
+    _sync: Optional[TransactionSync] = dataclasses.field(init=False, repr=False, default=None)
+    _lock: threading.Lock = dataclasses.field(init=False, repr=False, default_factory=threading.Lock)
+
+    @property
+    def sync(self) -> TransactionSync:
+        """The started `TransactionSync`, which is created by the first caller"""
+        if self._sync is None:
+            with self._lock:
+                if self._sync is None:
+                    self._sync = self._start()
+        return self._sync
+
+    def _start(self) -> TransactionSync:
+        # unchanged categories and pages of transactions are revalidated rather than downloaded again
+        clover = self.clover or (
+            Facade()
+            .configure_retry()
+            .configure_cache()
+            .configure_instrumentation(self.metrics)
+            .configure_circuit_breaker()
+            .clover()
+        )
+        return TransactionSync(
+            clover,
+            interval=FOLLOW_INTERVAL if self.follow else REFRESH_INTERVAL,
+            cache=TransactionCache(self.cache_path, host=clover.host),
+            listeners=[self.cube.apply, self.filters.apply, self.render_cache.clear],
+            follow=self.follow,
+        ).start()
+
+    def stop(self):
+        if self._sync is not None:
+            self._sync.stop()
+
+
+def month_slider(months: Iterable[pd.Period]) -> list:
+    """A range slider over the months of transactions, by their `pd.Period` ordinals
+
+    Only the first and last month and a few in between are labelled, so the slider's size is the
+    same however many months there are.
+    """
+    ordinals = sorted(month.ordinal for month in months)
+    first, last = (ordinals[0], ordinals[-1]) if ordinals else (0, 0)
+    step = max(-(-(last - first) // (MONTH_MARKS - 1)), 1)
+    marks = {
+        ordinal: pd.Period(ordinal=ordinal, freq="M").strftime("%b %Y")
+        for ordinal in sorted({*range(first, last, step), last})
+    }
+    return [
+        dbc.Label("By month", style={"padding-top": "1cm"}),
+        html.Br(),
+        dbc.Button("Show all dates", color="light", id="All"),
+        html.Div(
+            dcc.RangeSlider(
+                id="month-range",
+                min=first,
+                max=last,
+                step=1,
+                value=[first, last] if ordinals else None,
+                marks=marks,
+                allowCross=False,
+                disabled=not ordinals,
+            ),
+            style={"padding-top": "0.5cm"},
+        ),
+        html.P(id="month-range-label", className="lead", style={"padding-top": "0.2cm"}),
+    ]
+
+
+def describe_months(months: Optional[Tuple[pd.Period, pd.Period]]) -> str:
+    """A label for a `(first, last)` range of months, or for all dates if `months` is None"""
+    if months is None:
+        return "All dates"
+    first, last = months
+    if first == last:
+        return first.strftime("%B %Y")
+    return f"{first.strftime('%b %Y')} to {last.strftime('%b %Y')}"
+
+
+def describe_age(seconds: float) -> str:
+    """A rough duration, e.g. "3 hours" """
+    for unit, size in [("day", 86400), ("hour", 3600), ("minute", 60)]:
+        if seconds >= size:
+            count = int(seconds // size)
+            return f"{count} {unit}{'s' if count > 1 else ''}"
+    return "less than a minute"
+
+
+def stale_warning(sync: TransactionSync) -> dbc.Alert:
+    """A warning that the transactions shown are out of date because the last refresh failed"""
+    synced = "" if sync.synced_at is None else f", synced {describe_age(time.time() - sync.synced_at)} ago"
+    return dbc.Alert(
+        f"Can't reach the Clover API, showing the transactions held{synced}. Retrying in the background.",
+        color="warning",
+    )
+
+
+switches = dbc.FormGroup(
+    [
+        dbc.Label("By transaction type"),
+        dbc.Checklist(
+            options=[
+                {"label": "Hide transfers", "value": "hide_transfers"},
+                {"label": "Hide uncategorised", "value": "hide_uncategorised"},
+            ],
+            value=["hide_transfers", "hide_uncategorised"],
+            id="switches-input",
+            switch=True,
+        ),
+    ]
+)
+
+
+content = html.Div(id="page-content", style=CONTENT_STYLE)
+
+
+def make_layout(state: AppState):
+    """Build the layout on each page load so that the month slider follows the synced transactions"""
+
+    def serve_layout():
+        # the first page load starts syncing the transactions
+        state.sync
+        sidebar = html.Div(
+            [
+                html.H1("Clover"),
+                html.P("A budgeting app that keeps it simple", className="lead"),
+                dbc.Nav(
+                    [
+                        dbc.NavLink("Dashboard", href="/page-1", id="page-1-link"),
+                        dbc.NavLink("Transactions", href="/page-2", id="page-2-link"),
+                        dbc.NavLink("Categories", href="/page-3", id="page-3-link"),
+                    ],
+                    vertical=True,
+                    pills=True,
+                ),
+                html.H4("Filter", style={"padding-top": "1cm"}),
+                switches,
+                html.Div(month_slider(state.filters.months)),
+            ],
+            style=SIDEBAR_STYLE,
+        )
+        stores = [dcc.Store(id="month-filter"), dcc.Store(id="transactions-page", data=0)]
+        return html.Div([dcc.Location(id="url"), *stores, sidebar, content])
+
+    return serve_layout
+
+
+def render_page(
+    state: AppState,
+    pathname: str,
+    hide_transfers: bool,
+    hide_uncategorised: bool,
+    months: Optional[Tuple[pd.Period, pd.Period]],
+    page: int = 0,
+):
+    """Render a page of the transactions of a `(first, last)` range of months, or of all dates if `months` is None"""
+    if pathname == "/page-1":
+        with stage("query"):
+            aggregates = state.cube.query(months, hide_transfers, hide_uncategorised)
+        return generate_dashboard(aggregates)
+    elif pathname == "/page-2":
+        start, end = (months[0].start_time, (months[1] + 1).start_time) if months is not None else (None, None)
+        with stage("filter"):
+            df = state.filters.select(
+                start=start, end=end, hide_transfers=hide_transfers, hide_uncategorised=hide_uncategorised
+            )
+        return generate_transactions_list(df, page=page)
+    elif pathname == "/page-3":
+        return html.P("Oh cool, this is page 3!")
+    # If the user tries to reach a different page, return a 404 message
+    return dbc.Jumbotron([html.H1("Oops!"), html.P(f"We couldn't find the page you're looking for"),])
+
+
+def register_callbacks(app: dash.Dash, state: AppState):
+    # this callback uses the current pathname to set the active state of the
+    # corresponding nav link to true, allowing users to tell see page they are on
+    @app.callback(
+        [Output(f"page-{i}-link", "active") for i in range(1, 4)], [Input("url", "pathname")],
+    )
+    def toggle_active_links(pathname):
+        if pathname == "/":
+            # Treat page 1 as the homepage / index
+            return True, False, False
+        return [pathname == f"/page-{i}" for i in range(1, 4)]
+
+    @app.callback(
+        Output("month-range", "value"),
+        [Input("All", "n_clicks")],
+        [State("month-range", "min"), State("month-range", "max")],
+    )
+    def show_all_dates(n_clicks, first, last):
+        # also called when the page loads, before the button was clicked
+        if not n_clicks:
+            raise PreventUpdate
+        return [first, last]
+
+    @app.callback(
+        [Output("month-filter", "data"), Output("month-range-label", "children")], [Input("month-range", "value")],
+    )
+    def select_months(value):
+        """Store the `[first, last]` month ordinals selected, or None to show all dates"""
+        months = state.filters.month_range(value)
+        return (None if months is None else [months[0].ordinal, months[1].ordinal]), describe_months(months)
+
+    @app.callback(
+        Output("transactions-page", "data"),
+        [
+            Input("transactions-previous", "n_clicks"),
+            Input("transactions-next", "n_clicks"),
+            Input("month-filter", "data"),
+            Input("switches-input", "value"),
+        ],
+        [State("transactions-page", "data")],
+    )
+    def select_transactions_page(previous_clicks, next_clicks, month, switches_value, page):
+        """Move between pages of transactions, going back to the first page when the filters change"""
+        context = dash.callback_context
+        if context.triggered:
+            button_id = context.triggered[0]["prop_id"].rsplit(".", 1)[0]
+            if button_id == "transactions-previous":
+                return max((page or 0) - 1, 0)
+            if button_id == "transactions-next":
+                return (page or 0) + 1
+        return 0
+
+    @app.callback(
+        Output("page-content", "children"),
+        [
+            Input("url", "pathname"),
+            Input("switches-input", "value"),
+            Input("month-filter", "data"),
+            Input("transactions-page", "data"),
+        ],
+    )
+    def render_page_content(pathname, switches_value, month_range, page):
+
+        sync = state.sync
+        if sync.version == 0:
+            if sync.stale:
+                return dbc.Jumbotron(
+                    [html.H1("Offline"), html.P("Can't reach the Clover API, retrying in the background")]
+                )
+            return dbc.Jumbotron([html.H1("Loading..."), html.P("Fetching your transactions, check back in a moment")])
+
+        hide_transfers = "hide_transfers" in switches_value
+        hide_uncategorised = "hide_uncategorised" in switches_value
+
+        # Get the month filter
+        months = state.filters.month_range(month_range)
+
+        if pathname == "/":
+            pathname = "/page-1"
+        # the page of transactions only matters on the transactions page
+        page = (page or 0) if pathname == "/page-2" else 0
+        key = (pathname, hide_transfers, hide_uncategorised, months, page, sync.version)
+
+        def render():
+            # only timed on a miss of the render cache
+            with stage("render"):
+                return render_page(state, pathname, hide_transfers, hide_uncategorised, months, page)
+
+        if months is None:
+            months_key = "all"
+        elif months[0] == months[1]:
+            months_key = month_label(months[0])
+        else:
+            months_key = f"{month_label(months[0])}..{month_label(months[1])}"
+        profile_key = (
+            f"{pathname}?months={months_key}"
+            f"&hide_transfers={int(hide_transfers)}&hide_uncategorised={int(hide_uncategorised)}"
+        )
+        with state.profiler.trace(profile_key) as trace:
+            children = state.render_cache.get_or_render(key, render)
+            if trace is not None:
+                # a hit of the render cache is timed apart from the renders
+                trace.cached = "render" not in trace.stages
+        # the warning is added outside the render cache, whose entries only change with the data
+        return [stale_warning(sync), children] if sync.stale else children
+
+    @app.server.route("/stats/render-cache")
+    def render_cache_stats():
+        return flask.jsonify(state.render_cache.stats())
+
+    @app.server.route("/stats/render")
+    def render_stats():
+        return flask.jsonify(enabled=state.profiler.enabled, renders=state.profiler.stats())
+
+    @app.server.route("/stats/http")
+    def http_stats():
+        return flask.jsonify(state.metrics.snapshot())
+
+    @app.server.route("/stats/sync")
+    def sync_stats():
+        breaker = getattr(getattr(state.sync.clover, "request", None), "circuit_breaker", None)
+        return flask.jsonify(**state.sync.status(), circuit=None if breaker is None else breaker.snapshot())
+
+    @app.server.route("/metrics")
+    def prometheus_metrics():
+        return flask.Response(state.metrics.prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+def create_app(
+    cache_path: Union[str, Path, None] = None,
+    follow: Optional[bool] = None,
+    clover: Optional[CloverAPI] = None,
+    profiler: Optional[RenderProfiler] = None,
+    render_cache_size: Optional[int] = None,
+    render_cache_ttl: Optional[float] = None,
+) -> dash.Dash:
+    """Create the Dash app without loading any data, which is loaded by the first request
+
+    Args:
+        cache_path: The transactions cache directory. Defaults to `$CLOVER_CACHE_PATH` or `DEFAULT_CACHE_PATH`
+        follow: Only load the cache saved by another process (`refresh.py`) rather than calling the
+            API. Defaults to True if `$CLOVER_SYNC` is "follow"
+        clover: The API client, built on first use if None
+        profiler: Times the renders, configured from `$CLOVER_PROFILE` and `$CLOVER_PROFILE_SLOW` if None,
+            see `RenderProfiler.from_env`
+        render_cache_size: The most rendered pages to keep. Defaults to `$CLOVER_RENDER_CACHE_SIZE` or
+            `RENDER_CACHE_SIZE`
+        render_cache_ttl: Seconds a rendered page may be served for. Defaults to `$CLOVER_RENDER_CACHE_TTL`
+            or `RENDER_CACHE_TTL`, which keeps pages until the data changes
+
+    Examples:
+        >>> app = create_app()
+        >>> app.run_server(debug=True)
+        >>> app.state.sync.transactions
+    """
+    if cache_path is None:
+        cache_path = os.environ.get("CLOVER_CACHE_PATH", DEFAULT_CACHE_PATH)
+    if follow is None:
+        follow = os.environ.get("CLOVER_SYNC") == "follow"
+    if profiler is None:
+        profiler = RenderProfiler.from_env()
+    if render_cache_size is None:
+        render_cache_size = int(os.environ.get("CLOVER_RENDER_CACHE_SIZE", RENDER_CACHE_SIZE))
+    if render_cache_ttl is None:
+        ttl = os.environ.get("CLOVER_RENDER_CACHE_TTL")
+        render_cache_ttl = float(ttl) if ttl else RENDER_CACHE_TTL
+    state = AppState(
+        cache_path=Path(cache_path),
+        follow=follow,
+        clover=clover,
+        profiler=profiler,
+        render_cache=RenderCache(maxsize=render_cache_size, ttl=render_cache_ttl),
+    )
+
+    # the transactions pager is only in the layout while the transactions page is shown
+    app = dash.Dash(external_stylesheets=[dbc.themes.LITERA], suppress_callback_exceptions=True)
+    app.state = state
+    app.layout = make_layout(state)
+    register_callbacks(app, state)
+    return app
@@ -0,0 +1,187 @@
+import asyncio
+import dataclasses
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from clover_ui.api import TRANSACTION_DTYPES, Page, _last_id, _page_after, records_to_frame
+from clover_ui.async_http import AsyncRequestsWithRetry
+
+
+@dataclasses.dataclass(frozen=True)
+class AsyncCloverAPI:
+    """The asyncio counterpart of `CloverAPI`, with the same methods as coroutines and async iterators
+
+    Independent requests can be awaited concurrently, e.g. `fetch_snapshot` fetches the categories
+    while paging through the transactions, so it takes about as long as the slower of the two.
+    `close` the client before the event loop ends.
+
+    Args:
+        request: The async Requests object
+        host: The API host
+
+    Examples:
+        >>> async with Facade().configure_retry().async_clover() as clover:
+        ...     categories, transactions = await clover.fetch_snapshot()
+    """
+
+    request: AsyncRequestsWithRetry
+    host: str = "http://localhost:5000"
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.request.close()
+
+    async def fetch_categories(self) -> Union[list, dict]:
+        """Get a list of all of the existing categories"""
+        url = f"{self.host}/categories"
+        return await self.request.get(url=url, callback=self.request.decode_json)
+
+    async def create_category(self, name: str, display_name: str):
+        """Create a new transaction category"""
+        url = f"{self.host}/categories"
+        payload = dict(name=name, display_name=display_name)
+        await self.request.post(url=url, json=payload, callback=self.request.decode_json)
+
+    async def fetch_transactions_by_category(
+        self, category: str, since: Optional[int] = None, limit: Optional[int] = None
+    ) -> list:
+        """Fetch all transactions for a particular category, or a page of them (see `fetch_transactions`)"""
+        url = f"{self.host}/categories/{category}"
+        data = await self.request.get(url=url, params=self._params(since, limit), callback=self.request.decode_json)
+        return data["transactions"]
+
+    async def iter_transactions_by_category(
+        self, category: str, since: Optional[int] = None, page_size: int = 1000, prefetch: bool = True
+    ) -> AsyncIterator[dict]:
+        """Stream the transactions of a category one page at a time (see `iter_transaction_pages`)"""
+
+        def _fetch(since, limit):
+            return self.fetch_transactions_by_category(category, since=since, limit=limit)
+
+        async for page in self._iter_pages(_fetch, since, page_size, prefetch):
+            for transaction in page:
+                yield transaction
+
+    async def fetch_transactions(self, since: Optional[int] = None, limit: Optional[int] = None) -> list:
+        """Fetch all transactions, or only those with an id greater than `since` (see `CloverAPI`)"""
+        url = f"{self.host}/transactions"
+        return await self.request.get(url=url, params=self._params(since, limit), callback=self.request.decode_json)
+
+    def iter_transaction_pages(
+        self, since: Optional[int] = None, page_size: int = 1000, prefetch: bool = True
+    ) -> AsyncIterator[list]:
+        """Fetch transactions with an id greater than `since` one page at a time
+
+        With `prefetch`, the next page is requested as a task while the caller processes the
+        current one (see `CloverAPI.iter_transaction_pages`).
+        """
+        return self._iter_pages(self.fetch_transactions, since, page_size, prefetch)
+
+    async def iter_transactions(
+        self, since: Optional[int] = None, page_size: int = 1000, prefetch: bool = True
+    ) -> AsyncIterator[dict]:
+        """Stream transactions with an id greater than `since` (see `iter_transaction_pages`)"""
+        async for page in self.iter_transaction_pages(since=since, page_size=page_size, prefetch=prefetch):
+            for transaction in page:
+                yield transaction
+
+    async def fetch_transactions_frame(self, since: Optional[int] = None, page_size: int = 1000) -> pd.DataFrame:
+        """Fetch transactions into a `pandas.DataFrame` (see `CloverAPI.fetch_transactions_frame`)"""
+
+        def _fetch(since, limit):
+            url = f"{self.host}/transactions"
+            return self.request.get(url=url, params=self._params(since, limit), callback=self._decode_frame)
+
+        frames = [page async for page in self._iter_pages(_fetch, since, page_size, prefetch=True)]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    async def fetch_snapshot(self, since: Optional[int] = None, page_size: int = 1000) -> Tuple[list, pd.DataFrame]:
+        """Fetch the categories and the transactions with an id greater than `since` concurrently
+
+        Returns:
+            The categories and the transactions frame (see `fetch_transactions_frame`)
+        """
+        categories, transactions = await asyncio.gather(
+            self.fetch_categories(), self.fetch_transactions_frame(since=since, page_size=page_size)
+        )
+        return categories, transactions
+
+    @classmethod
+    def _params(cls, since: Optional[int], limit: Optional[int]) -> dict:
+        return {key: value for key, value in dict(since=since, limit=limit).items() if value is not None}
+
+    async def _decode_frame(self, response) -> pd.DataFrame:
+        return records_to_frame(await self.request.decode_json(response), TRANSACTION_DTYPES)
+
+    @classmethod
+    async def _iter_pages(
+        cls,
+        fetch: Callable[[Optional[int], int], Awaitable[Page]],
+        since: Optional[int],
+        page_size: int,
+        prefetch: bool,
+    ) -> AsyncIterator[Page]:
+        page = await fetch(since, page_size)
+        while True:
+            if since is not None:
+                # an API without paging ignores `since` and returns everything
+                page = _page_after(page, since)
+            more = len(page) >= page_size
+            task = None
+            if more:
+                since = _last_id(page)
+                if prefetch:
+                    task = asyncio.ensure_future(fetch(since, page_size))
+            try:
+                if len(page):
+                    yield page
+            except BaseException:
+                if task is not None:
+                    task.cancel()
+                raise
+            if not more:
+                return
+            page = await task if task is not None else await fetch(since, page_size)
+
+    async def send_transaction(
+        self,
+        time: str,
+        transaction_type: str,
+        payee: str,
+        total: str,
+        description: str = "",
+        category_name: str = "uncategorised",
+    ) -> int:
+        """Create a new transaction and assign it to a category"""
+        url = f"{self.host}/transactions"
+        payload = dict(
+            time=time,
+            transaction_type=transaction_type,
+            payee=payee,
+            description=description,
+            total=total,
+            category_name=category_name,
+        )
+        response = await self.request.post(url=url, json=payload, callback=self.request.decode_json)
+        return response["id"]
+
+    async def send_transactions(self, transactions: List[dict], chunk_size: int = 500) -> List[int]:
+        """Create many transactions using the bulk endpoint (see `CloverAPI.send_transactions`)
+
+        The chunks are posted concurrently, up to the `max_concurrency` of the request object, and
+        the ids are returned in the order of `transactions`.
+        """
+        url = f"{self.host}/transactions/bulk"
+        chunks = [transactions[start : start + chunk_size] for start in range(0, len(transactions), chunk_size)]
+        responses = await asyncio.gather(
+            *[self.request.post(url=url, json=chunk, callback=self.request.decode_json) for chunk in chunks]
+        )
+        return [transaction["id"] for response in responses for transaction in response]
@@ -0,0 +1,221 @@
+import asyncio
+import dataclasses
+import gzip
+import inspect
+import sys
+import time
+from typing import Awaitable, Callable, Dict, Optional, Sequence
+
+from retrying import Attempt, RetryError, Retrying
+
+from clover_ui.codec import JSONBackend, get_backend
+from clover_ui.http import AuthError, BadInputError, CircuitBreaker, CircuitOpenError, MethodNotAllowedError
+from clover_ui.metrics import CallRecorder, Instrumentation
+
+try:
+    import aiohttp
+except ImportError as e:
+    raise ImportError("The async client needs aiohttp, install the `async` extra: poetry install -E async") from e
+
+
+async def call_with_retry(retrying: Retrying, fn: Callable[..., Awaitable], *args, **kwargs):
+    """Await `fn` with the same retry policy as `retrying.call`, sleeping without blocking the event loop
+
+    The policy is read through the public `should_reject`, `stop` and `wait` of `retrying`. Its
+    `wait_jitter_max` and `wrap_exception` aren't applied, neither of which `retrying_factory` sets:
+    the error of the last attempt is raised as it is.
+    """
+    start_time = int(round(time.time() * 1000))
+    attempt_number = 1
+    while True:
+        try:
+            attempt = Attempt(await fn(*args, **kwargs), attempt_number, False)
+        except Exception:
+            attempt = Attempt(sys.exc_info(), attempt_number, True)
+
+        if not retrying.should_reject(attempt):
+            return attempt.get()
+
+        delay_since_first_attempt_ms = int(round(time.time() * 1000)) - start_time
+        if retrying.stop(attempt_number, delay_since_first_attempt_ms):
+            if attempt.has_exception:
+                attempt.get()
+            raise RetryError(attempt)
+
+        await asyncio.sleep(retrying.wait(attempt_number, delay_since_first_attempt_ms) / 1000.0)
+        attempt_number += 1
+
+
+@dataclasses.dataclass(frozen=True)
+class AsyncRequestsWithRetry:
+    """The asyncio counterpart of `RequestsWithRetry`, backed by an `aiohttp.ClientSession`
+
+    The session and its connection pool are created on first use, in the running event loop, and
+    are bound to that loop: `close` them (or use the object as an async context manager) before
+    the loop ends. Callbacks get the `aiohttp.ClientResponse` and may return an awaitable, e.g.
+    `decode_json`. Responses are negotiated with gzip/deflate and request bodies are encoded as
+    by `RequestsWithRetry`, and `hooks` and the `circuit_breaker` are used in the same way.
+
+    Args:
+        retrying: The retry policy, see `retrying_factory`
+        headers: Default headers sent with every request
+        pool_maxsize: Maximum number of connections kept alive per host
+        max_concurrency: Maximum number of requests in flight, or None for no limit beyond the pool
+        keep_alive: Reuse connections between requests
+        json_backend: The JSON implementation, see `clover_ui.codec.get_backend`
+        compress_requests: Gzip request bodies of at least `compress_min_size` bytes
+        compress_min_size: Smallest request body to compress
+        hooks: Instrumentation to report each request to, e.g. a `MetricsCollector`
+        circuit_breaker: Fails requests fast while the API is unavailable, see `CircuitBreaker`
+
+    Examples:
+        >>> async with AsyncRequestsWithRetry(retrying=retrying_factory(), max_concurrency=4) as request:
+        ...     categories = await request.get("http://localhost:5000/categories", callback=request.decode_json)
+    """
+
+    retrying: Retrying
+    headers: Optional[Dict] = None
+    pool_maxsize: int = 10
+    max_concurrency: Optional[int] = None
+    keep_alive: bool = True
+    json_backend: JSONBackend = dataclasses.field(default_factory=get_backend)
+    compress_requests: bool = False
+    compress_min_size: int = 1024
+    hooks: Sequence[Instrumentation] = ()
+    circuit_breaker: Optional[CircuitBreaker] = None
+
+    _session: Optional[aiohttp.ClientSession] = dataclasses.field(init=False, repr=False, compare=False, default=None)
+    _semaphore: Optional[asyncio.Semaphore] = dataclasses.field(init=False, repr=False, compare=False, default=None)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The session, created on first use in the running event loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.pool_maxsize, force_close=not self.keep_alive)
+            timeout = aiohttp.ClientTimeout(sock_connect=2, sock_read=8)
+            object.__setattr__(self, "_session", aiohttp.ClientSession(connector=connector, timeout=timeout))
+            if self.max_concurrency:
+                object.__setattr__(self, "_semaphore", asyncio.Semaphore(self.max_concurrency))
+        return self._session
+
+    async def close(self):
+        """Close the session and its pooled connections. Later requests will open a new one."""
+        session = self._session
+        object.__setattr__(self, "_session", None)
+        object.__setattr__(self, "_semaphore", None)
+        if session is not None:
+            await session.close()
+
+    async def decode_json(self, response: aiohttp.ClientResponse):
+        """Decode a JSON response with the `json_backend`, for use as a callback"""
+        return self.json_backend.loads(await response.read())
+
+    async def get(self, url: str, callback: Optional[Callable] = None, **kwargs):
+        return await self._call("GET", url=url, callback=callback, **kwargs)
+
+    async def put(self, url: str, callback: Optional[Callable] = None, **kwargs):
+        return await self._call("PUT", url=url, callback=callback, **kwargs)
+
+    async def post(self, url: str, callback: Optional[Callable] = None, **kwargs):
+        return await self._call("POST", url=url, callback=callback, **kwargs)
+
+    async def _call(self, method: str, url: str, **kwargs):
+        request = self._request if self.circuit_breaker is None else self._guarded_request
+        if not self.hooks:
+            return await call_with_retry(self.retrying, request, method, url=url, **kwargs)
+        recorder = CallRecorder(self.hooks, method, url)
+        try:
+            value = await call_with_retry(self.retrying, request, method, url=url, recorder=recorder, **kwargs)
+        except Exception as e:
+            recorder.finish(error=e)
+            raise
+        recorder.finish()
+        return value
+
+    @classmethod
+    async def _handle_response(cls, response: aiohttp.ClientResponse, callback: Optional[Callable] = None):
+        if not response.ok:
+            txt = f"\nurl = {response.url}\nmethod = {response.method}\nreason = {await response.text()}"
+            if response.status == 400:
+                raise BadInputError(f"Bad input to API:{txt}")
+            if response.status in [401, 403]:
+                raise AuthError(f"You are not authorised to access API:{txt}")
+            if response.status == 404:
+                raise FileNotFoundError(f"No resources found:{txt}")
+            if response.status == 405:
+                raise MethodNotAllowedError(f"Method not supported by API:{txt}")
+            raise ValueError(f"API request was not ok -- status code {response.status}.{txt}")
+
+        if callback is None:
+            return None
+        result = callback(response)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def _encode_body(self, kwargs: Dict):
+        if "json" not in kwargs:
+            return
+        body = self.json_backend.dumps(kwargs.pop("json"))
+        headers = {**(kwargs["headers"] or {}), "Content-Type": "application/json"}
+        if self.compress_requests and len(body) >= self.compress_min_size:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        kwargs["data"], kwargs["headers"] = body, headers
+
+    async def _guarded_request(self, method: str, url: str, **kwargs):
+        """`_request` through the circuit breaker"""
+        self.circuit_breaker.before(url)
+        try:
+            value = await self._request(method, url=url, **kwargs)
+        except Exception as e:
+            if self.circuit_breaker.record(e):
+                raise CircuitOpenError(f"The API failed {self.circuit_breaker.failures} times in a row: {e}") from e
+            raise
+        self.circuit_breaker.record()
+        return value
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        callback: Optional[Callable] = None,
+        recorder: Optional[CallRecorder] = None,
+        **kwargs,
+    ):
+        if "headers" not in kwargs:
+            kwargs["headers"] = self.headers
+        self._encode_body(kwargs)
+        if recorder is None:
+            return await self._send(method, url, callback, kwargs)
+
+        responses = []
+        bytes_sent = len(kwargs.get("data") or b"")
+        start = time.perf_counter()
+        try:
+            value = await self._send(method, url, callback, kwargs, responses)
+        except Exception as e:
+            status, received = (responses[-1].status, responses[-1].content_length or 0) if responses else (None, 0)
+            recorder.attempt(start, status, bytes_sent if responses else 0, received, error=e)
+            raise
+        recorder.attempt(start, responses[-1].status, bytes_sent, responses[-1].content_length or 0)
+        return value
+
+    async def _send(self, method: str, url: str, callback: Optional[Callable], kwargs: Dict, responses=None):
+        session = self.session
+        if self._semaphore is None:
+            async with session.request(method, url, **kwargs) as r:
+                if responses is not None:
+                    responses.append(r)
+                return await self._handle_response(r, callback)
+        async with self._semaphore:
+            async with session.request(method, url, **kwargs) as r:
+                if responses is not None:
+                    responses.append(r)
+                return await self._handle_response(r, callback)
@@ -0,0 +1,165 @@
+import dataclasses
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("clover.cache")
+
+# Bump when the layout of the prepared transactions or of the cache files changes
+SCHEMA_VERSION = 2
+
+# Where the app keeps its transactions cache
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "clover-ui" / "transactions"
+
+
+@dataclasses.dataclass(frozen=True)
+class TransactionCache:
+    """An on-disk, columnar cache of the prepared transactions frame
+
+    Each `save` writes a new generation directory holding one `.npy` file per column and a
+    `meta.json`, then atomically points the `CURRENT` file at it. Numeric and datetime columns
+    and the codes of categorical columns are loaded memory-mapped. Other columns are stored
+    dictionary-encoded as integer codes plus a JSON list of their distinct values. A cache written
+    with a different `SCHEMA_VERSION`, or with the transactions of another API `host`, is treated as
+    missing.
+
+    The loaded frame is backed by the memory-mapped files rather than copies, so any number of
+    processes loading the same generation share one copy of the transactions in the page cache.
+    A generation is never modified once written.
+
+    Args:
+        path: The cache directory, created if it doesn't exist
+        keep: Number of generations to keep on disk
+        host: The API host the transactions are fetched from, or None to load a cache of any host
+
+    Examples:
+        >>> cache = TransactionCache(Path.home() / ".cache" / "clover-ui", host=clover.host)
+        >>> cache.save(transactions, categories, revalidated_at=time.time())
+        >>> transactions, categories, revalidated_at = cache.load()
+    """
+
+    path: Union[str, Path]
+    keep: int = 2
+    host: Optional[str] = None
+
+    @property
+    def current(self) -> Optional[Path]:
+        """The directory of the current generation, if there is one"""
+        pointer = Path(self.path) / "CURRENT"
+        if not pointer.exists():
+            return None
+        return Path(self.path) / pointer.read_text().strip()
+
+    @property
+    def generation(self) -> int:
+        """The number of the current generation, or 0 if there is none"""
+        return self._generation(self.current)
+
+    @property
+    def saved_at(self) -> Optional[float]:
+        """The time the current generation was saved, as a Unix timestamp, or None if there is none"""
+        current = self.current
+        try:
+            return None if current is None else (current / "meta.json").stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> Optional[Tuple[pd.DataFrame, pd.DataFrame, Optional[float]]]:
+        """Load `(transactions, categories, revalidated_at)`, or None if there is no usable cache"""
+        try:
+            return self._load(self.current)
+        except FileNotFoundError:
+            # another process saved a new generation and pruned the one we started reading
+            return self._load(self.current)
+
+    def _load(self, directory: Optional[Path]) -> Optional[Tuple[pd.DataFrame, pd.DataFrame, Optional[float]]]:
+        if directory is None or not (directory / "meta.json").exists():
+            return None
+        meta = json.loads((directory / "meta.json").read_text())
+        if meta.get("schema_version") != SCHEMA_VERSION:
+            logger.info(f"Ignoring cache with schema version {meta.get('schema_version')}")
+            return None
+        if self.host is not None and meta.get("host") != self.host:
+            logger.info(f"Ignoring cache of the transactions of {meta.get('host')}, not {self.host}")
+            return None
+
+        columns = {name: self._load_column(directory, name, kind) for name, kind in meta["columns"].items()}
+        index = pd.DatetimeIndex(self._load_column(directory, "__index__", "datetime"), name=meta["index_name"])
+        transactions = pd.DataFrame(columns, index=index, copy=False)
+        categories = pd.DataFrame(meta["categories"], columns=meta["category_columns"])
+        return transactions, categories, meta.get("revalidated_at")
+
+    def save(self, transactions: pd.DataFrame, categories: pd.DataFrame, revalidated_at: Optional[float] = None):
+        """Write a new generation and make it the current one
+
+        `revalidated_at` is when the full history was last fetched, as a Unix timestamp.
+        """
+        root = Path(self.path)
+        generation = self._generation(self.current) + 1
+        directory = root / f"gen-{generation:06d}"
+        if directory.exists():
+            shutil.rmtree(directory)
+        directory.mkdir(parents=True)
+
+        meta = dict(
+            schema_version=SCHEMA_VERSION,
+            host=self.host,
+            revalidated_at=revalidated_at,
+            index_name=transactions.index.name,
+            columns={},
+            categories=categories.to_dict("records"),
+            category_columns=list(categories.columns),
+        )
+        np.save(directory / "__index__.npy", transactions.index.values.astype("datetime64[ns]"))
+        for name, column in transactions.items():
+            meta["columns"][name] = self._save_column(directory, name, column)
+        (directory / "meta.json").write_text(json.dumps(meta))
+
+        pointer = root / "CURRENT.tmp"
+        pointer.write_text(directory.name)
+        os.replace(pointer, root / "CURRENT")
+        self._prune(root, generation)
+
+    @classmethod
+    def _generation(cls, directory: Optional[Path]) -> int:
+        return 0 if directory is None else int(directory.name.split("-")[1])
+
+    def _prune(self, root: Path, generation: int):
+        for directory in root.glob("gen-*"):
+            if self._generation(directory) <= generation - self.keep:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    @classmethod
+    def _save_column(cls, directory: Path, name: str, column: pd.Series) -> str:
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            np.save(directory / f"{name}.npy", column.cat.codes.values)
+            (directory / f"{name}.json").write_text(json.dumps(column.cat.categories.tolist()))
+            return "category"
+        if pd.api.types.is_datetime64_any_dtype(column):
+            np.save(directory / f"{name}.npy", column.values.astype("datetime64[ns]"))
+            return "datetime"
+        if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+            np.save(directory / f"{name}.npy", column.values)
+            return "numeric"
+        codes, values = pd.factorize(column)
+        np.save(directory / f"{name}.npy", codes.astype(np.int32))
+        (directory / f"{name}.json").write_text(json.dumps(values.tolist()))
+        return "encoded"
+
+    @classmethod
+    def _load_column(cls, directory: Path, name: str, kind: str) -> Union[np.ndarray, pd.Categorical]:
+        values = np.load(directory / f"{name}.npy", mmap_mode="r")
+        if kind == "category":
+            categories = json.loads((directory / f"{name}.json").read_text())
+            return pd.Categorical.from_codes(values, categories=categories)
+        if kind != "encoded":
+            return values
+        # code -1 marks a missing value, which is stored after the distinct values
+        distinct = np.array(json.loads((directory / f"{name}.json").read_text()) + [np.nan], dtype=object)
+        return distinct[values]
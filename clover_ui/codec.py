@@ -0,0 +1,51 @@
+import dataclasses
+import json
+import os
+from typing import Any, Callable, Dict, Optional
+
+
+@dataclasses.dataclass(frozen=True)
+class JSONBackend:
+    """A JSON implementation used to decode responses and encode request bodies
+
+    Args:
+        name: The name to select the backend by, see `get_backend`
+        loads: Decode `bytes` of JSON
+        dumps: Encode an object as `bytes` of JSON
+    """
+
+    name: str
+    loads: Callable[[bytes], Any]
+    dumps: Callable[[Any], bytes]
+
+
+def _stdlib_backend() -> JSONBackend:
+    return JSONBackend(name="json", loads=json.loads, dumps=lambda obj: json.dumps(obj).encode())
+
+
+def _orjson_backend() -> JSONBackend:
+    import orjson
+
+    return JSONBackend(name="orjson", loads=orjson.loads, dumps=orjson.dumps)
+
+
+# In order of preference. orjson is optional, install the `fast` extra to use it
+BACKENDS: Dict[str, Callable[[], JSONBackend]] = {"orjson": _orjson_backend, "json": _stdlib_backend}
+
+
+def get_backend(name: Optional[str] = None) -> JSONBackend:
+    """The JSON backend called `name`, or `$CLOVER_JSON`, or the fastest one installed
+
+    Raises:
+        ImportError: If the backend asked for isn't installed
+        KeyError: If there is no backend called `name`
+    """
+    name = name or os.environ.get("CLOVER_JSON")
+    if name is not None:
+        return BACKENDS[name]()
+    for factory in BACKENDS.values():
+        try:
+            return factory()
+        except ImportError:
+            continue
+    return _stdlib_backend()
@@ -1,4 +1,5 @@
-from clover_ui import Facade
+from clover_ui.aggregates import Aggregates
+from clover_ui.profiling import stage
 import dash
 import dash_bootstrap_components as dbc
 import dash_core_components as dcc
@@ -6,23 +7,43 @@ import dash_html_components as html
 import pandas as pd
 import plotly.graph_objs as go
 
-clover = Facade().configure_retry().clover()
+# The title of the spend chart for each of the periods its totals are bucketed by
+SPEND_TITLES = {
+    "day": "Daily spend",
+    "week": "Weekly spend",
+    "month": "Monthly spend",
+    "quarter": "Quarterly spend",
+    "year": "Yearly spend",
+}
 
 
-def generate_dashboard(transactions: pd.DataFrame):
+def compact_values(values: pd.Series) -> list:
+    """Dollar amounts as a list of numbers rounded to cents, which serialise to short JSON"""
+    return values.round(2).tolist()
+
+
+def compact_dates(dates: pd.Series) -> list:
+    """Dates as a list of `YYYY-MM-DD` strings rather than full ISO timestamps"""
+    return pd.DatetimeIndex(dates).strftime("%Y-%m-%d").tolist()
+
+
+def generate_dashboard(aggregates: Aggregates):
 
     # --- Spending by Category
-    pie_figure = go.Pie(
-        values=transactions.total,
-        labels=transactions.display_name,
-        hole=0.6,
-        rotation=25,
-        automargin=True,
-        opacity=0.8,
-        textinfo="label+value",
-        textposition="outside",
-        hoverlabel={"bgcolor": "rgba(255,255,255,125)"},
-    )
+    with stage("figures"):
+        # the pie only shows positive values, as plotly would if given every transaction
+        by_category = aggregates.by_category[aggregates.by_category.income > 0]
+        pie_figure = go.Pie(
+            values=compact_values(by_category.income),
+            labels=by_category.display_name.tolist(),
+            hole=0.6,
+            rotation=25,
+            automargin=True,
+            opacity=0.8,
+            textinfo="label+value",
+            textposition="outside",
+            hoverlabel={"bgcolor": "rgba(255,255,255,125)"},
+        )
 
     # https://coolors.co/browser/latest/1
     colours = [
@@ -58,26 +79,29 @@ def generate_dashboard(transactions: pd.DataFrame):
         ]
     )
 
-    # --- Daily Spend Section
-    daily_expenses = transactions[transactions.total < 0].groupby("days").sum().reset_index()
-    expenses_figure = go.Bar(
-        x=daily_expenses.days,
-        y=daily_expenses.total,
-        marker_color="indianred",
-        name="Expenses",
-        hoverlabel={"bgcolor": "rgba(255,255,255,125)"},
-    )
+    # --- Spend Section
+    # the totals are bucketed by day, week, month... so the number of bars is bounded
+    by_period = aggregates.by_period
+    with stage("figures"):
+        expenses = by_period[by_period.expenses < 0]
+        expenses_figure = go.Bar(
+            x=compact_dates(expenses.start),
+            y=compact_values(expenses.expenses),
+            marker_color="indianred",
+            name="Expenses",
+            hoverlabel={"bgcolor": "rgba(255,255,255,125)"},
+        )
 
-    daily_income = transactions[transactions.total >= 0].groupby("days").sum().reset_index()
-    income_figure = go.Bar(
-        x=daily_income.days,
-        y=daily_income.total,
-        marker_color="mediumseagreen",
-        name="Income",
-        hoverlabel={"bgcolor": "rgba(255,255,255,125)"},
-    )
+        income = by_period[by_period.income > 0]
+        income_figure = go.Bar(
+            x=compact_dates(income.start),
+            y=compact_values(income.income),
+            marker_color="mediumseagreen",
+            name="Income",
+            hoverlabel={"bgcolor": "rgba(255,255,255,125)"},
+        )
 
-    daily_spend_chart = dcc.Graph(
+    spend_chart = dcc.Graph(
         id="Bar",
         responsive=True,
         figure={
@@ -86,9 +110,9 @@ def generate_dashboard(transactions: pd.DataFrame):
         },
     )
 
-    daily_spend_section = html.Div(
-        children=[html.Div(html.H2("Daily spend")), html.Div(daily_spend_chart)],
+    spend_section = html.Div(
+        children=[html.Div(html.H2(SPEND_TITLES[aggregates.period])), html.Div(spend_chart)],
         style={"padding-left": "2%", "padding-right": "2%"},
     )
 
-    return html.Div([category_section, daily_spend_section])
+    return html.Div([category_section, spend_section])
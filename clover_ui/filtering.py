@@ -0,0 +1,158 @@
+import dataclasses
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def month_label(month: pd.Period) -> str:
+    """The label of a month, e.g. `March-2020`"""
+    return f"{month.strftime('%B')}-{month.year}"
+
+
+@dataclasses.dataclass(frozen=True)
+class FilterIndex:
+    """Lookup structures over transactions sorted by time, see `FilterIndex.build`
+
+    Args:
+        transactions: The transactions, indexed and sorted by time
+        months: The `(start, stop)` row offsets of each month with transactions
+        labels: Each month by its `month_label`
+        type_codes: Codes of `transaction_type`
+        transfer_code: The code of "Transfer", or -2 if there are no transfers
+        category_codes: Codes of `category_name`
+        uncategorised_code: The code of "uncategorised", or -2 if there are none
+    """
+
+    transactions: pd.DataFrame
+    months: Dict[pd.Period, Tuple[int, int]]
+    labels: Dict[str, pd.Period]
+    type_codes: np.ndarray
+    transfer_code: int
+    category_codes: np.ndarray
+    uncategorised_code: int
+
+    @classmethod
+    def build(cls, transactions: pd.DataFrame) -> "FilterIndex":
+        if not transactions.index.is_monotonic_increasing:
+            transactions = transactions.sort_index(kind="stable")
+
+        months = {}
+        if not transactions.empty:
+            periods = pd.period_range(transactions.index[0], transactions.index[-1], freq="M")
+            edges = np.append(transactions.index.searchsorted(periods.start_time, side="left"), transactions.shape[0])
+            months = {
+                period: (int(start), int(stop))
+                for period, start, stop in zip(periods, edges[:-1], edges[1:])
+                if stop > start
+            }
+
+        types = pd.Categorical(transactions.transaction_type)
+        categories = pd.Categorical(transactions.category_name)
+        return cls(
+            transactions=transactions,
+            months=months,
+            labels={month_label(month): month for month in months},
+            type_codes=types.codes,
+            transfer_code=cls._code(types, "Transfer"),
+            category_codes=categories.codes,
+            uncategorised_code=cls._code(categories, "uncategorised"),
+        )
+
+    @classmethod
+    def _code(cls, categorical: pd.Categorical, value: str) -> int:
+        # -2 never matches a code, missing values are -1
+        return int(categorical.categories.get_loc(value)) if value in categorical.categories else -2
+
+    def bounds(
+        self,
+        month: Optional[pd.Period] = None,
+        start: Optional[pd.Timestamp] = None,
+        end: Optional[pd.Timestamp] = None,
+    ) -> Tuple[int, int]:
+        """The row offsets of a month, or of the transactions from `start` up to but excluding `end`"""
+        if month is not None:
+            return self.months.get(month, (0, 0))
+        index = self.transactions.index
+        i = 0 if start is None else int(index.searchsorted(pd.Timestamp(start), side="left"))
+        j = len(index) if end is None else int(index.searchsorted(pd.Timestamp(end), side="left"))
+        return i, max(i, j)
+
+
+@dataclasses.dataclass(frozen=False)
+class TransactionFilter:
+    """Filter transactions by time and type without scanning every transaction
+
+    The transactions are sorted by time once, with the row offsets of each month and integer
+    codes of the transaction types and categories. A selection is then a slice found by binary
+    search plus a mask over the rows of the slice. Use `apply` as a `TransactionSync` listener
+    to rebuild the index when the transactions change.
+
+    Examples:
+        >>> filters = TransactionFilter()
+        >>> filters.rebuild(transactions)
+        >>> march = filters.select(month=filters.month("March-2020"), hide_transfers=True)
+        >>> summer = filters.select(start="2020-12-01", end="2021-03-01")
+        >>> first, last = filters.month_range([pd.Period("2020-12").ordinal, pd.Period("2021-02").ordinal])
+    """
+
+    index: FilterIndex = dataclasses.field(default=None)
+
+    def __post_init__(self):
+        if self.index is None:
+            self.index = FilterIndex.build(pd.DataFrame(columns=["transaction_type", "category_name"]))
+
+    def rebuild(self, transactions: pd.DataFrame):
+        self.index = FilterIndex.build(transactions)
+
+    def apply(self, update):
+        """Rebuild from a `clover_ui.sync.Update`"""
+        self.rebuild(update.transactions)
+
+    @property
+    def months(self) -> Dict[pd.Period, Tuple[int, int]]:
+        return self.index.months
+
+    def month(self, label: Optional[str]) -> Optional[pd.Period]:
+        """The month with the given `month_label`, or None if there is no such month"""
+        return None if label is None else self.index.labels.get(label)
+
+    def month_range(self, value: Optional[Sequence[int]]) -> Optional[Tuple[pd.Period, pd.Period]]:
+        """The first and last month of a pair of month ordinals, as set by the month slider, or None for all dates
+
+        The range is clamped to the months with transactions. It is None if it covers all of them,
+        if there are none yet (e.g. the slider of a page loaded before the first sync) or if it
+        covers none of them.
+        """
+        months = self.index.months
+        if not value or not months:
+            return None
+        first, last = (pd.Period(ordinal=int(ordinal), freq="M") for ordinal in sorted(value))
+        earliest, latest = min(months), max(months)
+        if last < earliest or first > latest:
+            return None
+        first, last = max(first, earliest), min(last, latest)
+        if first == earliest and last == latest:
+            return None
+        return first, last
+
+    def select(
+        self,
+        month: Optional[pd.Period] = None,
+        start: Optional[pd.Timestamp] = None,
+        end: Optional[pd.Timestamp] = None,
+        hide_transfers: bool = False,
+        hide_uncategorised: bool = False,
+    ) -> pd.DataFrame:
+        """The transactions of a month or date range (see `FilterIndex.bounds`), optionally without
+        transfers or uncategorised transactions. The result must not be modified in place."""
+        index = self.index
+        i, j = index.bounds(month, start, end)
+        df = index.transactions.iloc[i:j]
+        mask = None
+        if hide_transfers:
+            mask = index.type_codes[i:j] != index.transfer_code
+        if hide_uncategorised:
+            categorised = index.category_codes[i:j] != index.uncategorised_code
+            mask = categorised if mask is None else mask & categorised
+        return df if mask is None else df[mask]
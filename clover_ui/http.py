@@ -1,9 +1,21 @@
 import dataclasses
-from typing import Callable, Dict, Optional
+import gzip
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
 
 import requests
+from requests.adapters import HTTPAdapter
 from retrying import Retrying
 
+from clover_ui.codec import JSONBackend, get_backend
+from clover_ui.log import log_event
+from clover_ui.metrics import CallRecorder, Instrumentation
+from clover_ui.response_cache import CachedResponse, ResponseCache
+
+logger = logging.getLogger("clover.http")
+
 
 class AuthError(RuntimeError):
     """A class to wrap when API Auth doesn't work"""
@@ -13,10 +25,22 @@ class BadInputError(RuntimeError):
     """A class to wrap when API is given bad input"""
 
 
+class MethodNotAllowedError(RuntimeError):
+    """A class to wrap when the API does not support the method on an endpoint"""
+
+
+class CircuitOpenError(RuntimeError):
+    """A class to wrap when a request is refused without being sent because the API keeps failing"""
+
+
+# errors the API answered with, which retrying or waiting won't fix
+PERMANENT_ERRORS = (AuthError, BadInputError, MethodNotAllowedError, FileNotFoundError, CircuitOpenError)
+
+
 def retrying_factory(**kwargs) -> Retrying:
     def _dont_retry_error_filter(e):
         """Return True if we should retry"""
-        return not isinstance(e, (AuthError, BadInputError, FileNotFoundError))
+        return not isinstance(e, PERMANENT_ERRORS)
 
     if "wait_exponential_multiplier" not in kwargs:
         kwargs["wait_exponential_multiplier"] = 250
@@ -30,19 +54,259 @@ def retrying_factory(**kwargs) -> Retrying:
     return Retrying(**kwargs)
 
 
+@dataclasses.dataclass(frozen=False)
+class CircuitBreaker:
+    """Fail requests fast while the API is unavailable, rather than backing off on every request
+
+    After `failure_threshold` failed attempts in a row the circuit opens: for `reset_timeout`
+    seconds every attempt fails immediately with a `CircuitOpenError`, which isn't retried. Then
+    one trial attempt is let through, which closes the circuit if it succeeds and opens it again if
+    it fails. Only connection errors, timeouts and server errors count as failures; an error the
+    API answered with, e.g. a 404, shows it is up. One breaker can be shared by several clients.
+
+    Args:
+        failure_threshold: Failed attempts in a row which open the circuit
+        reset_timeout: Seconds the circuit stays open before a trial attempt
+
+    Examples:
+        >>> breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+        >>> request = RequestsWithRetry(retrying=retrying_factory(), circuit_breaker=breaker)
+        >>> breaker.snapshot()
+        {'state': 'closed', 'failures': 0, 'retry_in': None}
+    """
+
+    failure_threshold: int = 3
+    reset_timeout: float = 30.0
+    state: str = dataclasses.field(init=False, default="closed")
+    failures: int = dataclasses.field(init=False, default=0)
+    _opened_at: float = dataclasses.field(init=False, repr=False, default=0.0)
+    _trial: bool = dataclasses.field(init=False, repr=False, default=False)
+    _lock: threading.Lock = dataclasses.field(init=False, repr=False, default_factory=threading.Lock)
+
+    def before(self, url: str):
+        """Raise `CircuitOpenError` if an attempt to `url` shouldn't be sent"""
+        with self._lock:
+            if self.state == "closed":
+                return
+            retry_in = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == "open" and retry_in <= 0:
+                self.state = "half-open"
+            if self.state == "half-open" and not self._trial:
+                self._trial = True
+                return
+            failures, retry_in = self.failures, max(retry_in, 0.0)
+        raise CircuitOpenError(f"The API failed {failures} times in a row, not sending {url} for {retry_in:.1f}s")
+
+    def record(self, error: Optional[BaseException] = None) -> bool:
+        """Record the outcome of an attempt let through by `before`. Returns True if it opened the circuit."""
+        if error is not None and not isinstance(error, PERMANENT_ERRORS):
+            with self._lock:
+                self.failures += 1
+                tripped = self.state == "closed" and self.failures >= self.failure_threshold
+                opened = tripped or self.state == "half-open"
+                if opened:
+                    self.state, self._opened_at, self._trial = "open", time.monotonic(), False
+            if opened:
+                log_event(logger, "circuit.open", logging.WARNING, failures=self.failures, error=repr(error))
+            return opened
+        with self._lock:
+            closed = self.state != "closed"
+            self.state, self.failures, self._trial = "closed", 0, False
+        if closed:
+            log_event(logger, "circuit.closed")
+        return False
+
+    def snapshot(self) -> dict:
+        """The state, failures in a row and seconds until the next trial attempt if the circuit is open"""
+        with self._lock:
+            retry_in = None
+            if self.state == "open":
+                retry_in = max(self._opened_at + self.reset_timeout - time.monotonic(), 0.0)
+            return dict(state=self.state, failures=self.failures, retry_in=retry_in)
+
+
 @dataclasses.dataclass(frozen=True)
 class RequestsWithRetry:
+    """Make HTTP requests with retries over a pool of keep-alive connections
+
+    Connections are pooled by a single `requests.adapters.HTTPAdapter` which is shared
+    by one `requests.Session` per thread, so the object can be used from worker threads.
+    Call `close` (or use it as a context manager) to release the pooled connections.
+
+    Responses are negotiated with `Accept-Encoding: gzip, deflate`, which requests sends and
+    decodes by default. `json=` request bodies and `decode_json` use the `json_backend`, and
+    large bodies can also be gzipped if the server accepts `Content-Encoding: gzip`.
+
+    With a `cache`, GET requests to the endpoints it accepts are sent with the validators of
+    the cached response, and a 304 Not Modified reuses the cached value without decoding a body.
+
+    `hooks` are told about every attempt and every request, see `clover_ui.metrics`. Without
+    hooks, requests aren't timed at all.
+
+    With a `circuit_breaker`, attempts fail fast with a `CircuitOpenError` while the API keeps
+    failing, instead of each request retrying through the whole backoff.
+
+    Args:
+        retrying: The retry policy, see `retrying_factory`
+        headers: Default headers sent with every request
+        pool_connections: Number of per-host connection pools to keep
+        pool_maxsize: Maximum number of connections kept alive per host
+        pool_block: Block when all `pool_maxsize` connections to a host are busy instead
+            of opening extra, non-pooled connections. This makes `pool_maxsize` a hard limit.
+        keep_alive: Reuse connections between requests. If False, every request is sent
+            with `Connection: close`.
+        cache: A cache of decoded responses, see `ResponseCache`
+        json_backend: The JSON implementation, see `clover_ui.codec.get_backend`
+        compress_requests: Gzip request bodies of at least `compress_min_size` bytes
+        compress_min_size: Smallest request body to compress
+        hooks: Instrumentation to report each request to, e.g. a `MetricsCollector`
+        circuit_breaker: Fails requests fast while the API is unavailable, see `CircuitBreaker`
+
+    Examples:
+        >>> with RequestsWithRetry(retrying=retrying_factory(), pool_maxsize=4) as request:
+        ...     categories = request.get("http://localhost:5000/categories", callback=lambda r: r.json())
+    """
+
     retrying: Retrying
     headers: Optional[Dict] = None
+    pool_connections: int = 10
+    pool_maxsize: int = 10
+    pool_block: bool = False
+    keep_alive: bool = True
+    cache: Optional[ResponseCache] = None
+    json_backend: JSONBackend = dataclasses.field(default_factory=get_backend)
+    compress_requests: bool = False
+    compress_min_size: int = 1024
+    hooks: Sequence[Instrumentation] = ()
+    circuit_breaker: Optional[CircuitBreaker] = None
+
+    _adapter: HTTPAdapter = dataclasses.field(init=False, repr=False, compare=False)
+    _local: threading.local = dataclasses.field(init=False, repr=False, compare=False)
+    _sessions: list = dataclasses.field(init=False, repr=False, compare=False)
+    _lock: threading.Lock = dataclasses.field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, pool_block=self.pool_block
+        )
+        object.__setattr__(self, "_adapter", adapter)
+        object.__setattr__(self, "_local", threading.local())
+        object.__setattr__(self, "_sessions", [])
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def session(self) -> requests.Session:
+        """The calling thread's session, created on first use and backed by the shared pool"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+            if not self.keep_alive:
+                session.headers["Connection"] = "close"
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def close(self):
+        """Close every session and the pooled connections. Later requests will open new ones."""
+        with self._lock:
+            sessions, self._sessions[:] = list(self._sessions), []
+        object.__setattr__(self, "_local", threading.local())
+        for session in sessions:
+            session.close()
+        self._adapter.close()
+
+    def decode_json(self, response: requests.Response):
+        """Decode a JSON response with the `json_backend`, for use as a callback"""
+        return self.json_backend.loads(response.content)
 
     def get(self, url: str, callback: Optional[Callable] = None, **kwargs):
-        return self.retrying.call(self._get_impl, url=url, callback=callback, **kwargs)
+        return self._call("GET", self._get_impl, url=url, callback=callback, **kwargs)
 
     def put(self, url: str, callback: Optional[Callable] = None, **kwargs):
-        return self.retrying.call(self._put_impl, url=url, callback=callback, **kwargs)
+        return self._call("PUT", self._put_impl, url=url, callback=callback, **kwargs)
 
     def post(self, url: str, callback: Optional[Callable] = None, **kwargs):
-        return self.retrying.call(self._post_impl, url=url, callback=callback, **kwargs)
+        return self._call("POST", self._post_impl, url=url, callback=callback, **kwargs)
+
+    def _call(self, method: str, impl: Callable, url: str, **kwargs):
+        if self.circuit_breaker is not None:
+            impl = self._guarded(impl)
+        if self.hooks:
+            return self._instrumented(method, impl, url=url, **kwargs)
+        return self.retrying.call(impl, url=url, **kwargs)
+
+    def _guarded(self, impl: Callable) -> Callable:
+        """Wrap `impl` so that each attempt passes through the circuit breaker"""
+        breaker = self.circuit_breaker
+
+        def attempt(url: str, **kwargs):
+            breaker.before(url)
+            try:
+                value = impl(url=url, **kwargs)
+            except Exception as e:
+                # rather than backing off before an attempt the circuit would refuse
+                if breaker.record(e):
+                    raise CircuitOpenError(f"The API failed {breaker.failures} times in a row: {e}") from e
+                raise
+            breaker.record()
+            return value
+
+        return attempt
+
+    def _instrumented(self, method: str, impl: Callable, url: str, **kwargs):
+        """Call `impl` with retries, reporting each attempt and the whole call to the hooks"""
+        recorder = CallRecorder(self.hooks, method, url)
+
+        def attempt(**kwargs):
+            # the response hook sees every response, including those the callback raises on
+            responses: List[requests.Response] = []
+            hooks = dict(kwargs.get("hooks") or {})
+            response_hooks = hooks.get("response", [])
+            response_hooks = [response_hooks] if callable(response_hooks) else list(response_hooks)
+            hooks["response"] = [*response_hooks, lambda r, **_: responses.append(r)]
+            kwargs["hooks"] = hooks
+            stream = kwargs.get("stream", False)
+
+            start = time.perf_counter()
+            try:
+                value = impl(**kwargs)
+            except Exception as e:
+                recorder.attempt(start, *self._attempt_sizes(responses, stream), error=e)
+                raise
+            recorder.attempt(start, *self._attempt_sizes(responses, stream))
+            return value
+
+        try:
+            value = self.retrying.call(attempt, url=url, **kwargs)
+        except Exception as e:
+            recorder.finish(error=e)
+            raise
+        recorder.finish()
+        return value
+
+    @classmethod
+    def _attempt_sizes(cls, responses: List[requests.Response], stream: bool) -> tuple:
+        """The status, request body size and response body size (as sent) of the last response"""
+        if not responses:
+            return None, 0, 0
+        response = responses[-1]
+        body = response.request.body
+        length = response.headers.get("Content-Length")
+        if length is not None and length.isdigit():
+            received = int(length)
+        else:
+            # a streamed body isn't read by the time the attempt ends
+            received = 0 if stream else len(response.content)
+        return response.status_code, len(body) if body else 0, received
 
     @classmethod
     def _noop_callback(cls, response: requests.Response):
@@ -62,6 +326,8 @@ class RequestsWithRetry:
                 raise AuthError(f"You are not authorised to access API:{txt}")
             if response.status_code == 404:
                 raise FileNotFoundError(f"No resources found:{txt}")
+            if response.status_code == 405:
+                raise MethodNotAllowedError(f"Method not supported by API:{txt}")
             raise ValueError(
                 f"API request was not ok -- status code {response.status_code}.{txt}"
             )
@@ -78,17 +344,50 @@ class RequestsWithRetry:
         if "headers" not in kwargs:
             kwargs["headers"] = self.headers
 
+    def _encode_body(self, kwargs: Dict):
+        if "json" not in kwargs:
+            return
+        body = self.json_backend.dumps(kwargs.pop("json"))
+        headers = {**(kwargs["headers"] or {}), "Content-Type": "application/json"}
+        if self.compress_requests and len(body) >= self.compress_min_size:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        kwargs["data"], kwargs["headers"] = body, headers
+
     def _get_impl(self, url: str, callback: Optional[Callable] = None, **kwargs):
         self._update_kwargs(kwargs)
-        with requests.get(url=url, **kwargs) as r:
-            return self._handle_response(r, callback)
+        if self.cache is None or callback is None:
+            with self.session.get(url=url, **kwargs) as r:
+                return self._handle_response(r, callback)
+
+        full_url = requests.Request("GET", url, params=kwargs.pop("params", None)).prepare().url
+        if not self.cache.accepts(full_url):
+            with self.session.get(url=full_url, **kwargs) as r:
+                return self._handle_response(r, callback)
+        # a URL may be decoded by more than one callback, e.g. into records or into a frame
+        key = f"{full_url} {callback.__module__}.{getattr(callback, '__qualname__', repr(callback))}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            kwargs["headers"] = {**(kwargs["headers"] or {}), **cached.conditional_headers()}
+        with self.session.get(url=full_url, **kwargs) as r:
+            if r.status_code == 304 and cached is not None:
+                self.cache.record(hit=True)
+                return cached.value
+            value = self._handle_response(r, callback)
+        self.cache.record(hit=False)
+        etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+        if etag is not None or last_modified is not None:
+            self.cache.put(CachedResponse(key=key, value=value, etag=etag, last_modified=last_modified))
+        return value
 
     def _put_impl(self, url: str, callback: Optional[Callable] = None, **kwargs):
         self._update_kwargs(kwargs)
-        with requests.put(url=url, **kwargs) as r:
+        self._encode_body(kwargs)
+        with self.session.put(url=url, **kwargs) as r:
             return self._handle_response(r, callback)
 
     def _post_impl(self, url: str, callback: Optional[Callable] = None, **kwargs):
         self._update_kwargs(kwargs)
-        with requests.post(url=url, **kwargs) as r:
+        self._encode_body(kwargs)
+        with self.session.post(url=url, **kwargs) as r:
             return self._handle_response(r, callback)
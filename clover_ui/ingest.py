@@ -0,0 +1,111 @@
+import collections
+import dataclasses
+import hashlib
+from pathlib import Path
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+import pandas as pd
+
+# The transaction fields which identify a transaction
+HASH_FIELDS = ["time", "payee", "total", "description"]
+
+
+def transaction_hashes(transactions: pd.DataFrame, seen: Optional[collections.Counter] = None) -> List[str]:
+    """Hash the `HASH_FIELDS` of each transaction
+
+    Identical transactions in the same export (e.g. two coffees bought in the same minute) are told
+    apart by how many times the transaction has been `seen` before, so pass the same counter for
+    every chunk of one file and a new one for each file.
+    """
+    if seen is None:
+        seen = collections.Counter()
+    columns = [
+        transactions[field].map("{:.2f}".format) if field == "total" else transactions[field].astype(str)
+        for field in HASH_FIELDS
+    ]
+    keys = columns[0].str.cat(columns[1:], sep="\x1f")
+    hashes = []
+    for key in keys:
+        occurrence = seen[key]
+        seen[key] += 1
+        hashes.append(hashlib.sha1(f"{key}\x1f{occurrence}".encode()).hexdigest())
+    return hashes
+
+
+@dataclasses.dataclass(frozen=False)
+class IngestIndex:
+    """A local record of the transactions that have been posted to the API
+
+    The index is a SQLite database holding the hash of every ingested transaction (see
+    `transaction_hashes`) with its API id, and a checkpoint of how many rows of each file have
+    been ingested. A checkpoint is only valid while the file's size and modification time are
+    unchanged.
+
+    Args:
+        path: The database file, created if it doesn't exist
+
+    Examples:
+        >>> with IngestIndex("/tmp/clover_index.db") as index:
+        ...     new = index.missing(hashes)
+        ...     index.add(dict(zip(new, ids)))
+    """
+
+    path: Union[str, Path]
+    _connection: sqlite3.Connection = dataclasses.field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._connection = sqlite3.connect(str(self.path))
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS transactions (hash TEXT PRIMARY KEY, id INTEGER)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints "
+                "(file TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, rows INTEGER)"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+    def missing(self, hashes: Iterable[str]) -> Set[str]:
+        """Return the hashes which are not in the index"""
+        hashes = set(hashes)
+        found = set()
+        queried = list(hashes)
+        # stay below SQLite's limit on the number of query parameters
+        for start in range(0, len(queried), 500):
+            chunk = queried[start : start + 500]
+            query = f"SELECT hash FROM transactions WHERE hash IN ({','.join('?' * len(chunk))})"
+            found.update(row[0] for row in self._connection.execute(query, chunk))
+        return hashes - found
+
+    def add(self, ids: Dict[str, int]):
+        """Record ingested transactions as a mapping of hash to API id"""
+        with self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO transactions VALUES (?, ?)", ids.items())
+
+    def checkpoint(self, file: Path) -> int:
+        """The number of rows of `file` which have been ingested"""
+        stat = file.stat()
+        row = self._connection.execute(
+            "SELECT rows FROM checkpoints WHERE file = ? AND size = ? AND mtime_ns = ?",
+            (str(file.resolve()), stat.st_size, stat.st_mtime_ns),
+        ).fetchone()
+        return 0 if row is None else row[0]
+
+    def set_checkpoint(self, file: Path, rows: int):
+        """Record that the first `rows` rows of `file` have been ingested"""
+        stat = file.stat()
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?)",
+                (str(file.resolve()), stat.st_size, stat.st_mtime_ns, rows),
+            )
@@ -1,6 +1,10 @@
+import json
 import logging
 import logging.config
-from typing import Dict, List
+import queue
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
 
 
 def configure_parent_logger(
@@ -11,6 +15,10 @@ def configure_parent_logger(
     fname: str = None,
     header: str = None,
     blacklist: Dict[int, List[str]] = None,
+    structured: bool = False,
+    queued: bool = False,
+    rate_limit: Optional[float] = None,
+    caller: bool = True,
 ) -> logging.Logger:
     """Add a stream handler to of the given name and level to the logging module.
 
@@ -35,6 +43,15 @@ def configure_parent_logger(
         blacklist: a Dict[logging.LEVEL, List[str]].
             For each named logger in the list, set to
             the specified level. Defaults to None.
+        structured: Output one JSON object per line, see
+            `StructuredFormatter`. Defaults to False.
+        queued: Format and write the records on a background
+            thread, see `BackgroundHandler`. Defaults to False.
+        rate_limit: Most records a second logged from each
+            call site at INFO and below, see `RateLimitFilter`.
+            Defaults to None, which logs every record.
+        caller: Include the file, function and line of each
+            call in the default format. Defaults to True.
 
     Returns:
         `logging.Logger`: The named logger
@@ -44,10 +61,13 @@ def configure_parent_logger(
         >>> from clover_ui.log import configure_parent_logger
 
         >>> logger = configure_parent_logger(fname="/tmp/example.log", level=logging.INFO)
+        >>> logger = configure_parent_logger(fname="/tmp/example.log", queued=True, rate_limit=10, caller=False)
     """
 
     if format_string is None:
-        format_string = "%(asctime)s - [%(levelname)s] - %(name)s - %(filename)s:%(funcName)s:%(lineno)d"
+        format_string = "%(asctime)s - [%(levelname)s] - %(name)s"
+        if caller:
+            format_string += " - %(filename)s:%(funcName)s:%(lineno)d"
         if header is not None:
             format_string += f" | {header}"
         format_string += " | %(message)s\n"
@@ -87,11 +107,255 @@ def configure_parent_logger(
         config["loggers"][name]["handlers"].append("file")
         config["root"]["handlers"].append("file")
 
+    if structured:
+        config["formatters"]["basic"] = {"()": StructuredFormatter}
+
     logging.config.dictConfig(config)
+    named, root = logging.getLogger(name), logging.getLogger()
+    if queued:
+        background = BackgroundHandler(named.handlers)
+        for logger in (named, root):
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+            logger.addHandler(background)
+    if rate_limit is not None:
+        # one filter, which decides once for each record whichever handlers it reaches
+        limit = RateLimitFilter(rate=rate_limit)
+        for handler in {*named.handlers, *root.handlers}:
+            handler.addFilter(limit)
+
     # disable loggers from other libraries
     if blacklist is not None:
         for log_level, loggers in blacklist.items():
             for l in loggers:
                 logging.getLogger(l).setLevel(log_level)
 
-    return logging.getLogger(name)
+    return named
+
+
+class BackgroundHandler(logging.Handler):
+    """Hand records to a background thread, which formats and writes them to `handlers` in batches
+
+    `emit` only puts the record on a queue, so the logging call doesn't wait on formatting or I/O.
+    The thread takes the records queued since its last batch, up to `batch_size`, and writes each
+    stream handler's share of them with one write and one flush. Messages are formatted on the
+    thread, so the arguments of e.g. `logger.info("Created %s", row)` must not be modified after
+    the call. `close` writes the queued records before returning, and is called by
+    `logging.shutdown` at exit.
+
+    Args:
+        handlers: The handlers to write to, with their own levels, filters and formatters
+        capacity: Most records queued
+        batch_size: Most records written per batch
+        block: Wait for room when `capacity` records are queued, rather than dropping the record.
+            The number of records dropped is logged with the next batch.
+
+    Examples:
+        >>> handler = BackgroundHandler([logging.FileHandler("/tmp/clover.log")])
+        >>> logging.getLogger("clover").addHandler(handler)
+    """
+
+    def __init__(
+        self, handlers: Iterable[logging.Handler], capacity: int = 10000, batch_size: int = 512, block: bool = True
+    ):
+        super().__init__()
+        self.handlers = list(handlers)
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.block = block
+        self.dropped = 0
+        self._closed = False
+        # a SimpleQueue costs far less per put than a bounded queue.Queue, so the bound is kept by counting
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._queued = 0
+        self._written = 0
+        self._progress = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="clover-log", daemon=True)
+        self._thread.start()
+
+    def emit(self, record: logging.LogRecord):
+        # emit is called holding the handler's lock
+        if self._closed:
+            self._write([record])
+            return
+        if self._queued - self._written >= self.capacity:
+            if not self.block:
+                self.dropped += 1
+                return
+            with self._progress:
+                self._progress.wait_for(lambda: self._queued - self._written < self.capacity)
+        self._queued += 1
+        self._queue.put(record)
+
+    def flush(self):
+        """Wait until the records queued so far are written"""
+        if self._closed:
+            return
+        queued = self._queued
+        with self._progress:
+            self._progress.wait_for(lambda: self._written >= queued)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+        super().close()
+
+    def _run(self):
+        while True:
+            records = [self._queue.get()]
+            while len(records) < self.batch_size:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(record is None for record in records)
+            records = [record for record in records if record is not None]
+            taken, dropped, self.dropped = len(records), self.dropped, 0
+            if dropped:
+                warning = f"Dropped {dropped} log records, the queue was full"
+                records.insert(0, logging.makeLogRecord(dict(name=__name__, levelno=logging.WARNING, msg=warning)))
+            self._write(records)
+            with self._progress:
+                self._written += taken
+                self._progress.notify_all()
+            if stop:
+                return
+
+    def _write(self, records: List[logging.LogRecord]):
+        # handlers configured together share a formatter, which only has to format each record once
+        formatted: Dict[int, List[Optional[str]]] = {}
+        for handler in self.handlers:
+            if not isinstance(handler, logging.StreamHandler) or handler.stream is None:
+                for record in records:
+                    handler.handle(record)
+                continue
+            lines = formatted.get(id(handler.formatter))
+            if lines is None:
+                lines = formatted[id(handler.formatter)] = [self._format(handler, record) for record in records]
+            selected = [
+                line
+                for record, line in zip(records, lines)
+                if line is not None and record.levelno >= handler.level and handler.filter(record)
+            ]
+            if not selected:
+                continue
+            with handler.lock:
+                try:
+                    handler.stream.write(handler.terminator.join(selected) + handler.terminator)
+                    handler.flush()
+                except Exception:
+                    handler.handleError(records[-1])
+
+    @classmethod
+    def _format(cls, handler: logging.Handler, record: logging.LogRecord) -> Optional[str]:
+        try:
+            return handler.format(record)
+        except Exception:
+            handler.handleError(record)
+            return None
+
+
+class RateLimitFilter(logging.Filter):
+    """Let through at most `rate` records a second from each call site, after a burst of `burst`
+
+    Meant for messages logged per row or per request. Records at a level above `max_level` are
+    always let through. Records are grouped by logger and call site, or by message template if
+    `logging` doesn't look up call sites. The next record let
+    through from a call site says how many were suppressed since the last one.
+
+    One filter can be added to several handlers: each record takes one token, however many of
+    them it reaches, and the filter's decision is remembered on the record. Logger filters don't
+    see the records propagated from child loggers, so add it to the handlers rather than to a
+    parent logger.
+
+    Args:
+        rate: Records a second let through from each call site
+        burst: Records let through at once before the rate applies
+        max_level: The highest level which is limited
+
+    Examples:
+        >>> handler.addFilter(RateLimitFilter(rate=10))
+    """
+
+    def __init__(self, rate: float, burst: int = 100, max_level: int = logging.INFO):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        self._buckets: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        self._decision = f"_rate_limit_{id(self)}"
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        decision = record.__dict__.get(self._decision)
+        if decision is not None:
+            return decision
+        passed = self._take(record)
+        setattr(record, self._decision, passed)
+        return passed
+
+    def _take(self, record: logging.LogRecord) -> bool:
+        if record.lineno:
+            key = (record.name, record.pathname, record.lineno)
+        else:
+            key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= 4096:
+                    # many distinct messages, e.g. f-strings without call sites
+                    self._buckets.clear()
+                # [tokens, last update, records suppressed]
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            bucket[0] = min(bucket[0] + (now - bucket[1]) * self.rate, self.burst)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including the fields of `log_event`
+
+    Examples:
+        >>> handler = logging.StreamHandler()
+        >>> handler.setFormatter(StructuredFormatter())
+        >>> logging.getLogger("clover").addHandler(handler)
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        data.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, **fields):
+    """Log an `event` with structured `fields`, which are only formatted if the level is enabled
+
+    The message reads `event key=value ...` and the fields are attached to the record as
+    `record.fields`, see `StructuredFormatter`.
+
+    Examples:
+        >>> log_event(logger, "http.request", method="GET", endpoint="/categories", status=200)
+    """
+    if not logger.isEnabledFor(level):
+        return
+    message = " ".join([event, *[f"{key}={value}" for key, value in fields.items()]])
+    logger.log(level, message, extra={"fields": {"event": event, **fields}})
@@ -0,0 +1,355 @@
+import bisect
+import dataclasses
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from clover_ui.log import log_event
+
+logger = logging.getLogger("clover.http")
+
+# seconds, as used by Prometheus clients
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# bytes, from 256B to 64MiB
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(10))
+
+_ID_SEGMENT = re.compile(r"^\d+$")
+
+
+def endpoint_of(url: str) -> str:
+    """The path of `url` with numeric segments replaced by `{id}`, to label metrics by endpoint"""
+    path = urlsplit(url).path or "/"
+    return "/".join("{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/"))
+
+
+@dataclasses.dataclass(frozen=True)
+class AttemptEvent:
+    """One attempt at an HTTP request
+
+    Args:
+        method: The HTTP method
+        endpoint: The request path, see `endpoint_of`
+        attempt: The number of the attempt, starting at 1
+        duration: Seconds from sending the request to handling the response
+        status: The response status code, or None if there was no response
+        bytes_sent: Size of the request body
+        bytes_received: Size of the response body as sent, i.e. before it is decompressed
+        error: The class name of the exception the attempt raised, or None
+    """
+
+    method: str
+    endpoint: str
+    attempt: int
+    duration: float
+    status: Optional[int] = None
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    error: Optional[str] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class CallEvent:
+    """A request including all of its retries
+
+    Args:
+        method: The HTTP method
+        endpoint: The request path, see `endpoint_of`
+        attempts: The number of attempts made
+        duration: Seconds from the first attempt until the call returned or raised
+        backoff: Seconds spent waiting between attempts
+        error: The class name of the exception the call raised, or None
+    """
+
+    method: str
+    endpoint: str
+    attempts: int
+    duration: float
+    backoff: float
+    error: Optional[str] = None
+
+
+class Instrumentation:
+    """Hooks called by `RequestsWithRetry` and `AsyncRequestsWithRetry`, override the ones you need
+
+    Hooks are called on the thread making the request and must be thread-safe and quick.
+    """
+
+    def on_attempt(self, event: AttemptEvent):
+        """Called after each attempt at a request, whether it succeeded or raised"""
+
+    def on_call(self, event: CallEvent):
+        """Called once a request returns or gives up retrying"""
+
+
+class CallRecorder:
+    """Times the attempts of one request and reports them to the hooks
+
+    Examples:
+        >>> recorder = CallRecorder(hooks, "GET", url)
+        >>> start = time.perf_counter()
+        >>> recorder.attempt(start, status=200, bytes_received=512)
+        >>> recorder.finish()
+    """
+
+    __slots__ = ("hooks", "method", "endpoint", "attempts", "start", "busy")
+
+    def __init__(self, hooks: Sequence[Instrumentation], method: str, url: str):
+        self.hooks = hooks
+        self.method = method
+        self.endpoint = endpoint_of(url)
+        self.attempts = 0
+        self.start = time.perf_counter()
+        self.busy = 0.0
+
+    def attempt(
+        self,
+        start: float,
+        status: Optional[int] = None,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+        error: Optional[BaseException] = None,
+    ):
+        """Report an attempt which started at `start` (from `time.perf_counter`)"""
+        duration = time.perf_counter() - start
+        self.attempts += 1
+        self.busy += duration
+        event = AttemptEvent(
+            method=self.method,
+            endpoint=self.endpoint,
+            attempt=self.attempts,
+            duration=duration,
+            status=status,
+            bytes_sent=bytes_sent,
+            bytes_received=bytes_received,
+            error=None if error is None else type(error).__name__,
+        )
+        for hook in self.hooks:
+            hook.on_attempt(event)
+
+    def finish(self, error: Optional[BaseException] = None):
+        """Report the whole call, the time not spent in attempts was spent backing off"""
+        duration = time.perf_counter() - self.start
+        event = CallEvent(
+            method=self.method,
+            endpoint=self.endpoint,
+            attempts=self.attempts,
+            duration=duration,
+            backoff=max(duration - self.busy, 0.0) if self.attempts > 1 else 0.0,
+            error=None if error is None else type(error).__name__,
+        )
+        for hook in self.hooks:
+            hook.on_call(event)
+
+
+@dataclasses.dataclass(frozen=False)
+class Histogram:
+    """Counts of observations in cumulative buckets, as in Prometheus
+
+    Args:
+        buckets: The sorted upper bounds of the buckets, an implicit `+Inf` bucket holds the rest
+    """
+
+    buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    counts: List[int] = dataclasses.field(init=False)
+    sum: float = dataclasses.field(init=False, default=0.0)
+    count: int = dataclasses.field(init=False, default=0)
+
+    def __post_init__(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """The number of observations less than or equal to each bound, ending with `+Inf`"""
+        total, result = 0, []
+        for bound, count in zip([*self.buckets, float("inf")], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the `q` quantile by interpolating within its bucket, or None without observations"""
+        if not self.count:
+            return None
+        rank, lower = q * self.count, 0.0
+        for (bound, total), count in zip(self.cumulative(), self.counts):
+            if total >= rank and count:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - (total - count)) / count
+            lower = bound
+        return lower
+
+    def snapshot(self) -> dict:
+        return dict(
+            count=self.count,
+            sum=self.sum,
+            mean=self.sum / self.count if self.count else None,
+            p50=self.quantile(0.5),
+            p95=self.quantile(0.95),
+            p99=self.quantile(0.99),
+            buckets={str(bound): total for bound, total in self.cumulative()},
+        )
+
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# name: (type, help)
+METRICS = {
+    "clover_http_requests_total": ("counter", "HTTP request attempts by response status"),
+    "clover_http_errors_total": ("counter", "HTTP request attempts which raised, by exception class"),
+    "clover_http_retries_total": ("counter", "HTTP requests retried after a failed attempt"),
+    "clover_http_backoff_seconds_total": ("counter", "Seconds spent waiting between attempts"),
+    "clover_http_request_duration_seconds": ("histogram", "Duration of each HTTP request attempt"),
+    "clover_http_call_duration_seconds": ("histogram", "Duration of HTTP requests including retries"),
+    "clover_http_request_size_bytes": ("histogram", "Size of HTTP request bodies"),
+    "clover_http_response_size_bytes": ("histogram", "Size of HTTP response bodies as sent"),
+}
+
+
+@dataclasses.dataclass(frozen=False)
+class MetricsCollector(Instrumentation):
+    """A thread-safe, in-process collector of request counters and histograms
+
+    Metrics are labelled by method and endpoint (see `endpoint_of`). To bound the memory used,
+    endpoints beyond the first `max_endpoints` are counted as "other".
+
+    Args:
+        latency_buckets: Bucket bounds in seconds of the duration histograms
+        size_buckets: Bucket bounds in bytes of the payload size histograms
+        max_endpoints: Maximum number of distinct endpoints to label metrics with
+
+    Examples:
+        >>> metrics = MetricsCollector()
+        >>> clover = Facade().configure_retry().configure_instrumentation(metrics).clover()
+        >>> clover.fetch_categories()
+        >>> metrics.snapshot()["counters"]["clover_http_requests_total"]
+        [{'labels': {'method': 'GET', 'endpoint': '/categories', 'status': '200'}, 'value': 1.0}]
+        >>> print(metrics.prometheus())
+    """
+
+    latency_buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    size_buckets: Tuple[float, ...] = SIZE_BUCKETS
+    max_endpoints: int = 100
+    _counters: Dict[str, Dict[Labels, float]] = dataclasses.field(init=False, repr=False, default_factory=dict)
+    _histograms: Dict[str, Dict[Labels, Histogram]] = dataclasses.field(init=False, repr=False, default_factory=dict)
+    _endpoints: set = dataclasses.field(init=False, repr=False, default_factory=set)
+    _lock: threading.Lock = dataclasses.field(init=False, repr=False, default_factory=threading.Lock)
+
+    def on_attempt(self, event: AttemptEvent):
+        with self._lock:
+            endpoint = self._endpoint(event.endpoint)
+            labels = (("method", event.method), ("endpoint", endpoint))
+            if event.error is not None:
+                self._inc("clover_http_errors_total", (*labels, ("error", event.error)))
+            if event.status is not None:
+                self._inc("clover_http_requests_total", (*labels, ("status", str(event.status))))
+                self._observe("clover_http_request_size_bytes", labels, event.bytes_sent, self.size_buckets)
+                self._observe("clover_http_response_size_bytes", labels, event.bytes_received, self.size_buckets)
+            self._observe("clover_http_request_duration_seconds", labels, event.duration, self.latency_buckets)
+
+    def on_call(self, event: CallEvent):
+        with self._lock:
+            labels = (("method", event.method), ("endpoint", self._endpoint(event.endpoint)))
+            if event.attempts > 1:
+                self._inc("clover_http_retries_total", labels, event.attempts - 1)
+                self._inc("clover_http_backoff_seconds_total", labels, event.backoff)
+            self._observe("clover_http_call_duration_seconds", labels, event.duration, self.latency_buckets)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._endpoints.clear()
+
+    def snapshot(self) -> dict:
+        """The current counters and histograms, as plain data which can be serialised as JSON"""
+        with self._lock:
+            counters = {
+                name: [dict(labels=dict(labels), value=value) for labels, value in series.items()]
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: [dict(labels=dict(labels), **histogram.snapshot()) for labels, histogram in series.items()]
+                for name, series in self._histograms.items()
+            }
+        return dict(counters=counters, histograms=histograms)
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in METRICS.items():
+                if name not in self._counters and name not in self._histograms:
+                    continue
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for labels, value in self._counters.get(name, {}).items():
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+                for labels, histogram in self._histograms.get(name, {}).items():
+                    for bound, total in histogram.cumulative():
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{name}_bucket{_format_labels((*labels, ('le', le)))} {total}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _endpoint(self, endpoint: str) -> str:
+        if endpoint not in self._endpoints:
+            if len(self._endpoints) >= self.max_endpoints:
+                return "other"
+            self._endpoints.add(endpoint)
+        return endpoint
+
+    def _inc(self, name: str, labels: Labels, value: float = 1.0):
+        series = self._counters.setdefault(name, {})
+        series[labels] = series.get(labels, 0.0) + value
+
+    def _observe(self, name: str, labels: Labels, value: float, buckets: Tuple[float, ...]):
+        series = self._histograms.setdefault(name, {})
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram(buckets)
+        histogram.observe(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+@dataclasses.dataclass(frozen=False)
+class LoggingInstrumentation(Instrumentation):
+    """Log each attempt and call as a structured event, see `clover_ui.log.log_event`
+
+    Failed attempts are logged at `error_level`. The events are only formatted if the logger is
+    enabled for their level.
+
+    Args:
+        logger: The logger to log to
+        level: The level of successful attempts and calls
+        error_level: The level of attempts and calls which raised
+    """
+
+    logger: logging.Logger = logger
+    level: int = logging.DEBUG
+    error_level: int = logging.WARNING
+
+    def on_attempt(self, event: AttemptEvent):
+        self._log("http.attempt", event)
+
+    def on_call(self, event: CallEvent):
+        self._log("http.call", event)
+
+    def _log(self, name: str, event):
+        level = self.level if event.error is None else self.error_level
+        if self.logger.isEnabledFor(level):
+            log_event(self.logger, name, level, **dataclasses.asdict(event))
@@ -0,0 +1,275 @@
+import collections
+import contextlib
+import contextvars
+import dataclasses
+import itertools
+import logging
+import os
+from pathlib import Path
+import re
+import sys
+import threading
+import time
+from typing import Deque, Dict, Iterator, List, Optional, Tuple, Union
+
+from clover_ui.log import log_event
+
+logger = logging.getLogger("clover.profiling")
+
+DEFAULT_PROFILE_PATH = Path.home() / ".cache" / "clover-ui" / "profiles"
+
+# the trace of the render running in this thread, if it is being profiled
+_current: contextvars.ContextVar = contextvars.ContextVar("clover_render_trace", default=None)
+_untimed = contextlib.nullcontext()
+
+
+@dataclasses.dataclass(frozen=False)
+class Trace:
+    """The time spent in each stage of one render
+
+    Args:
+        key: The page and filters rendered
+        cached: True if the render was served from a cache rather than rendered, which
+            `RenderProfiler.stats` reports apart from the renders
+    """
+
+    key: str
+    cached: bool = False
+    stages: Dict[str, float] = dataclasses.field(default_factory=dict)
+    start: float = dataclasses.field(default_factory=time.perf_counter)
+    total: Optional[float] = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def stage(name: str):
+    """Time a stage of the render being traced in this thread, see `RenderProfiler.trace`
+
+    Stages may nest, and a stage entered more than once adds up. Without a trace this is a
+    no-op, so the hot path can be annotated unconditionally.
+
+    Examples:
+        >>> with stage("figures"):
+        ...     figure = go.Bar(x=days, y=expenses)
+    """
+    trace = _current.get()
+    if trace is None:
+        return _untimed
+    return trace.stage(name)
+
+
+def percentiles(values: List[float]) -> dict:
+    """The count, nearest-rank p50/p95/p99 and max of `values`"""
+    ordered = sorted(values)
+    n = len(ordered)
+
+    def rank(q: float) -> float:
+        return ordered[min(max(int(q * n + 0.5) - 1, 0), n - 1)]
+
+    return dict(count=n, p50=rank(0.5), p95=rank(0.95), p99=rank(0.99), max=ordered[-1])
+
+
+@dataclasses.dataclass(frozen=False)
+class SamplingProfiler:
+    """Sample the call stacks of watched threads from a background thread
+
+    Stacks are counted in the collapsed format of flame graph tools: frames from the outermost
+    inwards, separated by semicolons. The sampling thread is started on first use and sleeps
+    while no thread is watched.
+
+    Args:
+        interval: Seconds between samples
+
+    Examples:
+        >>> profiler = SamplingProfiler(interval=0.005)
+        >>> profiler.watch(threading.get_ident())
+        >>> render()
+        >>> stacks = profiler.unwatch(threading.get_ident())
+    """
+
+    interval: float = 0.005
+    _stacks: Dict[int, collections.Counter] = dataclasses.field(init=False, repr=False, default_factory=dict)
+    _lock: threading.Lock = dataclasses.field(init=False, repr=False, default_factory=threading.Lock)
+    _active: threading.Event = dataclasses.field(init=False, repr=False, default_factory=threading.Event)
+    _thread: Optional[threading.Thread] = dataclasses.field(init=False, repr=False, default=None)
+
+    def watch(self, thread_id: int):
+        with self._lock:
+            self._stacks[thread_id] = collections.Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="clover-profiler", daemon=True)
+                self._thread.start()
+            self._active.set()
+
+    def unwatch(self, thread_id: int) -> collections.Counter:
+        """Stop sampling `thread_id` and return the counts of its stacks"""
+        with self._lock:
+            stacks = self._stacks.pop(thread_id, collections.Counter())
+            if not self._stacks:
+                self._active.clear()
+        return stacks
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            self._active.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()  # pylint: disable=protected-access
+            with self._lock:
+                for thread_id, stacks in self._stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != me:
+                        stacks[self._collapse(frame)] += 1
+
+    @classmethod
+    def _collapse(cls, frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+
+@dataclasses.dataclass(frozen=False)
+class RenderProfiler:
+    """Time the stages of each render and keep rolling percentiles per page and filters
+
+    Renders are only timed while `enabled`. The last `window` renders of each key are kept, so
+    the percentiles follow the current data and load. Traces marked `cached` are kept and
+    reported apart, so that hits of a render cache don't hide the time the renders take. With a
+    `slow_threshold`, renders are also sampled by a `SamplingProfiler`, and the stacks of renders
+    slower than the threshold are written to `path` in the collapsed flame graph format.
+
+    Args:
+        enabled: Time renders
+        window: Number of renders kept per key
+        slow_threshold: Seconds after which a render is slow, or None to not sample renders
+        path: Directory the profiles of slow renders are written to
+        sample_interval: Seconds between the samples of the profiler
+
+    Examples:
+        >>> profiler = RenderProfiler(enabled=True, slow_threshold=0.5)
+        >>> with profiler.trace("/page-1?month=all"):
+        ...     with stage("query"):
+        ...         aggregates = cube.query()
+        >>> profiler.stats()
+    """
+
+    enabled: bool = False
+    window: int = 256
+    slow_threshold: Optional[float] = None
+    path: Union[str, Path] = DEFAULT_PROFILE_PATH
+    sample_interval: float = 0.005
+    # keyed by the key and whether the traces are `cached`
+    _traces: Dict[Tuple[str, bool], Deque[Trace]] = dataclasses.field(
+        init=False, repr=False, default_factory=dict
+    )
+    _dumps: Iterator[int] = dataclasses.field(init=False, repr=False, default_factory=itertools.count)
+    _lock: threading.Lock = dataclasses.field(init=False, repr=False, default_factory=threading.Lock)
+    _sampler: Optional[SamplingProfiler] = dataclasses.field(init=False, repr=False, default=None)
+
+    @classmethod
+    def from_env(cls) -> "RenderProfiler":
+        """Configure the profiler from the environment
+
+        `$CLOVER_PROFILE` set to 1 times renders, `$CLOVER_PROFILE_SLOW` sets the slow threshold
+        in seconds (which also times renders) and `$CLOVER_PROFILE_PATH` sets the `path`.
+        """
+        slow = os.environ.get("CLOVER_PROFILE_SLOW")
+        return cls(
+            enabled=os.environ.get("CLOVER_PROFILE", "0") not in ("", "0", "false") or bool(slow),
+            slow_threshold=float(slow) if slow else None,
+            path=os.environ.get("CLOVER_PROFILE_PATH", DEFAULT_PROFILE_PATH),
+        )
+
+    @contextlib.contextmanager
+    def trace(self, key: str) -> Iterator[Optional[Trace]]:
+        """Trace a render of `key` in this thread, yielding the `Trace` or None if not `enabled`"""
+        if not self.enabled:
+            yield None
+            return
+        trace = Trace(key)
+        token = _current.set(trace)
+        sampler, thread_id = None, threading.get_ident()
+        if self.slow_threshold is not None:
+            sampler = self._get_sampler()
+            sampler.watch(thread_id)
+        try:
+            yield trace
+        finally:
+            trace.total = time.perf_counter() - trace.start
+            _current.reset(token)
+            stacks = sampler.unwatch(thread_id) if sampler is not None else None
+            self.record(trace)
+            if stacks is not None and not trace.cached and trace.total >= self.slow_threshold:
+                self._dump(trace, stacks)
+
+    def record(self, trace: Trace):
+        with self._lock:
+            traces = self._traces.get((trace.key, trace.cached))
+            if traces is None:
+                traces = self._traces[trace.key, trace.cached] = collections.deque(maxlen=self.window)
+            traces.append(trace)
+
+    def reset(self):
+        with self._lock:
+            self._traces.clear()
+
+    def stats(self) -> List[dict]:
+        """Percentiles of the total and of each stage of the renders, and of the total of the
+        `cached` traces, per key, slowest p95 first, in seconds. Either is None without traces."""
+        with self._lock:
+            traces = {key: list(values) for key, values in self._traces.items()}
+        result = []
+        for key in dict.fromkeys(key for key, _ in traces):
+            rendered, cached = traces.get((key, False), []), traces.get((key, True), [])
+            stages = collections.defaultdict(list)
+            for trace in rendered:
+                for name, duration in trace.stages.items():
+                    stages[name].append(duration)
+            result.append(
+                dict(
+                    key=key,
+                    total=percentiles([trace.total for trace in rendered]) if rendered else None,
+                    stages={name: percentiles(durations) for name, durations in stages.items()},
+                    cached=percentiles([trace.total for trace in cached]) if cached else None,
+                )
+            )
+        return sorted(result, key=lambda row: row["total"]["p95"] if row["total"] else 0.0, reverse=True)
+
+    def _get_sampler(self) -> SamplingProfiler:
+        if self._sampler is None:
+            with self._lock:
+                if self._sampler is None:
+                    self._sampler = SamplingProfiler(interval=self.sample_interval)
+        return self._sampler
+
+    def _dump(self, trace: Trace, stacks: collections.Counter):
+        stages = " ".join(f"{name}={duration:.4f}" for name, duration in trace.stages.items())
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", trace.key).strip("-")
+        now = time.time()
+        # unique across the renders of a second and the processes writing to the same directory
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}"
+        file = Path(self.path) / f"{stamp}-{os.getpid()}-{next(self._dumps)}-{slug}.txt"
+        try:
+            file.parent.mkdir(parents=True, exist_ok=True)
+            file.write_text("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()))
+        except OSError as e:
+            logger.warning(f"Failed to write the profile of {trace.key}: {e}")
+            file = None
+        log_event(
+            logger,
+            "render.slow",
+            logging.WARNING,
+            key=trace.key,
+            total=f"{trace.total:.4f}",
+            stages=stages,
+            profile=file,
+        )
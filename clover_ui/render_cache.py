@@ -0,0 +1,64 @@
+import collections
+import dataclasses
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+
+
+@dataclasses.dataclass(frozen=False)
+class RenderCache:
+    """A thread-safe LRU cache of rendered pages with an optional time to live
+
+    Keys should hold everything the page depends on, including a version of the data, so that
+    an entry can never be served once the data has changed. Call `clear` when the data changes
+    to free the stale entries early.
+
+    Args:
+        maxsize: Maximum number of pages to keep, the least recently used is evicted first
+        ttl: Seconds an entry may be served for, or None to keep entries until they're evicted
+
+    Examples:
+        >>> cache = RenderCache(maxsize=64)
+        >>> page = cache.get_or_render(("/page-1", version), lambda: render("/page-1"))
+        >>> cache.stats()
+        {'hits': 0, 'misses': 1, 'size': 1, 'maxsize': 64}
+    """
+
+    maxsize: int = 128
+    ttl: Optional[float] = None
+    hits: int = dataclasses.field(init=False, default=0)
+    misses: int = dataclasses.field(init=False, default=0)
+    _entries: collections.OrderedDict = dataclasses.field(
+        init=False, repr=False, default_factory=collections.OrderedDict
+    )
+    _lock: threading.Lock = dataclasses.field(init=False, repr=False, default_factory=threading.Lock)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_render(self, key: Hashable, render: Callable[[], Any]) -> Any:
+        """Return the page cached under `key`, calling `render` to create it on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or now - entry[0] < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        page = render()
+        with self._lock:
+            self._entries[key] = (now, page)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return page
+
+    def clear(self, *args):
+        """Drop every entry. Accepts and ignores arguments so it can be used as a listener."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses, size=len(self._entries), maxsize=self.maxsize)
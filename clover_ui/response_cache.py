@@ -0,0 +1,171 @@
+import collections
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+from typing import Any, Dict, Optional, Sequence, Union
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger("clover.http")
+
+
+@dataclasses.dataclass(frozen=True)
+class CachedResponse:
+    """A decoded response body and the validators to revalidate it with
+
+    Args:
+        key: The full URL of the request, including its query, and the callback which decoded it
+        value: The value the response callback returned
+        etag: The `ETag` response header
+        last_modified: The `Last-Modified` response header
+    """
+
+    key: str
+    value: Any
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers which make the server answer 304 Not Modified if the response is still current"""
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclasses.dataclass(frozen=False)
+class ResponseCache:
+    """A thread-safe LRU cache of decoded GET responses, revalidated with ETag/Last-Modified
+
+    `RequestsWithRetry` sends the validators of a cached response with each request to its URL
+    and reuses the decoded value when the server answers 304 Not Modified, so an unchanged
+    response costs a round trip without a body or a JSON decode. Only responses with an `ETag`
+    or `Last-Modified` header are cached.
+
+    Entries are kept in memory and, with a `path`, also on disk as JSON so they survive restarts.
+    The cached values are shared between callers and must not be modified. Responses are cached
+    per URL and callback, so one URL can be decoded in different ways.
+
+    Args:
+        maxsize: Maximum number of responses kept in memory
+        endpoints: URL paths to cache, e.g. `["/categories", "/transactions"]`, matched against the
+            start of the request's path. None caches every GET.
+        skip_params: Query parameters whose requests aren't cached, e.g. `["since"]` so that the
+            pages after the first of a paged listing, which are rarely requested twice, aren't kept
+        path: Directory of the on-disk tier, or None to only cache in memory
+        disk_maxsize: Maximum number of responses kept on disk
+
+    Examples:
+        >>> cache = ResponseCache(maxsize=64, endpoints=["/categories"], path=Path.home() / ".cache" / "http")
+        >>> request = RequestsWithRetry(retrying=retrying_factory(), cache=cache)
+        >>> cache.stats()
+        {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 64}
+    """
+
+    maxsize: int = 256
+    endpoints: Optional[Sequence[str]] = None
+    skip_params: Sequence[str] = ()
+    path: Union[str, Path, None] = None
+    disk_maxsize: int = 1024
+    hits: int = dataclasses.field(init=False, default=0)
+    misses: int = dataclasses.field(init=False, default=0)
+    _entries: collections.OrderedDict = dataclasses.field(
+        init=False, repr=False, default_factory=collections.OrderedDict
+    )
+    _lock: threading.Lock = dataclasses.field(init=False, repr=False, default_factory=threading.Lock)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def accepts(self, url: str) -> bool:
+        """Whether responses from `url` are cached"""
+        parts = urlsplit(url)
+        if self.skip_params and not set(self.skip_params).isdisjoint(parse_qs(parts.query)):
+            return False
+        if self.endpoints is None:
+            return True
+        path = parts.path
+        return any(path == endpoint or path.startswith(endpoint.rstrip("/") + "/") for endpoint in self.endpoints)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """The cached response under `key` from memory or disk, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        entry = self._read(key)
+        if entry is not None:
+            self._remember(entry)
+        return entry
+
+    def put(self, entry: CachedResponse):
+        self._remember(entry)
+        self._write(entry)
+
+    def record(self, hit: bool):
+        """Count a request which was answered with 304 Not Modified (a `hit`) or with a new body"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def clear(self, *args):
+        """Drop every entry, in memory and on disk. Accepts and ignores arguments so it can be a listener."""
+        with self._lock:
+            self._entries.clear()
+        if self.path is not None:
+            for file in Path(self.path).glob("*.json"):
+                file.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses, size=len(self._entries), maxsize=self.maxsize)
+
+    def _remember(self, entry: CachedResponse):
+        with self._lock:
+            self._entries[entry.key] = entry
+            self._entries.move_to_end(entry.key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _file(self, key: str) -> Path:
+        return Path(self.path) / f"{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+    def _read(self, key: str) -> Optional[CachedResponse]:
+        if self.path is None:
+            return None
+        file = self._file(key)
+        try:
+            data = json.loads(file.read_text())
+            # the modification time orders the disk tier for eviction
+            os.utime(file)
+        except (OSError, ValueError):
+            return None
+        if data.get("key") != key:
+            return None
+        return CachedResponse(**data)
+
+    def _write(self, entry: CachedResponse):
+        if self.path is None:
+            return
+        directory = Path(self.path)
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            file = self._file(entry.key)
+            tmp = file.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(dataclasses.asdict(entry)))
+            os.replace(tmp, file)
+            files = sorted(directory.glob("*.json"), key=lambda f: f.stat().st_mtime)
+            for old in files[: max(len(files) - self.disk_maxsize, 0)]:
+                old.unlink(missing_ok=True)
+        except (TypeError, ValueError) as e:
+            # e.g. a decoded frame rather than JSON, which is only cached in memory
+            logger.debug(f"Not caching {entry.key} on disk: {e}")
+        except OSError as e:
+            logger.warning(f"Failed to cache {entry.key} on disk: {e}")
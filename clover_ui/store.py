@@ -0,0 +1,116 @@
+import dataclasses
+from typing import List, Tuple
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# The columns of the transactions and categories returned by the API
+TRANSACTION_COLUMNS = ["id", "time", "transaction_type", "payee", "description", "total", "category_name"]
+CATEGORY_COLUMNS = ["name", "display_name"]
+
+# The dictionary-encoded columns of the store
+STRING_COLUMNS = ["transaction_type", "payee", "description", "category_name", "display_name"]
+
+
+def prepare_transactions(transactions: pd.DataFrame, categories: pd.DataFrame) -> pd.DataFrame:
+    """Convert transactions from the API into the compact layout of a `TransactionStore`
+
+    The result is indexed and sorted by time, with the string columns as categoricals, the
+    category's `display_name` looked up (falling back to the `category_name`) and the total as
+    int32 `cents`.
+    """
+    transactions = transactions.reindex(columns=TRANSACTION_COLUMNS)
+    display_names = categories.drop_duplicates("name").set_index("name").display_name
+    category_names = transactions.category_name
+    frame = pd.DataFrame(
+        {
+            "id": transactions.id.astype("int64"),
+            "transaction_type": transactions.transaction_type.astype("category"),
+            "payee": transactions.payee.astype("category"),
+            "description": transactions.description.astype("category"),
+            "category_name": category_names.astype("category"),
+            "display_name": category_names.map(display_names).fillna(category_names).astype("category"),
+            "cents": (transactions.total.astype(float) * 100).round().astype("int32"),
+        }
+    )
+    frame.index = pd.DatetimeIndex(pd.to_datetime(transactions.time), name="time")
+    return frame.sort_index(kind="stable")
+
+
+def concat_transactions(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate prepared transactions, keeping the string columns categorical"""
+    frames = [frame for frame in frames if not frame.empty] or frames[:1]
+    for column in STRING_COLUMNS:
+        categories = union_categoricals([frame[column] for frame in frames]).categories
+        frames = [frame.assign(**{column: frame[column].cat.set_categories(categories)}) for frame in frames]
+    return pd.concat(frames).sort_index(kind="stable")
+
+
+@dataclasses.dataclass(frozen=True)
+class TransactionStore:
+    """A compact, immutable set of transactions sorted by time
+
+    Strings are stored as categoricals, totals as int32 `cents` and the time only as the index.
+    Changes return a new store, so readers can keep using views of an old one.
+
+    Args:
+        transactions: Transactions in the layout of `prepare_transactions`
+        categories: The categories the `display_name`s were looked up in
+
+    Examples:
+        >>> store = TransactionStore.empty()
+        >>> store, added, removed = store.upsert(pd.DataFrame(clover.fetch_transactions()), categories)
+        >>> march = store.transactions.loc["2020-03"]
+    """
+
+    transactions: pd.DataFrame
+    categories: pd.DataFrame
+
+    @classmethod
+    def empty(cls) -> "TransactionStore":
+        categories = pd.DataFrame(columns=CATEGORY_COLUMNS)
+        return cls(prepare_transactions(pd.DataFrame(columns=TRANSACTION_COLUMNS), categories), categories)
+
+    def __len__(self) -> int:
+        return self.transactions.shape[0]
+
+    def memory_usage(self) -> int:
+        """Bytes held by the transactions"""
+        return int(self.transactions.memory_usage(index=True, deep=True).sum())
+
+    def equals(self, other: "TransactionStore") -> bool:
+        """True if both stores hold the same transactions and categories, whatever the order of the
+        transactions with the same time or of the categories of the string columns"""
+        if len(self) != len(other) or not self.categories.equals(other.categories):
+            return False
+
+        def canonical(transactions: pd.DataFrame) -> pd.DataFrame:
+            transactions = transactions.reset_index().sort_values("id", kind="stable", ignore_index=True)
+            return transactions.astype({column: object for column in STRING_COLUMNS})
+
+        return canonical(self.transactions).equals(canonical(other.transactions))
+
+    def with_categories(self, categories: pd.DataFrame) -> "TransactionStore":
+        """Look up the `display_name`s again with new categories"""
+        display_names = categories.drop_duplicates("name").set_index("name").display_name
+        category_names = self.transactions.category_name.astype(object)
+        display_name = category_names.map(display_names).fillna(category_names).astype("category")
+        return TransactionStore(self.transactions.assign(display_name=display_name), categories)
+
+    def upsert(
+        self, new: pd.DataFrame, categories: pd.DataFrame
+    ) -> Tuple["TransactionStore", pd.DataFrame, pd.DataFrame]:
+        """Add transactions from the API, replacing held transactions with the same id
+
+        Returns:
+            The new store, the prepared transactions which were added and the held ones which were replaced
+        """
+        store = self
+        if not categories.equals(self.categories):
+            store = self.with_categories(categories)
+        added = prepare_transactions(new, categories)
+        held = store.transactions
+        replaced = held.id.isin(added.id).values
+        removed = held[replaced]
+        transactions = concat_transactions([held[~replaced], added]) if len(added) else held
+        return TransactionStore(transactions, categories), added, removed
@@ -0,0 +1,263 @@
+import asyncio
+import dataclasses
+import inspect
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+
+from clover_ui.api import CloverAPI
+from clover_ui.cache import TransactionCache
+from clover_ui.store import CATEGORY_COLUMNS, TRANSACTION_COLUMNS, TransactionStore
+
+logger = logging.getLogger("clover.sync")
+
+
+@dataclasses.dataclass(frozen=True)
+class Update:
+    """A change to the synced transactions, passed to `TransactionSync` listeners
+
+    Args:
+        transactions: The transactions after the change
+        added: Transactions which were added, or replaced a held transaction
+        removed: Held transactions which were replaced
+        full: True if every transaction changed, e.g. on load or when the categories change
+    """
+
+    transactions: pd.DataFrame
+    added: pd.DataFrame
+    removed: pd.DataFrame
+    full: bool = False
+
+
+@dataclasses.dataclass(frozen=False)
+class TransactionSync:
+    """Keep an in-memory frame of transactions up to date with the Clover API
+
+    The transactions are held in a compact `TransactionStore`. The first `refresh` fetches the
+    full history, one page at a time. Later refreshes only fetch the transactions with an id
+    greater than the largest one held: the API has no way to ask for the transactions changed
+    since, so those only pick up new transactions. Every `revalidate_interval` seconds a refresh
+    instead fetches the full history again and, if it differs from the one held, replaces it, which
+    picks up the transactions edited or deleted since. `start` runs the refreshes on a background
+    thread. Readers get a consistent frame from `transactions`, which is swapped atomically and
+    never modified in place; `version` is bumped each time it changes.
+
+    Each change is passed as an `Update` to the `listeners`, on the thread which made it, before
+    `transactions` is swapped.
+
+    With a `cache`, `load` restores the frame saved by the last refresh which changed it and when
+    it was last revalidated, so the next refresh only fetches the transactions created since.
+
+    While the API is unavailable, the transactions held are still served as they are, stale, and
+    each refresh revalidates them: `error` holds the error of the last refresh until one succeeds,
+    and `synced_at` is when the API last confirmed them, or when the loaded cache was saved.
+
+    With `follow`, the API is never called: the background thread instead loads each new
+    generation another process saves to the `cache`. One refreshing process can then feed any
+    number of following worker processes, which share the memory-mapped cache files.
+
+    Args:
+        clover: The API client, or an `AsyncCloverAPI` to fetch the categories and transactions concurrently
+        page_size: Number of transactions to fetch per request
+        interval: Seconds between background refreshes
+        revalidate_interval: Seconds between refreshes of the full history, or None to never refresh it
+        cache: Where to persist the prepared transactions between runs
+        listeners: Callables to notify of each `Update`
+        follow: Only load the transactions other processes save to the `cache`
+
+    Examples:
+        >>> sync = TransactionSync(Facade().configure_retry().clover())
+        >>> sync.start()
+        >>> df = sync.transactions
+        >>> cache = TransactionCache(path, host=clover.host)
+        >>> worker = TransactionSync(clover, interval=5, cache=cache, follow=True).start()
+    """
+
+    clover: CloverAPI
+    page_size: int = 1000
+    interval: float = 60.0
+    revalidate_interval: Optional[float] = 3600.0
+    cache: Optional[TransactionCache] = None
+    listeners: List[Callable[[Update], None]] = dataclasses.field(default_factory=list)
+    follow: bool = False
+
+    store: TransactionStore = dataclasses.field(init=False, default_factory=TransactionStore.empty)
+    version: int = dataclasses.field(init=False, default=0)
+    generation: int = dataclasses.field(init=False, default=0)
+    synced_at: Optional[float] = dataclasses.field(init=False, default=None)
+    revalidated_at: Optional[float] = dataclasses.field(init=False, default=None)
+    error: Optional[Exception] = dataclasses.field(init=False, default=None)
+    _lock: threading.Lock = dataclasses.field(init=False, repr=False, default_factory=threading.Lock)
+    _stopped: threading.Event = dataclasses.field(init=False, repr=False, default_factory=threading.Event)
+    _thread: Optional[threading.Thread] = dataclasses.field(init=False, repr=False, default=None)
+
+    @property
+    def transactions(self) -> pd.DataFrame:
+        return self.store.transactions
+
+    @property
+    def categories(self) -> pd.DataFrame:
+        return self.store.categories
+
+    @property
+    def stale(self) -> bool:
+        """True if the last refresh failed, so the transactions held may be out of date"""
+        return self.error is not None
+
+    def status(self) -> dict:
+        """The number of transactions held, their version, when they were synced and the last error"""
+        return dict(
+            transactions=len(self.transactions),
+            version=self.version,
+            synced_at=self.synced_at,
+            stale=self.stale,
+            error=None if self.error is None else str(self.error),
+        )
+
+    @property
+    def cursor(self) -> Optional[int]:
+        """The largest transaction id held, or None before the first refresh"""
+        if self.transactions.empty:
+            return None
+        return int(self.transactions.id.max())
+
+    def load(self) -> bool:
+        """Load the transactions from the cache. Returns True if there was a usable cache."""
+        if self.cache is None:
+            return False
+        try:
+            generation, saved_at = self.cache.generation, self.cache.saved_at
+            cached = self.cache.load()
+        except Exception as e:
+            logger.warning(f"Failed to load cached transactions: {e}")
+            return False
+        if cached is None:
+            return False
+        transactions, categories, revalidated_at = cached
+        with self._lock:
+            self._notify(Update(transactions, added=transactions, removed=transactions.iloc[:0], full=True))
+            self.store = TransactionStore(transactions, categories)
+            self.generation = generation
+            self.synced_at = saved_at
+            self.revalidated_at = revalidated_at
+            self.version += 1
+        logger.info(f"Loaded {len(self.transactions)} cached transactions (generation {generation})")
+        return True
+
+    def poll(self) -> bool:
+        """Load the cache if a new generation was saved since the last load. Returns True if it was."""
+        if self.cache is None or self.cache.generation == self.generation:
+            return False
+        return self.load()
+
+    @property
+    def revalidation_due(self) -> bool:
+        """True if the next refresh fetches the full history again"""
+        if self.revalidate_interval is None:
+            return False
+        return self.revalidated_at is None or time.time() - self.revalidated_at >= self.revalidate_interval
+
+    def refresh(self) -> int:
+        """Fetch new transactions and merge them into `transactions`, or the full history if
+        `revalidation_due` and replace `transactions` with it
+
+        Returns:
+            The number of transactions fetched, or 0 if `transactions` didn't change
+        """
+        with self._lock:
+            revalidate = self.cursor is not None and self.revalidation_due
+            try:
+                categories, new = self._fetch(None if revalidate else self.cursor)
+            except Exception as e:
+                self.error = e
+                raise
+            now = time.time()
+            self.error, self.synced_at = None, now
+            if self.cursor is None or revalidate:
+                self.revalidated_at = now
+            categories_changed = not categories.equals(self.categories)
+            if new.empty and not categories_changed and not revalidate:
+                return 0
+
+            if new.empty:
+                new = pd.DataFrame(columns=TRANSACTION_COLUMNS)
+            if revalidate:
+                store, _, _ = TransactionStore.empty().upsert(new, categories)
+                if store.equals(self.store):
+                    logger.info(f"Revalidated {len(new)} transactions, none changed")
+                    return 0
+                added, removed = store.transactions, self.transactions
+            else:
+                store, added, removed = self.store.upsert(new, categories)
+            transactions = store.transactions
+            # the cube and other listeners have to start over if every display name may have changed,
+            # or after a revalidation, which may have changed or removed any transaction
+            if self.store.transactions.empty or categories_changed or revalidate:
+                update = Update(transactions, added=transactions, removed=removed, full=True)
+            else:
+                update = Update(transactions, added=added, removed=removed)
+
+            self._notify(update)
+            self.store = store
+            self.version += 1
+            logger.info(f"Synced {len(new)} transactions, holding {len(transactions)} (version {self.version})")
+            if self.cache is not None:
+                try:
+                    self.cache.save(transactions, categories, revalidated_at=self.revalidated_at)
+                    self.generation = self.cache.generation
+                except Exception as e:
+                    logger.warning(f"Failed to cache transactions: {e}")
+            return len(new)
+
+    def _fetch(self, since: Optional[int]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """The categories and the transactions with an id greater than `since`"""
+        if inspect.iscoroutinefunction(getattr(self.clover, "fetch_snapshot", None)):
+            categories, new = asyncio.run(self._fetch_async(since))
+        else:
+            categories = self.clover.fetch_categories()
+            new = self.clover.fetch_transactions_frame(since=since, page_size=self.page_size)
+        return pd.DataFrame(categories, columns=CATEGORY_COLUMNS), new
+
+    async def _fetch_async(self, since: Optional[int]) -> Tuple[list, pd.DataFrame]:
+        try:
+            return await self.clover.fetch_snapshot(since=since, page_size=self.page_size)
+        finally:
+            # the client's connections belong to this refresh's event loop
+            await self.clover.close()
+
+    def _notify(self, update: Update):
+        for listener in self.listeners:
+            try:
+                listener(update)
+            except Exception as e:
+                logger.error(f"Transactions listener {listener} failed: {e}")
+
+    def run(self):
+        """Refresh (or `poll` when following) every `interval` seconds on this thread until `stop` is called"""
+        while not self._stopped.is_set():
+            try:
+                if self.follow:
+                    self.poll()
+                else:
+                    self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to sync transactions: {e}")
+            self._stopped.wait(self.interval)
+
+    def start(self) -> "TransactionSync":
+        """Load the cache, if it hasn't been, then `run` on a daemon thread"""
+        if self.version == 0:
+            self.load()
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self.run, name="clover-sync", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
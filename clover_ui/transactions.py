@@ -1,43 +1,74 @@
-import dash
+import itertools
+
 import dash_bootstrap_components as dbc
-import dash_core_components as dcc
 import dash_html_components as html
 import pandas as pd
 
+from clover_ui.profiling import stage
+
+# Number of transactions rendered per page of the transactions list
+PAGE_SIZE = 100
+
 
 # --- Transactions
-def make_transaction_group(df: pd.DataFrame):
-    """Create a group of transactions"""
-    list_items = []
-    for idx, transaction in df.iterrows():
-        list_items.append(
-            dbc.ListGroupItem(
-                [
-                    dbc.ListGroupItemHeading(html.H6(transaction.payee)),
-                    dbc.ListGroupItemText([html.P(transaction.display_name), html.P(f"$ {transaction.total}")]),
-                ],
-                action=True,
-            )
+def make_transaction_items(payees, display_names, totals) -> list:
+    """Create the list items of a group of transactions from columns of values"""
+    return [
+        dbc.ListGroupItem(
+            [dbc.ListGroupItemHeading(html.H6(payee)), dbc.ListGroupItemText([html.P(display_name), html.P(total)])],
+            action=True,
         )
-    return dbc.ListGroup(list_items)
+        for payee, display_name, total in zip(payees, display_names, totals)
+    ]
+
+
+def format_totals(transactions: pd.DataFrame) -> pd.Series:
+    """The totals of transactions in the layout of a `TransactionStore` as dollars"""
+    return "$ " + (transactions.cents / 100).astype(str)
 
 
 def join_transaction_groups(transactions: pd.DataFrame):
-    """Join a list of transaction groups"""
+    """Join a list of transaction groups, one per day"""
     output_list = []
-    for group, df in transactions.groupby("days"):
-        output_list.append(html.Div(html.H6(group.strftime("%m-%d"), style={"padding": 10})))
-        output_list.append(html.Div(make_transaction_group(df), style={"padding": 10}))
+    rows = zip(
+        transactions.index.strftime("%m-%d"),
+        transactions.payee.values,
+        transactions.display_name.values,
+        format_totals(transactions).values,
+    )
+    for day, group in itertools.groupby(rows, key=lambda row: row[0]):
+        _, payees, display_names, totals = zip(*group)
+        output_list.append(html.Div(html.H6(day, style={"padding": 10})))
+        output_list.append(
+            html.Div(dbc.ListGroup(make_transaction_items(payees, display_names, totals)), style={"padding": 10})
+        )
     return output_list
 
 
-def generate_transactions_list(transactions: pd.DataFrame):
+def make_pager(page: int, pages: int):
+    """Previous and next buttons for the pages of transactions"""
+    return html.Div(
+        [
+            dbc.Button("Previous", id="transactions-previous", color="light", disabled=page == 0),
+            html.Span(f"Page {page + 1} of {pages}", style={"padding": 10}),
+            dbc.Button("Next", id="transactions-next", color="light", disabled=page >= pages - 1),
+        ],
+        style={"padding": 10},
+    )
+
+
+def generate_transactions_list(transactions: pd.DataFrame, page: int = 0, page_size: int = PAGE_SIZE):
+    """Render one page of the transactions, which are expected to be sorted by time"""
+
+    pages = max((transactions.shape[0] + page_size - 1) // page_size, 1)
+    page = min(max(page, 0), pages - 1)
 
     # --- Create list groups
-    transactions_list = join_transaction_groups(transactions)
+    with stage("list"):
+        transactions_list = join_transaction_groups(transactions.iloc[page * page_size : (page + 1) * page_size])
 
     transactions_section = html.Div(
-        children=[html.Div(html.H1("Transactions")), html.Div(transactions_list),],
+        children=[html.Div(html.H1("Transactions")), make_pager(page, pages), html.Div(transactions_list),],
         style={"padding-left": "2%", "padding-right": "2%"},
     )
     return transactions_section
@@ -0,0 +1,29 @@
+"""gunicorn settings for `gunicorn wsgi:server`
+
+The master runs `refresh.py` in a child process to keep the transactions cache up to date, and
+each worker follows the cache (see `wsgi.py`).
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+
+bind = os.environ.get("CLOVER_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("CLOVER_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.environ.get("CLOVER_THREADS", 2))
+# importing and creating the app has no side effects, so do it once in the master and fork it
+preload_app = True
+
+_refresher = None
+
+
+def when_ready(server):
+    global _refresher
+    _refresher = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(__file__), "refresh.py")])
+    server.log.info(f"Started transactions refresher (pid {_refresher.pid})")
+
+
+def on_exit(server):
+    if _refresher is not None:
+        _refresher.terminate()
+        _refresher.wait()
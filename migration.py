@@ -1,17 +1,34 @@
 """A helper script to populate the API with data from files
 """
 import argparse
+import collections
+from concurrent.futures import Future, ThreadPoolExecutor
+import dataclasses
 import json
 import logging
 from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
 
 from clover_ui import Facade
+from clover_ui.api import CloverAPI
+from clover_ui.http import MethodNotAllowedError
+from clover_ui.ingest import IngestIndex, transaction_hashes
 from clover_ui.log import configure_parent_logger
+import numpy as np
 import pandas as pd
 
-logger = configure_parent_logger(level=logging.INFO)
+# configured by `configure_parent_logger` when run as a script
+logger = logging.getLogger("clover.migration")
 
-clover = Facade().configure_retry().clover()
+# The columns we read from the bank exports
+CSV_DTYPES = {
+    "Time": str,
+    "Transaction Type": str,
+    "Payee": str,
+    "Description": str,
+    "Total (AUD)": str,
+    "Category": str,
+}
 
 
 def get_categories(search_path: Path) -> dict:
@@ -23,42 +40,272 @@ def get_categories(search_path: Path) -> dict:
     return categories
 
 
-def create_categories(categories: dict):
-    """Ensure all our categories exist in the API"""
-    for display_name, name in categories.items():
+def iter_ordered(
+    fn: Callable, items: Iterable, workers: int = 1
+) -> Iterator[Tuple[object, object, Optional[Exception]]]:
+    """Apply `fn` to each item on a pool of `workers` threads
+
+    Results are yielded as `(item, result, error)` in the order of `items`. At most `2 * workers`
+    items are in flight at once, so a lazy `items` iterable is only consumed as fast as it is processed.
+    """
+
+    def _result(item, future: Future):
         try:
-            response = clover.fetch_transactions_by_category(name)
-        except FileNotFoundError:
-            logger.info(f"Category: ({display_name}, {name}) doesn't exist, creating")
-            clover.create_category(name, display_name)
+            return item, future.result(), None
+        except Exception as e:
+            return item, None, e
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for item in items:
+            pending.append((item, executor.submit(fn, item)))
+            if len(pending) >= 2 * workers:
+                yield _result(*pending.popleft())
+        while pending:
+            yield _result(*pending.popleft())
+
+
+def create_categories(clover: CloverAPI, categories: dict, workers: int = 1):
+    """Ensure all our categories exist in the API"""
+    existing = {category["name"] for category in clover.fetch_categories()}
+    missing = [(display_name, name) for display_name, name in categories.items() if name not in existing]
+    for (display_name, name), _, error in iter_ordered(lambda c: clover.create_category(c[1], c[0]), missing, workers):
+        if error is not None:
+            raise error
+        logger.info(f"Category: ({display_name}, {name}) doesn't exist, created")
+
+
+def iter_csvs(search_path: Path, chunk_size: int = 10000) -> Iterator[pd.DataFrame]:
+    """Stream the CSVs in a search path as chunks of at most `chunk_size` rows
+
+    Only the columns in `CSV_DTYPES` are read, as strings, with empty cells kept as "". The
+    "Total (AUD)" column is parsed into floats one chunk at a time. Each chunk's `attrs` hold the
+    `file` it came from and the `offset` of its first row in that file.
+    """
+    for file in sorted(search_path.glob("*.csv")):
+        reader = pd.read_csv(
+            file, usecols=list(CSV_DTYPES), dtype=CSV_DTYPES, keep_default_na=False, chunksize=chunk_size
+        )
+        offset = 0
+        for chunk in reader:
+            chunk["Total (AUD)"] = parse_totals(chunk["Total (AUD)"])
+            chunk.attrs.update(file=file, offset=offset)
+            offset += chunk.shape[0]
+            yield chunk
 
 
 def load_csvs(search_path: Path) -> pd.DataFrame:
     """Load a bunch of CSVs in a search path into a `pandas.DataFrame`."""
-    data = []
-    for file in search_path.glob("*.csv"):
-        data.append(pd.read_csv(file))
-    return pd.concat(data).fillna("").reset_index(drop=True)
+    return pd.concat(iter_csvs(search_path)).reset_index(drop=True)
+
 
+def parse_totals(totals: pd.Series) -> pd.Series:
+    """Parse amounts like "-1,234.50" into floats"""
+    if totals.dtype == object:
+        totals = totals.str.replace(",", "", regex=False)
+    return pd.to_numeric(totals).astype(float)
 
-def create_transactions(transactions: pd.DataFrame, categories: dict):
 
-    transactions["Total (AUD)"] = (
-        transactions["Total (AUD)"].str.replace(",", "").astype(float)
+def to_payloads(transactions: pd.DataFrame, categories: dict) -> pd.DataFrame:
+    """Convert rows of a bank export into payloads for `CloverAPI.send_transaction(s)`"""
+    return pd.DataFrame(
+        {
+            "time": transactions["Time"],
+            "transaction_type": transactions["Transaction Type"],
+            "payee": transactions["Payee"],
+            "description": transactions["Description"],
+            "total": transactions["Total (AUD)"].astype(float),
+            "category_name": transactions["Category"].map(categories).fillna("uncategorised"),
+        }
     )
 
-    for index, transaction in transactions.iterrows():
-        transaction_id = clover.send_transaction(
-            time=transaction["Time"],
-            transaction_type=transaction["Transaction Type"],
-            payee=transaction["Payee"],
-            description=transaction["Description"],
-            total=float(transaction["Total (AUD)"]),
-            category_name=categories.get(transaction["Category"], "uncategorised"),
-        )
-        logger.info(
-            f"Created transaction {index} of {transactions.shape[0]}... ID: {transaction_id}"
-        )
+
+class PartialBatchError(RuntimeError):
+    """A class to wrap when a batch posted one transaction at a time fails part way through
+
+    Args:
+        ids: The ids of the transactions created before the failure, in the order of the batch
+        error: The error of the transaction which failed
+    """
+
+    def __init__(self, ids: List[int], error: Exception):
+        super().__init__(f"Created {len(ids)} transactions before failing: {error}")
+        self.ids = ids
+        self.error = error
+
+
+def send_batch(clover: CloverAPI, payloads: List[dict], bulk: bool = True) -> List[int]:
+    """Post a batch of transactions, one request per transaction if `bulk` is False
+
+    Raises:
+        PartialBatchError: If a transaction fails when posting one at a time, with the ids of
+            the transactions created before it
+    """
+    if bulk:
+        return clover.send_transactions(payloads, chunk_size=len(payloads))
+    ids = []
+    for payload in payloads:
+        try:
+            ids.append(clover.send_transaction(**payload))
+        except Exception as e:
+            raise PartialBatchError(ids, e) from e
+    return ids
+
+
+@dataclasses.dataclass(frozen=True)
+class Batch:
+    """A batch of transactions to post
+
+    Args:
+        start: Position of the batch's first row in the stream of transactions
+        stop: Position after the batch's last row
+        payloads: The transactions to post, rows already in the index are left out
+        hashes: The `transaction_hashes` of `payloads`, if an index is used
+        file: The file the rows came from, if known
+        file_stop: Number of rows of `file` ingested once this batch is posted
+    """
+
+    start: int
+    stop: int
+    payloads: List[dict]
+    hashes: Optional[List[str]] = None
+    file: Optional[Path] = None
+    file_stop: int = 0
+
+
+def create_transactions(
+    clover: CloverAPI,
+    transactions: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    categories: dict,
+    batch_size: int = 1,
+    workers: int = 1,
+    index: Optional[IngestIndex] = None,
+) -> List[dict]:
+    """Post the transactions to the API
+
+    `transactions` is either a `pandas.DataFrame`, such as `load_csvs`, or an iterable of chunks,
+    such as `iter_csvs`, which is consumed as the rows are posted. Their "Total (AUD)" column must
+    already be parsed, see `parse_totals`. By default each row is posted on its own. If
+    `batch_size` is greater than 1, the rows are posted in batches through the bulk endpoint,
+    falling back to one request per row if the API doesn't have one. If `workers` is greater than
+    1, batches are posted concurrently by that many threads and logged in row order. In every mode
+    a failed row or batch is logged and reported instead of aborting the migration.
+
+    If an `index` is given, rows which are already in it are skipped without any requests, posted
+    rows are added to it, and the rows of each file before its checkpoint are skipped. The
+    checkpoint of a file is moved forward as batches succeed, up to its first failed batch.
+
+    Returns:
+        A list of failed batches, each with the `start` and `stop` row, the `error` and the number
+        of its first rows which were `created` before it failed. A row posted on its own is a batch
+        of one.
+    """
+    if isinstance(transactions, pd.DataFrame):
+        transactions = [transactions]
+
+    if batch_size <= 1 and workers <= 1 and index is None:
+        failures = []
+        row = 0
+        for chunk in transactions:
+            for _, transaction in chunk.iterrows():
+                try:
+                    transaction_id = clover.send_transaction(
+                        time=transaction["Time"],
+                        transaction_type=transaction["Transaction Type"],
+                        payee=transaction["Payee"],
+                        description=transaction["Description"],
+                        total=float(transaction["Total (AUD)"]),
+                        category_name=categories.get(transaction["Category"], "uncategorised"),
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to create transaction {row}: {e}")
+                    failures.append(dict(start=row, stop=row + 1, error=str(e), created=0))
+                else:
+                    # formatted lazily, only if the record is written
+                    logger.info("Created transaction %d... ID: %s", row, transaction_id)
+                row += 1
+        if failures:
+            logger.error(f"{len(failures)} transactions failed: {[f['start'] for f in failures]}")
+        return failures
+
+    batch_size = max(batch_size, 1)
+    state = dict(bulk=batch_size > 1)
+    # hashes of rows which have been handed to a worker but aren't in the index yet
+    in_flight = set()
+
+    def _batches() -> Iterator[Batch]:
+        # convert a block of rows at a time so that small batches don't each pay for a DataFrame
+        block_size = max(batch_size, 1000)
+        chunk_start = 0
+        file, seen, done = None, None, 0
+        for chunk in transactions:
+            if chunk.attrs.get("file") != file or seen is None:
+                file, seen = chunk.attrs.get("file"), collections.Counter()
+                done = index.checkpoint(file) if index is not None and file is not None else 0
+            file_offset = chunk.attrs.get("offset", 0)
+            for block_start in range(0, chunk.shape[0], block_size):
+                payloads = to_payloads(chunk.iloc[block_start : block_start + block_size], categories)
+                hashes, keep = None, pd.Series(True, index=payloads.index)
+                if index is not None:
+                    hashes = pd.Series(transaction_hashes(payloads, seen), index=payloads.index)
+                    rows = file_offset + block_start + np.arange(payloads.shape[0])
+                    new = index.missing(hashes[rows >= done]) - in_flight
+                    keep = hashes.isin(new)
+                for offset in range(0, payloads.shape[0], batch_size):
+                    rows = slice(offset, offset + batch_size)
+                    batch_keep = keep.iloc[rows]
+                    batch = Batch(
+                        start=chunk_start + block_start + offset,
+                        stop=chunk_start + block_start + offset + batch_keep.shape[0],
+                        payloads=payloads.iloc[rows][batch_keep.values].to_dict("records"),
+                        hashes=None if hashes is None else list(hashes.iloc[rows][batch_keep.values]),
+                        file=file,
+                        file_stop=file_offset + block_start + offset + batch_keep.shape[0],
+                    )
+                    if batch.hashes:
+                        in_flight.update(batch.hashes)
+                    yield batch
+            chunk_start += chunk.shape[0]
+
+    def _post(batch: Batch) -> List[int]:
+        if not batch.payloads:
+            return []
+        if not state["bulk"]:
+            return send_batch(clover, batch.payloads, bulk=False)
+        try:
+            return send_batch(clover, batch.payloads, bulk=True)
+        except (FileNotFoundError, MethodNotAllowedError):
+            if state["bulk"]:
+                logger.warning("API has no bulk endpoint, falling back to one request per transaction")
+                state["bulk"] = False
+            return send_batch(clover, batch.payloads, bulk=False)
+
+    failures = []
+    failed_files = set()
+    for batch, ids, error in iter_ordered(_post, _batches(), workers=workers):
+        if batch.hashes:
+            in_flight.difference_update(batch.hashes)
+        if error is not None:
+            created = error.ids if isinstance(error, PartialBatchError) else []
+            if index is not None and created:
+                # so that a re-run doesn't post the rows created before the failure again
+                index.add(dict(zip(batch.hashes, created)))
+            logger.error(f"Failed to create transactions {batch.start} to {batch.stop}: {error}")
+            failures.append(dict(start=batch.start, stop=batch.stop, error=str(error), created=len(created)))
+            failed_files.add(batch.file)
+            continue
+        if index is not None:
+            index.add(dict(zip(batch.hashes, ids)))
+            if batch.file is not None and batch.file not in failed_files:
+                index.set_checkpoint(batch.file, batch.file_stop)
+        if ids:
+            logger.info("Created transactions %d to %d... IDs: %s to %s", batch.start, batch.stop, ids[0], ids[-1])
+        else:
+            logger.info("Skipped transactions %d to %d, already ingested", batch.start, batch.stop)
+
+    if failures:
+        logger.error(f"{len(failures)} batches failed: {[(f['start'], f['stop']) for f in failures]}")
+    return failures
 
 
 if __name__ == "__main__":
@@ -70,8 +317,50 @@ if __name__ == "__main__":
         help="Path to dircetory containing CSV files to load and post",
         type=Path,
     )
+    parser.add_argument(
+        "--batch-size",
+        help="Number of transactions to post per request, 1 posts each row on its own",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of threads posting transactions concurrently",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--chunk-size",
+        help="Number of CSV rows to read into memory at a time",
+        type=int,
+        default=10000,
+    )
+    parser.add_argument(
+        "--index",
+        help="Path to the index of ingested transactions used to resume and skip duplicates. "
+        "Defaults to clover_index.db in the search path",
+        type=Path,
+        default=None,
+    )
+    parser.add_argument(
+        "--log-rate",
+        help="Most messages a second logged per row or batch, after a burst of 100. Defaults to all of them",
+        type=float,
+        default=None,
+    )
     args = parser.parse_args()
-    categories = get_categories(args.search_path)
-    create_categories(categories)
-    transactions = load_csvs(args.search_path)
-    create_transactions(transactions, categories)
+    # write the log from a background thread, so that logging each row doesn't wait on I/O
+    configure_parent_logger(level=logging.INFO, queued=True, rate_limit=args.log_rate, caller=False)
+    # one pooled connection per worker
+    facade = Facade().configure_retry().configure_pool(pool_maxsize=max(args.workers, 10))
+    clover = facade.clover()
+    try:
+        categories = get_categories(args.search_path)
+        create_categories(clover, categories, workers=args.workers)
+        transactions = iter_csvs(args.search_path, chunk_size=args.chunk_size)
+        with IngestIndex(args.index or args.search_path / "clover_index.db") as index:
+            create_transactions(
+                clover, transactions, categories, batch_size=args.batch_size, workers=args.workers, index=index
+            )
+    finally:
+        facade.close()
@@ -0,0 +1,52 @@
+"""Keep the transactions cache up to date for app workers which follow it
+
+Run one of these next to any number of `CLOVER_SYNC=follow` app processes, e.g. the workers
+started by `gunicorn wsgi:server`. Each refresh which changes the transactions atomically swaps
+in a new cache generation, which the workers pick up on their next poll.
+"""
+import argparse
+import logging
+import os
+from pathlib import Path
+import signal
+
+from clover_ui import Facade
+from clover_ui.cache import DEFAULT_CACHE_PATH, TransactionCache
+from clover_ui.log import configure_parent_logger
+from clover_ui.sync import TransactionSync
+
+logger = configure_parent_logger(level=logging.INFO)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch new transactions into the cache shared by the app workers")
+    parser.add_argument(
+        "--cache",
+        help="Path to the transactions cache, defaults to $CLOVER_CACHE_PATH or ~/.cache/clover-ui/transactions",
+        type=Path,
+        default=Path(os.environ.get("CLOVER_CACHE_PATH", DEFAULT_CACHE_PATH)),
+    )
+    parser.add_argument("--interval", help="Seconds between refreshes", type=float, default=60.0)
+    parser.add_argument(
+        "--revalidate-interval",
+        help="Seconds between refreshes of the full history, which pick up edited transactions",
+        type=float,
+        default=3600.0,
+    )
+    parser.add_argument("--page-size", help="Number of transactions to fetch per request", type=int, default=1000)
+    args = parser.parse_args()
+
+    clover = Facade().configure_retry().configure_cache().clover()
+    sync = TransactionSync(
+        clover,
+        page_size=args.page_size,
+        interval=args.interval,
+        revalidate_interval=args.revalidate_interval,
+        cache=TransactionCache(args.cache, host=clover.host),
+    )
+    signal.signal(signal.SIGTERM, lambda *_: sync.stop())
+    sync.load()
+    try:
+        sync.run()
+    except KeyboardInterrupt:
+        sync.stop()
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from clover_ui.aggregates import MAX_BARS, AggregateCube, bucket
+from clover_ui.store import TransactionStore
+
+CATEGORIES = pd.DataFrame(
+    dict(name=["groceries", "salary", "rent"], display_name=["Groceries", "Salary", "Rent"])
+)
+
+
+def make_transactions(rows: int, seed: int = 0, start_id: int = 1) -> pd.DataFrame:
+    """Raw transactions from the API over about four months"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        dict(
+            id=np.arange(start_id, start_id + rows),
+            time=pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 120 * 24 * 60, rows), unit="min"),
+            transaction_type=rng.choice(["Debit", "Credit", "Transfer"], rows),
+            payee=rng.choice(["Coles", "Employer", "Landlord"], rows),
+            description="",
+            total=rng.integers(-20000, 10000, rows) / 100,
+            category_name=rng.choice(["groceries", "salary", "rent", "uncategorised", "unknown"], rows),
+        )
+    )
+
+
+def prepare(raw: pd.DataFrame) -> pd.DataFrame:
+    return TransactionStore.empty().upsert(raw, CATEGORIES)[0].transactions
+
+
+def assert_same_queries(cube: AggregateCube, expected: AggregateCube):
+    months = sorted(expected.months)
+    assert sorted(cube.months) == months
+    selections = [None, months[0], months[-1], (months[0], months[1]), (months[1], months[-1])]
+    for month in selections:
+        for hide_transfers in (False, True):
+            for hide_uncategorised in (False, True):
+                actual = cube.query(month, hide_transfers, hide_uncategorised)
+                wanted = expected.query(month, hide_transfers, hide_uncategorised)
+                for name in ("by_category", "by_day", "by_period"):
+                    key = {"by_category": "display_name", "by_day": "days", "by_period": "start"}[name]
+                    pd.testing.assert_frame_equal(
+                        getattr(actual, name).sort_values(key, ignore_index=True),
+                        getattr(wanted, name).sort_values(key, ignore_index=True),
+                        check_exact=False,
+                    )
+                assert actual.period == wanted.period
+
+
+@pytest.fixture
+def raw():
+    return make_transactions(500)
+
+
+def test_update_with_added_transactions_matches_rebuild(raw):
+    held, added = raw.iloc[:400], make_transactions(100, seed=1, start_id=401)
+    cube = AggregateCube()
+    cube.rebuild(prepare(held))
+    # memoized results of the months which change have to be dropped
+    cube.query()
+    cube.query(pd.Period("2020-02"))
+    cube.update(prepare(added))
+
+    expected = AggregateCube()
+    expected.rebuild(prepare(pd.concat([held, added])))
+    assert_same_queries(cube, expected)
+
+
+def test_update_with_replaced_and_removed_transactions_matches_rebuild(raw):
+    cube = AggregateCube()
+    cube.rebuild(prepare(raw))
+    cube.query(pd.Period("2020-01"), hide_transfers=True)
+
+    # edit the totals and categories of some transactions, and remove others
+    edited = raw.iloc[:50].assign(total=raw.total.iloc[:50] * -2, category_name="rent")
+    removed = raw.iloc[450:]
+    cube.update(prepare(edited), prepare(pd.concat([raw.iloc[:50], removed])))
+
+    expected = AggregateCube()
+    expected.rebuild(prepare(pd.concat([edited, raw.iloc[50:450]])))
+    assert_same_queries(cube, expected)
+
+
+def test_removing_every_transaction_of_a_month_drops_it(raw):
+    cube = AggregateCube()
+    cube.rebuild(prepare(raw))
+    january = raw[pd.to_datetime(raw.time).dt.month == 1]
+    cube.update(prepare(raw.iloc[:0]), prepare(january))
+    assert pd.Period("2020-01") not in cube.months
+    assert cube.query(pd.Period("2020-01")).by_day.empty
+
+
+def by_day(*days: str) -> pd.DataFrame:
+    """Daily totals of 1 income and -2 expenses on each of `days`"""
+    return pd.DataFrame(dict(days=pd.to_datetime(list(days)), income=1.0, expenses=-2.0))
+
+
+@pytest.mark.parametrize(
+    "first, last, expected",
+    [
+        ("2020-01-01", "2020-01-01", "day"),
+        # MAX_BARS days, then one more
+        ("2020-01-01", "2020-04-29", "day"),
+        ("2020-01-01", "2020-04-30", "week"),
+        ("2020-01-01", "2025-01-01", "month"),
+        ("2000-01-01", "2020-01-01", "quarter"),
+        ("1900-01-01", "2020-01-01", "year"),
+    ],
+)
+def test_bucket_chooses_the_shortest_period_within_max_bars(first, last, expected):
+    totals = by_day(first, last)
+    by_period, period = bucket(totals)
+    assert period == expected
+    assert len(by_period) <= MAX_BARS
+    assert by_period.income.sum() == totals.income.sum()
+    assert by_period.expenses.sum() == totals.expenses.sum()
+
+
+def test_bucket_sums_by_week_starting_on_monday():
+    # Sunday 5th and Monday 6th of January 2020 are in different weeks
+    totals = by_day("2020-01-05", "2020-01-06", "2020-01-12", "2020-06-01")
+    by_period, period = bucket(totals, max_bars=30)
+    assert period == "week"
+    assert list(by_period.start) == list(pd.to_datetime(["2019-12-30", "2020-01-06", "2020-06-01"]))
+    assert list(by_period.income) == [1.0, 2.0, 1.0]
+    assert list(by_period.expenses) == [-2.0, -4.0, -2.0]
+
+
+def test_bucket_falls_back_to_years():
+    by_period, period = bucket(by_day("2000-01-01", "2010-01-01"), max_bars=2)
+    assert period == "year"
+    assert list(by_period.start) == list(pd.to_datetime(["2000-01-01", "2010-01-01"]))
+
+
+def test_bucket_empty():
+    by_period, period = bucket(by_day())
+    assert period == "day"
+    assert by_period.empty and list(by_period.columns) == ["start", "income", "expenses"]
+
+
+def test_cube_buckets_by_max_bars(raw):
+    # the transactions span about four months
+    cube = AggregateCube(max_bars=10)
+    cube.rebuild(prepare(raw))
+    result = cube.query()
+    assert result.period == "month"
+    assert list(result.by_period.start) == list(pd.date_range("2020-01-01", periods=4, freq="MS"))
+    assert result.by_period.income.sum() == pytest.approx(result.by_day.income.sum())
+    assert cube.query(pd.Period("2020-02")).period == "week"
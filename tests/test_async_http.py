@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import pytest
+import requests
+from retrying import RetryError, Retrying
+
+from clover_ui.async_http import call_with_retry
+from clover_ui.http import PERMANENT_ERRORS, AuthError, retrying_factory
+
+
+class Flaky:
+    """Fails with `error` the first `failures` calls, then returns the number of calls"""
+
+    def __init__(self, failures: int, error: Exception):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return self.calls
+
+    async def call_async(self):
+        return self()
+
+
+def outcomes(retrying: Retrying, failures: int, error: Exception):
+    """The result, or the type of the error, and the number of calls of `call_with_retry`, which
+    match those of `retrying.call`"""
+
+    def run(call):
+        fn = Flaky(failures, error)
+        try:
+            result = call(fn)
+        except Exception as e:
+            result = type(e)
+        return result, fn.calls
+
+    expected = run(retrying.call)
+    actual = run(lambda fn: asyncio.run(call_with_retry(retrying, fn.call_async)))
+    assert actual == expected
+    return actual
+
+
+def fast_retrying(**kwargs) -> Retrying:
+    return retrying_factory(wait_exponential_multiplier=1, wait_exponential_max=2, **kwargs)
+
+
+def test_retries_transient_errors():
+    assert outcomes(fast_retrying(), 3, requests.ConnectionError("refused")) == (4, 4)
+
+
+def test_stops_after_max_attempts():
+    result = outcomes(fast_retrying(stop_max_attempt_number=3), 10, requests.ConnectionError("refused"))
+    assert result == (requests.ConnectionError, 3)
+
+
+@pytest.mark.parametrize("error", [cls("permanent") for cls in PERMANENT_ERRORS])
+def test_never_retries_permanent_errors(error):
+    assert outcomes(fast_retrying(), 3, error) == (type(error), 1)
+
+
+def test_rejected_result_raises_retry_error():
+    retrying = Retrying(retry_on_result=lambda value: value < 5, stop_max_attempt_number=2, wait_fixed=0)
+    assert outcomes(retrying, 0, AuthError("unused")) == (RetryError, 2)
+
+
+def test_waits_between_attempts():
+    retrying = Retrying(wait_fixed=50, stop_max_attempt_number=5)
+    fn = Flaky(2, requests.Timeout("slow"))
+    start = time.perf_counter()
+    assert asyncio.run(call_with_retry(retrying, fn.call_async)) == 3
+    assert time.perf_counter() - start >= 0.1
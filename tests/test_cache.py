@@ -0,0 +1,69 @@
+import json
+
+import pandas as pd
+import pytest
+
+from clover_ui import cache as cache_module
+from clover_ui.cache import TransactionCache
+from clover_ui.store import TransactionStore
+
+HOST = "http://clover:5000"
+
+
+@pytest.fixture
+def store():
+    transactions = pd.DataFrame(
+        dict(
+            id=[1, 2, 3],
+            time=["2020-01-01 10:00", "2020-01-02 10:00", "2020-02-01 10:00"],
+            transaction_type=["Debit", "Credit", "Debit"],
+            payee=["Shop", "Employer", None],
+            description=["", "Pay", ""],
+            total=[-1.25, 100.0, -3.5],
+            category_name=["groceries", "salary", None],
+        )
+    )
+    categories = pd.DataFrame(dict(name=["groceries", "salary"], display_name=["Groceries", "Salary"]))
+    return TransactionStore.empty().upsert(transactions, categories)[0]
+
+
+def test_round_trip(tmp_path, store):
+    cache = TransactionCache(tmp_path, host=HOST)
+    assert cache.load() is None
+    cache.save(store.transactions, store.categories, revalidated_at=1234.5)
+
+    transactions, categories, revalidated_at = cache.load()
+    pd.testing.assert_frame_equal(transactions, store.transactions)
+    pd.testing.assert_frame_equal(categories, store.categories)
+    assert revalidated_at == 1234.5
+    assert cache.generation == 1
+
+
+def test_keeps_generations(tmp_path, store):
+    cache = TransactionCache(tmp_path, keep=2)
+    for _ in range(3):
+        cache.save(store.transactions, store.categories)
+    assert cache.generation == 3
+    assert sorted(path.name for path in tmp_path.glob("gen-*")) == ["gen-000002", "gen-000003"]
+
+
+def test_schema_version_mismatch(tmp_path, store, monkeypatch):
+    cache = TransactionCache(tmp_path)
+    monkeypatch.setattr(cache_module, "SCHEMA_VERSION", cache_module.SCHEMA_VERSION - 1)
+    cache.save(store.transactions, store.categories)
+    monkeypatch.undo()
+    assert cache.load() is None
+
+    cache.save(store.transactions, store.categories)
+    assert cache.load() is not None
+
+
+def test_host_mismatch(tmp_path, store):
+    TransactionCache(tmp_path, host=HOST).save(store.transactions, store.categories)
+    assert TransactionCache(tmp_path, host="http://other:5000").load() is None
+    assert TransactionCache(tmp_path, host=HOST).load() is not None
+    # without a host, a cache of any host is loaded
+    assert TransactionCache(tmp_path).load() is not None
+
+    meta = json.loads((TransactionCache(tmp_path).current / "meta.json").read_text())
+    assert meta["host"] == HOST and "cursor" not in meta
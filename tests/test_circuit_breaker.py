@@ -0,0 +1,107 @@
+import socket
+
+import pytest
+import requests
+
+from clover_ui import Facade
+from clover_ui import http
+from clover_ui.http import CircuitBreaker, CircuitOpenError, MethodNotAllowedError
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(http, "time", clock)
+    return clock
+
+
+def fail(breaker, times=1):
+    opened = False
+    for _ in range(times):
+        breaker.before("/transactions")
+        opened = breaker.record(requests.ConnectionError("refused"))
+    return opened
+
+
+def test_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    assert not fail(breaker, 2)
+    assert breaker.state == "closed"
+    assert fail(breaker)
+    assert breaker.snapshot() == dict(state="open", failures=3, retry_in=30.0)
+
+    clock.now += 10
+    with pytest.raises(CircuitOpenError):
+        breaker.before("/transactions")
+    assert breaker.snapshot()["retry_in"] == 20.0
+
+
+def test_success_resets_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3)
+    fail(breaker, 2)
+    breaker.record()
+    assert not fail(breaker, 2)
+    assert breaker.snapshot() == dict(state="closed", failures=2, retry_in=None)
+
+
+def test_permanent_errors_are_not_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.before("/transactions")
+    assert not breaker.record(MethodNotAllowedError("no bulk endpoint"))
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    fail(breaker)
+    clock.now += 30
+    breaker.before("/transactions")
+    assert breaker.state == "half-open"
+    # other attempts are refused while the trial is in flight
+    with pytest.raises(CircuitOpenError):
+        breaker.before("/categories")
+
+    breaker.record()
+    assert breaker.snapshot() == dict(state="closed", failures=0, retry_in=None)
+    breaker.before("/categories")
+
+
+def test_failed_trial_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    fail(breaker, 3)
+    clock.now += 30
+    # a single failed trial opens the circuit again, for another reset_timeout
+    assert fail(breaker)
+    assert breaker.snapshot() == dict(state="open", failures=4, retry_in=30.0)
+    with pytest.raises(CircuitOpenError):
+        breaker.before("/transactions")
+    clock.now += 30
+    breaker.before("/transactions")
+    assert breaker.state == "half-open"
+
+
+def test_requests_fail_fast_once_open():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        host = f"http://127.0.0.1:{s.getsockname()[1]}"
+    facade = Facade().configure_retry(wait_fixed=0, stop_max_attempt_number=5)
+    facade.configure_circuit_breaker(failure_threshold=2, reset_timeout=60)
+    clover = type(facade.clover())(request=facade.request, host=host)
+    breaker = facade.request.circuit_breaker
+
+    # the attempt which opens the circuit ends the retries
+    with pytest.raises(CircuitOpenError):
+        clover.fetch_categories()
+    assert breaker.snapshot()["state"] == "open" and breaker.failures == 2
+    with pytest.raises(CircuitOpenError):
+        clover.fetch_categories()
+    assert breaker.failures == 2
+    facade.close()
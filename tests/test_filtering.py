@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+from clover_ui.filtering import TransactionFilter, month_label
+from tests.test_aggregates import make_transactions, prepare
+
+
+@pytest.fixture
+def transactions():
+    # January to April 2020
+    return prepare(make_transactions(500))
+
+
+@pytest.fixture
+def filters(transactions):
+    filters = TransactionFilter()
+    filters.rebuild(transactions)
+    return filters
+
+
+def reference(transactions, start=None, end=None, hide_transfers=False, hide_uncategorised=False):
+    """`TransactionFilter.select` by scanning every transaction"""
+    keep = pd.Series(True, index=range(len(transactions)))
+    times = transactions.index.to_series().reset_index(drop=True)
+    if start is not None:
+        keep &= times >= pd.Timestamp(start)
+    if end is not None:
+        keep &= times < pd.Timestamp(end)
+    if hide_transfers:
+        keep &= (transactions.transaction_type != "Transfer").values
+    if hide_uncategorised:
+        keep &= (transactions.category_name != "uncategorised").values
+    return transactions[keep.values]
+
+
+@pytest.mark.parametrize("hide_transfers", [False, True])
+@pytest.mark.parametrize("hide_uncategorised", [False, True])
+def test_select_matches_a_scan(filters, transactions, hide_transfers, hide_uncategorised):
+    flags = dict(hide_transfers=hide_transfers, hide_uncategorised=hide_uncategorised)
+    pd.testing.assert_frame_equal(filters.select(**flags), reference(transactions, **flags))
+    for month in ["2020-01", "2020-03", "2019-12"]:
+        period = pd.Period(month)
+        pd.testing.assert_frame_equal(
+            filters.select(month=period, **flags),
+            reference(transactions, period.start_time, (period + 1).start_time, **flags),
+        )
+    ranges = [("2020-01-15", "2020-02-10"), ("2020-02-01 12:30", None), (None, "2020-01-02"), ("2021-01-01", None)]
+    for start, end in ranges:
+        pd.testing.assert_frame_equal(
+            filters.select(start=start, end=end, **flags), reference(transactions, start, end, **flags)
+        )
+
+
+def test_months_and_labels(filters):
+    assert list(filters.months) == list(pd.period_range("2020-01", "2020-04", freq="M"))
+    assert filters.month("February-2020") == pd.Period("2020-02")
+    assert filters.month("February-2019") is None
+    assert month_label(pd.Period("2020-02")) == "February-2020"
+
+
+def ordinals(first: str, last: str):
+    return [pd.Period(first, freq="M").ordinal, pd.Period(last, freq="M").ordinal]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (ordinals("2020-02", "2020-03"), ("2020-02", "2020-03")),
+        (ordinals("2020-03", "2020-02"), ("2020-02", "2020-03")),
+        (ordinals("2020-03", "2020-03"), ("2020-03", "2020-03")),
+        # clamped to the months with transactions
+        (ordinals("2019-06", "2020-02"), ("2020-01", "2020-02")),
+        (ordinals("2020-03", "2021-06"), ("2020-03", "2020-04")),
+        # all of the months, or none of them
+        (ordinals("2020-01", "2020-04"), None),
+        (ordinals("2019-01", "2021-01"), None),
+        (ordinals("2019-01", "2019-12"), None),
+        (ordinals("2020-05", "2020-06"), None),
+        (None, None),
+        ([], None),
+    ],
+)
+def test_month_range(filters, value, expected):
+    if expected is not None:
+        expected = tuple(pd.Period(month, freq="M") for month in expected)
+    assert filters.month_range(value) == expected
+
+
+def test_empty_filter():
+    filters = TransactionFilter()
+    assert filters.months == {}
+    assert filters.month_range([0, 0]) is None
+    assert filters.select(hide_transfers=True, hide_uncategorised=True).empty
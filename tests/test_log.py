@@ -0,0 +1,44 @@
+import logging
+
+from clover_ui.log import RateLimitFilter
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_rate_limit_shared_by_handlers():
+    logger = logging.getLogger("clover.test_log")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    handlers = [ListHandler(), ListHandler()]
+    limit = RateLimitFilter(rate=1e-6, burst=3)
+    for handler in handlers:
+        handler.addFilter(limit)
+        logger.addHandler(handler)
+    try:
+        for i in range(11):
+            if i == 10:
+                logger.warning("Not limited")
+                # refill the bucket
+                limit.rate = 1e9
+            logger.info("Created transaction %d", i)
+    finally:
+        for handler in handlers:
+            logger.removeHandler(handler)
+
+    # each record takes one token, whichever handlers it reaches
+    expected = [
+        "Created transaction 0",
+        "Created transaction 1",
+        "Created transaction 2",
+        "Not limited",
+        "Created transaction 10 (7 similar messages suppressed)",
+    ]
+    assert handlers[0].messages == expected
+    assert handlers[1].messages == expected
@@ -0,0 +1,102 @@
+import pytest
+
+from clover_ui.metrics import AttemptEvent, CallEvent, Histogram, MetricsCollector, endpoint_of
+
+
+def test_endpoint_of():
+    assert endpoint_of("http://clover:5000/transactions/42?x=1") == "/transactions/{id}"
+    assert endpoint_of("http://clover:5000") == "/"
+
+
+def test_observations_on_a_bound_count_in_its_bucket():
+    histogram = Histogram((1.0, 2.0))
+    for value in (0.5, 1.0, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.cumulative() == [(1.0, 2), (2.0, 3), (float("inf"), 4)]
+    assert histogram.sum == 6.0 and histogram.count == 4
+
+
+@pytest.mark.parametrize("q, expected", [(0.0, 0.0), (0.25, 0.5), (0.5, 1.0), (0.75, 1.5), (1.0, 2.0)])
+def test_quantile_interpolates_within_its_bucket(q, expected):
+    histogram = Histogram((1.0, 2.0, 4.0))
+    for value in (0.5, 0.5, 1.5, 1.5):
+        histogram.observe(value)
+    assert histogram.quantile(q) == pytest.approx(expected)
+
+
+def test_quantile_edge_cases():
+    histogram = Histogram((1.0, 2.0))
+    assert histogram.quantile(0.5) is None
+    assert histogram.snapshot()["mean"] is None
+
+    # the +Inf bucket has no upper bound to interpolate to, its lower bound is the estimate
+    for value in (0.5, 10.0, 20.0):
+        histogram.observe(value)
+    assert histogram.quantile(0.99) == 2.0
+    # empty buckets are skipped
+    assert histogram.quantile(0.5) == 2.0
+
+
+def test_prometheus_text():
+    metrics = MetricsCollector(latency_buckets=(0.1, 1.0), size_buckets=(1024,))
+    url = "http://clover:5000/transactions/7"
+    metrics.on_attempt(AttemptEvent("PUT", endpoint_of(url), 1, 0.5, error="ConnectionError"))
+    metrics.on_attempt(AttemptEvent("PUT", endpoint_of(url), 2, 0.05, status=200, bytes_sent=300, bytes_received=2048))
+    metrics.on_call(CallEvent("PUT", endpoint_of(url), attempts=2, duration=1.75, backoff=1.2))
+
+    labels = 'method="PUT",endpoint="/transactions/{id}"'
+    assert metrics.prometheus() == "\n".join(
+        [
+            "# HELP clover_http_requests_total HTTP request attempts by response status",
+            "# TYPE clover_http_requests_total counter",
+            f'clover_http_requests_total{{{labels},status="200"}} 1',
+            "# HELP clover_http_errors_total HTTP request attempts which raised, by exception class",
+            "# TYPE clover_http_errors_total counter",
+            f'clover_http_errors_total{{{labels},error="ConnectionError"}} 1',
+            "# HELP clover_http_retries_total HTTP requests retried after a failed attempt",
+            "# TYPE clover_http_retries_total counter",
+            f"clover_http_retries_total{{{labels}}} 1",
+            "# HELP clover_http_backoff_seconds_total Seconds spent waiting between attempts",
+            "# TYPE clover_http_backoff_seconds_total counter",
+            f"clover_http_backoff_seconds_total{{{labels}}} 1.2",
+            "# HELP clover_http_request_duration_seconds Duration of each HTTP request attempt",
+            "# TYPE clover_http_request_duration_seconds histogram",
+            f'clover_http_request_duration_seconds_bucket{{{labels},le="0.1"}} 1',
+            f'clover_http_request_duration_seconds_bucket{{{labels},le="1"}} 2',
+            f'clover_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2',
+            f"clover_http_request_duration_seconds_sum{{{labels}}} 0.55",
+            f"clover_http_request_duration_seconds_count{{{labels}}} 2",
+            "# HELP clover_http_call_duration_seconds Duration of HTTP requests including retries",
+            "# TYPE clover_http_call_duration_seconds histogram",
+            f'clover_http_call_duration_seconds_bucket{{{labels},le="0.1"}} 0',
+            f'clover_http_call_duration_seconds_bucket{{{labels},le="1"}} 0',
+            f'clover_http_call_duration_seconds_bucket{{{labels},le="+Inf"}} 1',
+            f"clover_http_call_duration_seconds_sum{{{labels}}} 1.75",
+            f"clover_http_call_duration_seconds_count{{{labels}}} 1",
+            "# HELP clover_http_request_size_bytes Size of HTTP request bodies",
+            "# TYPE clover_http_request_size_bytes histogram",
+            f'clover_http_request_size_bytes_bucket{{{labels},le="1024"}} 1',
+            f'clover_http_request_size_bytes_bucket{{{labels},le="+Inf"}} 1',
+            f"clover_http_request_size_bytes_sum{{{labels}}} 300",
+            f"clover_http_request_size_bytes_count{{{labels}}} 1",
+            "# HELP clover_http_response_size_bytes Size of HTTP response bodies as sent",
+            "# TYPE clover_http_response_size_bytes histogram",
+            f'clover_http_response_size_bytes_bucket{{{labels},le="1024"}} 0',
+            f'clover_http_response_size_bytes_bucket{{{labels},le="+Inf"}} 1',
+            f"clover_http_response_size_bytes_sum{{{labels}}} 2048",
+            f"clover_http_response_size_bytes_count{{{labels}}} 1",
+            "",
+        ]
+    )
+
+
+def test_prometheus_escapes_labels_and_limits_endpoints():
+    metrics = MetricsCollector(max_endpoints=1)
+    assert metrics.prometheus() == "\n"
+    metrics.on_attempt(AttemptEvent("GET", '/a"b\\c', 1, 0.01, status=200))
+    metrics.on_attempt(AttemptEvent("GET", "/categories", 1, 0.01, status=200))
+    text = metrics.prometheus()
+    assert 'clover_http_requests_total{method="GET",endpoint="/a\\"b\\\\c",status="200"} 1' in text
+    assert 'clover_http_requests_total{method="GET",endpoint="other",status="200"} 1' in text
+    assert "/categories" not in text
@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+from clover_ui.http import MethodNotAllowedError
+from clover_ui.ingest import IngestIndex
+import migration
+
+CATEGORIES = {"Groceries": "groceries"}
+
+
+class FakeClover:
+    """Creates transactions in memory, without a bulk endpoint, failing the given calls"""
+
+    def __init__(self, fail_on=()):
+        self.created = []
+        self.calls = 0
+        self.fail_on = set(fail_on)
+
+    def send_transactions(self, payloads, chunk_size=None):
+        raise MethodNotAllowedError("no bulk endpoint")
+
+    def send_transaction(self, **payload):
+        self.calls += 1
+        if self.calls in self.fail_on:
+            raise ValueError("API request was not ok -- status code 500")
+        self.created.append(payload)
+        return len(self.created)
+
+
+@pytest.fixture
+def export(tmp_path):
+    rows = 12
+    pd.DataFrame(
+        {
+            "Time": pd.date_range("2020-01-01", periods=rows, freq="h").strftime("%Y-%m-%d %H:%M"),
+            "Transaction Type": "Debit",
+            "Payee": [f"Payee {i}" for i in range(rows)],
+            "Description": "",
+            "Total (AUD)": [f"{-i - 1:,.2f}" for i in range(rows)],
+            "Category": "Groceries",
+        }
+    ).to_csv(tmp_path / "export.csv", index=False)
+    return tmp_path
+
+
+def migrate(export, clover) -> list:
+    with IngestIndex(export / "index.db") as index:
+        return migration.create_transactions(
+            clover, migration.iter_csvs(export), CATEGORIES, batch_size=5, workers=1, index=index
+        )
+
+
+def test_resume_after_partial_batch_posts_each_row_once(export):
+    clover = FakeClover(fail_on={8})
+    failures = migrate(export, clover)
+    # the second batch failed after creating its first two rows
+    assert [(f["start"], f["stop"], f["created"]) for f in failures] == [(5, 10, 2)]
+    assert len(clover.created) == 9
+
+    clover.fail_on = set()
+    assert migrate(export, clover) == []
+    payees = [payload["payee"] for payload in clover.created]
+    assert sorted(payees) == sorted(f"Payee {i}" for i in range(12))
+
+
+def test_rerun_after_complete_ingest_posts_nothing(export):
+    clover = FakeClover()
+    assert migrate(export, clover) == []
+    assert migrate(export, clover) == []
+    assert len(clover.created) == 12
+
+
+@pytest.mark.parametrize("load", [migration.iter_csvs, migration.load_csvs])
+def test_default_path_reports_failed_rows(export, load):
+    clover = FakeClover(fail_on={3, 7})
+    failures = migration.create_transactions(clover, load(export), CATEGORIES)
+    assert [(f["start"], f["stop"], f["created"]) for f in failures] == [(2, 3, 0), (6, 7, 0)]
+    assert len(clover.created) == 10
+    assert clover.created[0]["total"] == -1.0 and clover.created[-1]["total"] == -12.0
@@ -0,0 +1,31 @@
+import time
+
+from clover_ui.profiling import RenderProfiler, stage
+
+
+def test_cached_traces_are_reported_apart():
+    profiler = RenderProfiler(enabled=True)
+    for _ in range(3):
+        with profiler.trace("/page-1"):
+            with stage("render"):
+                time.sleep(0.01)
+    for _ in range(5):
+        with profiler.trace("/page-1") as trace:
+            trace.cached = True
+    with profiler.trace("/page-2") as trace:
+        trace.cached = True
+
+    page_1, page_2 = profiler.stats()
+    assert page_1["key"] == "/page-1"
+    assert page_1["total"]["count"] == 3 and page_1["total"]["p50"] >= 0.01
+    assert page_1["stages"]["render"]["count"] == 3
+    assert page_1["cached"]["count"] == 5 and page_1["cached"]["p50"] < 0.01
+    assert page_2 == dict(key="/page-2", total=None, stages={}, cached=page_2["cached"])
+
+
+def test_slow_renders_in_the_same_second_are_all_kept(tmp_path):
+    profiler = RenderProfiler(enabled=True, slow_threshold=0, path=tmp_path)
+    for _ in range(3):
+        with profiler.trace("/page-1"):
+            pass
+    assert len(list(tmp_path.glob("*-page-1.txt"))) == 3
@@ -0,0 +1,10 @@
+from clover_ui.response_cache import ResponseCache
+
+
+def test_skip_params():
+    cache = ResponseCache(endpoints=["/categories", "/transactions"], skip_params=["since"])
+    assert cache.accepts("http://api/categories")
+    assert cache.accepts("http://api/transactions?limit=1000")
+    assert not cache.accepts("http://api/transactions?since=1000&limit=1000")
+    assert not cache.accepts("http://api/accounts")
+    assert ResponseCache().accepts("http://api/transactions?since=1000")
@@ -0,0 +1,83 @@
+import pandas as pd
+
+from clover_ui.cache import TransactionCache
+from clover_ui.sync import TransactionSync
+
+CATEGORIES = [{"name": "groceries", "display_name": "Groceries"}]
+
+
+class FakeClover:
+    """Serves transactions from memory, which the tests edit in place"""
+
+    def __init__(self, transactions):
+        self.transactions = transactions
+        self.since = []
+
+    def fetch_categories(self):
+        return CATEGORIES
+
+    def fetch_transactions_frame(self, since=None, page_size=1000):
+        self.since.append(since)
+        rows = [row for row in self.transactions if since is None or row["id"] > since]
+        return pd.DataFrame(rows)
+
+
+def transaction(id, total, payee="Shop"):
+    return dict(
+        id=id,
+        time=f"2020-01-0{id} 10:00",
+        transaction_type="Debit",
+        payee=payee,
+        description="",
+        total=total,
+        category_name="groceries",
+    )
+
+
+def test_revalidation_picks_up_edits_and_deletions():
+    clover = FakeClover([transaction(1, -1.0), transaction(2, -2.0), transaction(3, -3.0)])
+    updates = []
+    sync = TransactionSync(clover, revalidate_interval=3600, listeners=[updates.append])
+    assert sync.refresh() == 3
+
+    clover.transactions = [transaction(1, -1.5, payee="Market"), transaction(3, -3.0), transaction(4, -4.0)]
+    assert sync.refresh() == 1
+    assert list(sync.transactions.id) == [1, 2, 3, 4]
+    assert sync.transactions.cents.tolist() == [-100, -200, -300, -400]
+
+    sync.revalidated_at -= 3600
+    assert sync.refresh() == 3
+    assert clover.since == [None, 3, None]
+    assert list(sync.transactions.id) == [1, 3, 4]
+    assert sync.transactions.cents.tolist() == [-150, -300, -400]
+    assert sync.transactions.payee.tolist() == ["Market", "Shop", "Shop"]
+    assert updates[-1].full and len(updates) == 3
+
+
+def test_unchanged_revalidation_keeps_the_version():
+    clover = FakeClover([transaction(1, -1.0), transaction(2, -2.0)])
+    updates = []
+    sync = TransactionSync(clover, revalidate_interval=0, listeners=[updates.append])
+    sync.refresh()
+    version = sync.version
+    assert sync.refresh() == 0
+    assert sync.version == version and len(updates) == 1
+    assert clover.since == [None, None]
+
+
+def test_revalidation_time_is_restored_from_the_cache(tmp_path):
+    clover = FakeClover([transaction(1, -1.0)])
+    sync = TransactionSync(clover, cache=TransactionCache(tmp_path))
+    sync.refresh()
+
+    restored = TransactionSync(clover, cache=TransactionCache(tmp_path))
+    assert restored.load()
+    assert restored.revalidated_at == sync.revalidated_at
+    assert not restored.revalidation_due
+    restored.refresh()
+    assert clover.since == [None, 1]
+
+    # the frame loaded from the cache compares equal to the same history fetched again
+    restored.revalidated_at -= 3600
+    assert restored.refresh() == 0
+    assert clover.since == [None, 1, None]
@@ -0,0 +1,12 @@
+"""Entry point for serving the app from a multi-process WSGI server
+
+The workers only read the transactions cache, which `refresh.py` keeps up to date, so the
+transactions are fetched once and shared by every worker through the memory-mapped cache files:
+
+    gunicorn wsgi:server  # see gunicorn.conf.py
+
+No data is loaded until a worker's first request, so the app can be preloaded by the master.
+"""
+from clover_ui.app import create_app
+
+server = create_app(follow=True).server